@@ -0,0 +1,246 @@
+"""
+Admission control for expensive endpoints.
+
+Two layers, both checked before any real work starts:
+
+- Token buckets per session and per client (the `X-API-Key` header, or the
+  client address when it is absent) cap how often chat and upload requests
+  may arrive. A request over either limit is rejected at once.
+- Concurrency pools bound how many chats and how many ingestions run at
+  the same time. Requests beyond the limit wait in a short FIFO queue; when
+  the queue is full or the wait runs out they are rejected instead of
+  piling up behind the Groq rate limit and the DB pool.
+
+Rejections raise `Overloaded`, which the API turns into a 429 with a
+Retry-After header. A request costing more than a bucket can ever hold
+(e.g. a bulk upload of more files than the burst) raises `TooLarge`
+instead, a 413: waiting would not help. Limits are held in memory, so with several workers
+each worker enforces them separately.
+"""
+
+import asyncio
+import math
+import time
+from collections import OrderedDict, deque
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Deque, Optional, Union
+
+from fastapi import Request
+
+from config import (
+    RATE_LIMITS_ENABLED,
+    RATE_LIMIT_MAX_KEYS,
+    CHAT_RATE_PER_SESSION,
+    CHAT_RATE_PER_CLIENT,
+    CHAT_BURST,
+    UPLOAD_RATE_PER_SESSION,
+    UPLOAD_RATE_PER_CLIENT,
+    UPLOAD_BURST,
+    MAX_CONCURRENT_CHATS,
+    CHAT_QUEUE_SIZE,
+    CHAT_QUEUE_TIMEOUT,
+    MAX_CONCURRENT_INGESTS,
+    INGEST_QUEUE_SIZE,
+    INGEST_QUEUE_TIMEOUT,
+)
+from observability import get_logger, record_rejection, stage_timer
+
+
+logger = get_logger("admission")
+
+CLIENT_KEY_HEADER = "X-API-Key"
+
+
+class Overloaded(Exception):
+    """Raised when a request is not admitted; carries the Retry-After hint."""
+
+    def __init__(self, reason: str, retry_after: float):
+        super().__init__(reason)
+        self.reason = reason
+        self.retry_after = max(1, math.ceil(retry_after))
+
+
+class TooLarge(Exception):
+    """Raised when a request costs more than a rate limit's burst allows."""
+
+    def __init__(self, reason: str):
+        super().__init__(reason)
+        self.reason = reason
+
+
+class TokenBucket:
+    """Refills `rate` tokens per second up to `capacity`."""
+
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait_time(self, cost: float = 1) -> float:
+        """Seconds until `cost` tokens are available (0 if they are now)."""
+        self._refill()
+        missing = cost - self.tokens
+        return max(0.0, missing / self.rate)
+
+    def consume(self, cost: float = 1) -> None:
+        self.tokens -= cost
+
+
+class RateLimiter:
+    """One token bucket per key; the least recently used keys are dropped."""
+
+    def __init__(self, name: str, per_minute: float, burst: float):
+        self.name = name
+        self.rate = per_minute / 60
+        self.burst = burst
+        self._buckets: "OrderedDict[str, TokenBucket]" = OrderedDict()
+
+    @property
+    def enabled(self) -> bool:
+        return self.rate > 0
+
+    def bucket(self, key: str) -> TokenBucket:
+        bucket = self._buckets.get(key)
+        if bucket is None:
+            bucket = self._buckets[key] = TokenBucket(self.rate, self.burst)
+            while len(self._buckets) > RATE_LIMIT_MAX_KEYS:
+                self._buckets.popitem(last=False)  # an evicted key starts again with a full bucket
+        self._buckets.move_to_end(key)
+        return bucket
+
+
+class ConcurrencyLimit:
+    """
+    At most `limit` holders at a time, with a bounded FIFO queue.
+
+    A released slot is handed straight to the oldest waiter, so a request
+    that times out or is cancelled never leaks a slot.
+    """
+
+    def __init__(self, name: str, limit: int, queue_size: int, timeout: float):
+        self.name = name
+        self.limit = max(1, limit)
+        self.queue_size = queue_size
+        self.timeout = timeout
+        self.active = 0
+        self._waiters: Deque[asyncio.Future] = deque()
+        self._avg_hold = 1.0  # moving average of seconds a slot is held, for Retry-After
+
+    def _retry_after(self) -> float:
+        return self._avg_hold * (len(self._waiters) + 1) / self.limit
+
+    def _release(self) -> None:
+        while self._waiters:
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                waiter.set_result(None)  # the slot passes on; `active` is unchanged
+                return
+        self.active -= 1
+
+    async def _acquire(self) -> None:
+        if self.active < self.limit and not self._waiters:
+            self.active += 1
+            return
+        if len(self._waiters) >= self.queue_size:
+            record_rejection(self.name, "queue_full")
+            raise Overloaded(f"Too many {self.name} requests in progress", self._retry_after())
+
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters.append(waiter)
+        try:
+            with stage_timer(f"{self.name}_queue"):
+                await asyncio.wait_for(asyncio.shield(waiter), self.timeout)
+        except asyncio.TimeoutError:
+            if waiter.done():
+                return  # granted just as the wait ran out
+            waiter.cancel()
+            self._waiters.remove(waiter)
+            record_rejection(self.name, "queue_timeout")
+            raise Overloaded(f"Timed out waiting for a {self.name} slot", self._retry_after())
+        except asyncio.CancelledError:
+            if waiter.done():
+                self._release()  # granted just as the client went away; pass it on
+            else:
+                waiter.cancel()
+                self._waiters.remove(waiter)
+            raise
+
+    @asynccontextmanager
+    async def slot(self) -> AsyncIterator[None]:
+        await self._acquire()
+        start = time.monotonic()
+        try:
+            yield
+        finally:
+            self._avg_hold = 0.8 * self._avg_hold + 0.2 * (time.monotonic() - start)
+            self._release()
+
+
+chat_slots = ConcurrencyLimit("chat", MAX_CONCURRENT_CHATS, CHAT_QUEUE_SIZE, CHAT_QUEUE_TIMEOUT)
+ingest_slots = ConcurrencyLimit("ingest", MAX_CONCURRENT_INGESTS, INGEST_QUEUE_SIZE, INGEST_QUEUE_TIMEOUT)
+
+_limiters = {
+    "chat": (
+        RateLimiter("chat_session", CHAT_RATE_PER_SESSION, CHAT_BURST),
+        RateLimiter("chat_client", CHAT_RATE_PER_CLIENT, CHAT_BURST),
+    ),
+    "upload": (
+        RateLimiter("upload_session", UPLOAD_RATE_PER_SESSION, UPLOAD_BURST),
+        RateLimiter("upload_client", UPLOAD_RATE_PER_CLIENT, UPLOAD_BURST),
+    ),
+}
+
+
+def client_key(request: Request) -> str:
+    """Identify the caller for per-client limits (keys are not authenticated)."""
+    api_key = request.headers.get(CLIENT_KEY_HEADER)
+    if api_key:
+        return f"key:{api_key}"
+    return f"addr:{request.client.host if request.client else 'unknown'}"
+
+
+def check_rate(
+    kind: str, session_id: Optional[Union[int, str]], client: str, cost: float = 1, consume: bool = True,
+) -> None:
+    """
+    Take `cost` tokens from the session and client buckets, or raise
+    Overloaded (or TooLarge when `cost` exceeds a bucket's burst). With
+    `consume=False` only check that the tokens are there.
+    """
+    if not RATE_LIMITS_ENABLED:
+        return
+    session_limiter, client_limiter = _limiters[kind]
+    buckets = []
+    if session_id is not None and session_limiter.enabled:
+        buckets.append((session_limiter, session_limiter.bucket(str(session_id))))
+    if client_limiter.enabled:
+        buckets.append((client_limiter, client_limiter.bucket(client)))
+
+    # Check every bucket before taking from any, so a rejected request costs nothing
+    for limiter, bucket in buckets:
+        if cost > bucket.capacity:
+            record_rejection(kind, f"{limiter.name}_too_large")
+            raise TooLarge(f"Request costs {cost:g} but {limiter.name} allows at most {bucket.capacity:g} at once")
+        wait = bucket.wait_time(cost)
+        if wait > 0:
+            record_rejection(kind, limiter.name)
+            logger.info("rate limited", extra={"limit": limiter.name, "session_id": session_id, "retry_after": wait})
+            raise Overloaded(f"Rate limit exceeded ({limiter.name})", wait)
+    if consume:
+        for _, bucket in buckets:
+            bucket.consume(cost)
+
+
+def rate_limit(kind: str):
+    """FastAPI dependency applying the `kind` rate limits to a request."""
+
+    async def dependency(request: Request) -> None:
+        check_rate(kind, request.path_params.get("session_id"), client_key(request))
+
+    return dependency
@@ -0,0 +1,143 @@
+"""
+Micro-batching for query embeddings.
+
+Every chat embeds one short query. Embedded one call at a time, concurrent
+chats each pay for a full forward pass through the model and compete for
+the same CPU threads. `EmbeddingBatcher` queues those queries instead: the
+first query in an empty queue waits up to EMBED_QUERY_BATCH_WAIT_MS for
+others to arrive, then up to EMBED_QUERY_BATCH_SIZE queries are embedded
+in one `embed_documents` call and each caller gets its own vector back.
+
+Only one batch is in flight at a time. Queries that arrive while a pass is
+running go out together as soon as it finishes, without waiting again, so
+batches grow with load on their own while a query at low load is delayed
+by at most the wait. A wait of 0 only batches queries that queued behind a
+running pass; a batch size of 1 turns batching off.
+
+Batches go through `embed_documents`, which gives the same vectors as
+`embed_query` for symmetric models such as MiniLM.
+"""
+
+import asyncio
+from collections import deque
+from typing import Callable, Deque, List, NamedTuple, Optional
+
+from langchain_core.embeddings import Embeddings
+
+from config import EMBED_QUERY_BATCH_SIZE, EMBED_QUERY_BATCH_WAIT_MS
+from observability import get_logger, record_embed_batch, stage_timer
+
+
+logger = get_logger("batching")
+
+
+class _Query(NamedTuple):
+    text: str
+    future: asyncio.Future
+    queued_at: float
+
+
+class EmbeddingBatcher:
+    """Coalesces concurrent `embed` calls into batched forward passes."""
+
+    def __init__(
+        self,
+        embeddings: Callable[[], Embeddings],
+        max_batch: int = EMBED_QUERY_BATCH_SIZE,
+        max_wait_ms: float = EMBED_QUERY_BATCH_WAIT_MS,
+    ):
+        self._embeddings = embeddings  # resolved per batch, so the model still loads lazily
+        self.max_batch = max(1, max_batch)
+        self.max_wait = max(0.0, max_wait_ms) / 1000
+        self._pending: Deque[_Query] = deque()
+        self._in_flight: List[_Query] = []
+        self._arrived: Optional[asyncio.Event] = None
+        self._worker: Optional[asyncio.Task] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+
+    async def embed(self, text: str) -> List[float]:
+        """Embedding of one query, computed in a batch with concurrent callers."""
+        if self.max_batch == 1:
+            with stage_timer("embed_query_batch"):
+                record_embed_batch(1)
+                return await asyncio.to_thread(self._embeddings().embed_query, text)
+
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop or self._worker is None or self._worker.done():
+            self._start(loop)
+        future = loop.create_future()
+        self._pending.append(_Query(text, future, loop.time()))
+        self._arrived.set()
+        return await future
+
+    def _start(self, loop: asyncio.AbstractEventLoop) -> None:
+        # Queries left from another event loop (e.g. a finished test client) cannot be answered
+        self._cancel_waiting()
+        self._loop = loop
+        self._arrived = asyncio.Event()
+        self._worker = loop.create_task(self._dispatch())
+
+    async def _dispatch(self) -> None:
+        try:
+            while True:
+                while not self._pending:
+                    self._arrived.clear()
+                    await self._arrived.wait()
+                await self._fill()
+                take = min(len(self._pending), self.max_batch)
+                batch = [self._pending.popleft() for _ in range(take)]
+                # Callers that went away while queued are dropped
+                batch = [query for query in batch if not query.future.done()]
+                if batch:
+                    await self._run(batch)
+        finally:
+            self._cancel_waiting()
+
+    async def _fill(self) -> None:
+        """Wait until the batch is full or its oldest query has waited `max_wait`."""
+        loop = asyncio.get_running_loop()
+        deadline = self._pending[0].queued_at + self.max_wait
+        while len(self._pending) < self.max_batch:
+            remaining = deadline - loop.time()
+            if remaining <= 0:
+                return
+            self._arrived.clear()
+            try:
+                await asyncio.wait_for(self._arrived.wait(), remaining)
+            except asyncio.TimeoutError:
+                return
+
+    async def _run(self, batch: List[_Query]) -> None:
+        self._in_flight = batch
+        record_embed_batch(len(batch))
+        try:
+            with stage_timer("embed_query_batch"):
+                vectors = await asyncio.to_thread(
+                    self._embeddings().embed_documents, [query.text for query in batch]
+                )
+        except Exception as exc:
+            logger.exception("query embedding failed", extra={"batch": len(batch)})
+            for query in batch:
+                if not query.future.done():
+                    query.future.set_exception(exc)
+            return
+        finally:
+            self._in_flight = []
+        for query, vector in zip(batch, vectors):
+            if not query.future.done():
+                query.future.set_result(vector)
+
+    def _cancel_waiting(self) -> None:
+        for query in [*self._in_flight, *self._pending]:
+            if not query.future.done():
+                query.future.cancel()
+        self._in_flight = []
+        self._pending.clear()
+
+    def close(self) -> None:
+        """Stop the dispatcher; queries still waiting are cancelled."""
+        if self._worker is not None and not self._worker.done():
+            self._worker.cancel()
+        self._worker = None
+        self._loop = None
+        self._cancel_waiting()
@@ -0,0 +1,6 @@
+"""
+Offline benchmarks for the ingestion and chat pipeline.
+
+Run from the backend directory, e.g.:
+    python -m benchmarks.pipeline --docs 20 --pages 10 --concurrency 8
+"""
@@ -0,0 +1,171 @@
+"""
+Chunking benchmark: vector count, ingestion time and retrieval hit rate.
+
+Generates PDFs of numbered sections with prose and figure tables, each
+section carrying a probe question whose answer is a table row (with the
+table's caption) or a decision sentence. For every chunking configuration
+the corpus is chunked, embedded and indexed. `intact_rate` is the share of
+answers that survive chunking whole in some chunk; a probe is a hit when
+one of the top-k retrieved chunks contains its answer whole.
+
+Configurations are `strategy:chunk_size:chunk_overlap`; the default
+compares the previous splitter with the configured structure chunker.
+
+Usage (from backend/):
+    python -m benchmarks.chunking --docs 10 --pages 8
+    python -m benchmarks.chunking --fake-embeddings --configs recursive:1000:200 structure:1000:100 structure:600:0
+"""
+
+import argparse
+import contextlib
+import json
+import os
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(BACKEND_DIR))
+
+from benchmarks.corpus import Probe, generate_structured_pages, write_pdf  # noqa: E402
+from benchmarks.fakes import LexicalEmbeddings  # noqa: E402
+
+
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--docs", type=int, default=10, help="number of PDFs to generate")
+    parser.add_argument("--pages", type=int, default=8, help="pages per PDF")
+    parser.add_argument("--configs", nargs="+", help="strategy:chunk_size:chunk_overlap entries to compare")
+    parser.add_argument("--k", type=int, default=None, help="results per query (default RETRIEVAL_K)")
+    parser.add_argument("--fake-embeddings", action="store_true", help="use bag-of-words embeddings instead of MiniLM")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", type=Path, help="write the JSON report here")
+    return parser.parse_args(argv)
+
+
+def _normalize(text: str) -> str:
+    return " ".join(text.split())
+
+
+def _parse_config(spec: str) -> Tuple[str, int, int]:
+    strategy, size, overlap = spec.split(":")
+    return strategy, int(size), int(overlap)
+
+
+def bench_config(
+    spec: str,
+    documents: List[Tuple[str, List[str]]],
+    probes: List[Probe],
+    embeddings,
+    k: int,
+) -> Dict[str, Any]:
+    from langchain_community.vectorstores import FAISS
+    from chunking import chunk_pages
+
+    strategy, chunk_size, chunk_overlap = _parse_config(spec)
+
+    start = time.perf_counter()
+    texts: List[str] = []
+    metadatas: List[dict] = []
+    for name, pages in documents:
+        for chunk in chunk_pages(pages, chunk_size, chunk_overlap, strategy=strategy):
+            texts.append(chunk.text)
+            metadatas.append({"source": name, "page": chunk.page})
+    chunk_s = time.perf_counter() - start
+
+    start = time.perf_counter()
+    vectors = embeddings.embed_documents(texts)
+    embed_s = time.perf_counter() - start
+
+    start = time.perf_counter()
+    store = FAISS.from_embeddings(list(zip(texts, vectors)), embeddings, metadatas=metadatas)
+    index_s = time.perf_counter() - start
+
+    normalized = [_normalize(text) for text in texts]
+
+    def answers(probe: Probe, chunk: str) -> bool:
+        return all(_normalize(part) in chunk for part in probe.answer)
+
+    intact = 0
+    hits = {"table": [0, 0], "prose": [0, 0]}
+    for probe in probes:
+        intact += any(answers(probe, chunk) for chunk in normalized)
+        results = store.similarity_search_by_vector(embeddings.embed_query(probe.query), k=k)
+        hits[probe.kind][1] += 1
+        if any(answers(probe, _normalize(doc.page_content)) for doc in results):
+            hits[probe.kind][0] += 1
+
+    found = sum(hit for hit, _ in hits.values())
+    return {
+        "config": spec,
+        "vectors": len(texts),
+        "chars_embedded": sum(len(text) for text in texts),
+        "avg_chunk_chars": round(sum(len(text) for text in texts) / max(1, len(texts)), 1),
+        "chunk_s": round(chunk_s, 4),
+        "embed_s": round(embed_s, 4),
+        "index_s": round(index_s, 4),
+        "ingest_s": round(chunk_s + embed_s + index_s, 4),
+        "intact_rate": round(intact / max(1, len(probes)), 4),
+        "hit_rate": round(found / max(1, len(probes)), 4),
+        "table_hit_rate": round(hits["table"][0] / max(1, hits["table"][1]), 4),
+        "prose_hit_rate": round(hits["prose"][0] / max(1, hits["prose"][1]), 4),
+    }
+
+
+def run(args: argparse.Namespace) -> Dict[str, Any]:
+    os.environ.setdefault("GROQ_API_KEY", "benchmark-stub")
+    os.environ.setdefault("LOG_LEVEL", "WARNING")
+    from config import CHUNK_SIZE, PROSE_OVERLAP, RETRIEVAL_K
+    from extraction import scan_pdf
+
+    configs = args.configs or ["recursive:1000:200", f"structure:{CHUNK_SIZE}:{PROSE_OVERLAP}"]
+    if args.fake_embeddings:
+        embeddings = LexicalEmbeddings()
+    else:
+        from service import get_embeddings
+        embeddings = get_embeddings()
+        embeddings.embed_query("warm-up")
+
+    documents: List[Tuple[str, List[str]]] = []
+    probes: List[Probe] = []
+    with tempfile.TemporaryDirectory(prefix="briefly-chunking-") as tmp:
+        start = time.perf_counter()
+        for i in range(args.docs):
+            # Section numbers run on across documents, so each probe names one section
+            pages, doc_probes = generate_structured_pages(
+                args.pages, seed=args.seed * 100003 + i, first_section=len(probes) + 1,
+            )
+            path = Path(tmp) / f"pack_{i:04d}.pdf"
+            write_pdf(path, pages)
+            # Round-trip through pypdf so chunkers see real extraction output
+            documents.append((path.name, scan_pdf(str(path)).pages))
+            probes.extend(doc_probes)
+        extract_s = time.perf_counter() - start
+
+    return {
+        "docs": args.docs,
+        "pages": args.docs * args.pages,
+        "probes": len(probes),
+        "k": args.k or RETRIEVAL_K,
+        "embeddings": "lexical" if args.fake_embeddings else "minilm",
+        "extract_s": round(extract_s, 4),
+        "results": [bench_config(spec, documents, probes, embeddings, args.k or RETRIEVAL_K) for spec in configs],
+    }
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    args = parse_args(argv)
+    # Keep stdout clean for the JSON report; backend modules print at import
+    with contextlib.redirect_stdout(sys.stderr):
+        report = run(args)
+    payload = json.dumps(report, indent=2)
+    print(payload)
+    if args.output:
+        args.output.write_text(payload)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,174 @@
+"""
+Synthetic meeting-document corpus generator.
+
+Writes small, valid text PDFs without any third-party PDF writer so the
+benchmarks can run in a bare environment. Output is deterministic for a
+given seed.
+"""
+
+import random
+import re
+import textwrap
+from dataclasses import dataclass
+from pathlib import Path
+from typing import List, Optional, Tuple
+
+
+TOPICS = [
+    "budget", "hiring plan", "product roadmap", "vendor contract", "security audit",
+    "quarterly targets", "office relocation", "customer churn", "release schedule",
+    "marketing campaign", "data retention policy", "board approval",
+]
+PEOPLE = ["Alice", "Bob", "Carla", "Deepak", "Elena", "Farid", "Grace", "Hiro"]
+REGIONS = [
+    "EMEA", "APAC", "Americas", "LATAM", "Nordics", "DACH", "Benelux", "Iberia",
+    "France", "Italy", "Japan", "India", "Canada", "Brazil",
+]
+QUARTERS = ["Q1", "Q2", "Q3", "Q4"]
+VERBS = ["approved", "rejected", "postponed", "reviewed", "escalated", "discussed"]
+FILLER = (
+    "The committee noted that the figures presented last quarter were revised after "
+    "the finance team reconciled the regional reports and the updated numbers were "
+    "circulated before the meeting for comment."
+)
+
+LINES_PER_PAGE = 55
+CHARS_PER_LINE = 95
+
+
+def _paragraph(rng: random.Random, topic: Optional[str] = None) -> str:
+    topic = topic or rng.choice(TOPICS)
+    owner = rng.choice(PEOPLE)
+    day = rng.randint(1, 28)
+    month = rng.randint(1, 12)
+    amount = rng.randint(5, 900) * 1000
+    sentences = [
+        f"Item on {topic}: the board {rng.choice(VERBS)} the proposal presented by {owner}.",
+        f"Decision: allocate ${amount:,} to the {topic} workstream starting 2024-{month:02d}-{day:02d}.",
+        f"Action item: {owner} to circulate the revised {topic} document to {rng.choice(PEOPLE)}.",
+        FILLER,
+    ]
+    rng.shuffle(sentences)
+    return " ".join(sentences)
+
+
+def generate_pages(num_pages: int, seed: int = 0) -> List[str]:
+    """Return `num_pages` pages of meeting-minutes style text."""
+    rng = random.Random(seed)
+    pages = []
+    for _ in range(num_pages):
+        lines: List[str] = []
+        while len(lines) < LINES_PER_PAGE:
+            lines.extend(textwrap.wrap(_paragraph(rng), CHARS_PER_LINE))
+            lines.append("")
+        pages.append("\n".join(lines[:LINES_PER_PAGE]))
+    return pages
+
+
+@dataclass
+class Probe:
+    """A question whose answer is a table row (with its caption) or a sentence of the corpus."""
+    query: str
+    answer: Tuple[str, ...]  # all parts must appear in one chunk
+    kind: str  # "table" or "prose"
+
+
+def _codename(rng: random.Random) -> str:
+    syllables = ["ka", "lo", "mi", "ra", "te", "vu", "zen", "dor", "pha", "qui", "sel", "bri", "nox", "tal"]
+    return "".join(rng.choice(syllables) for _ in range(3)).title()
+
+
+def _section(rng: random.Random, number: int) -> Tuple[List[str], Probe]:
+    # Only the heading names the project, so an answer is findable only if its chunk keeps the heading
+    topic = rng.choice(TOPICS)
+    project = _codename(rng)
+    lines = [f"{number}. Project {project} {topic.title()}"]
+    paragraph = _paragraph(rng, topic)
+    lines.extend(textwrap.wrap(paragraph, CHARS_PER_LINE))
+    if rng.random() < 0.5:
+        caption = f"Table {number}: spend by region"
+        lines.append(caption)
+        lines.append("Region " + " ".join(QUARTERS) + " Total")
+        rows = []
+        for region in rng.sample(REGIONS, rng.randint(3, 12)):
+            values = [rng.randint(10, 999) * 1000 for _ in QUARTERS]
+            rows.append((region, f"{region} " + " ".join(f"{v:,}" for v in values) + f" {sum(values):,}"))
+        lines.extend(row for _, row in rows)
+        region, row = rng.choice(rows)
+        probe = Probe(f"{rng.choice(QUARTERS)} spend for {region} on project {project}", (caption, row), "table")
+    else:
+        decision = re.search(r"Decision: [^.]*\.", paragraph).group(0)
+        probe = Probe(f"How much was allocated to project {project}?", (decision,), "prose")
+    lines.append("")
+    return lines, probe
+
+
+def generate_structured_pages(
+    num_pages: int, seed: int = 0, first_section: int = 1,
+) -> Tuple[List[str], List[Probe]]:
+    """Return pages of numbered sections with prose and figure tables, plus one probe per section."""
+    rng = random.Random(seed)
+    pages: List[str] = []
+    probes: List[Probe] = []
+    lines: List[str] = []
+    number = first_section - 1
+    while len(pages) < num_pages:
+        number += 1
+        section, probe = _section(rng, number)
+        if lines and len(lines) + len(section) > LINES_PER_PAGE:
+            pages.append("\n".join(lines))
+            lines = []
+            if len(pages) == num_pages:
+                break
+        lines.extend(section)
+        probes.append(probe)
+    return pages, probes
+
+
+def _escape(line: str) -> str:
+    return line.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)")
+
+
+def write_pdf(path: Path, pages: List[str]) -> None:
+    """Write `pages` (one string per page) to a minimal Helvetica text PDF."""
+    objects = {
+        1: "<< /Type /Catalog /Pages 2 0 R >>",
+        3: "<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>",
+    }
+    kids = []
+    for i, text in enumerate(pages):
+        page_id, content_id = 4 + 2 * i, 5 + 2 * i
+        kids.append(f"{page_id} 0 R")
+        ops = " ".join(f"({_escape(line)}) Tj T*" for line in text.split("\n"))
+        stream = f"BT /F1 9 Tf 40 760 Td 13 TL {ops} ET"
+        objects[page_id] = (
+            "<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 792] "
+            f"/Resources << /Font << /F1 3 0 R >> >> /Contents {content_id} 0 R >>"
+        )
+        objects[content_id] = f"<< /Length {len(stream)} >>\nstream\n{stream}\nendstream"
+    objects[2] = f"<< /Type /Pages /Kids [{' '.join(kids)}] /Count {len(pages)} >>"
+
+    out = bytearray(b"%PDF-1.4\n")
+    offsets = {}
+    for obj_id in sorted(objects):
+        offsets[obj_id] = len(out)
+        out += f"{obj_id} 0 obj\n{objects[obj_id]}\nendobj\n".encode("latin-1")
+    xref_offset = len(out)
+    size = max(objects) + 1
+    out += f"xref\n0 {size}\n0000000000 65535 f \n".encode()
+    for obj_id in range(1, size):
+        out += f"{offsets[obj_id]:010d} 00000 n \n".encode()
+    out += f"trailer\n<< /Size {size} /Root 1 0 R >>\nstartxref\n{xref_offset}\n%%EOF\n".encode()
+    Path(path).write_bytes(bytes(out))
+
+
+def generate_corpus(directory: Path, num_docs: int, pages_per_doc: int, seed: int = 0) -> List[Path]:
+    """Write `num_docs` synthetic PDFs into `directory` and return their paths."""
+    directory = Path(directory)
+    directory.mkdir(parents=True, exist_ok=True)
+    paths = []
+    for i in range(num_docs):
+        path = directory / f"meeting_{i:04d}.pdf"
+        write_pdf(path, generate_pages(pages_per_doc, seed=seed * 100003 + i))
+        paths.append(path)
+    return paths
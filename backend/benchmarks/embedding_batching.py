@@ -0,0 +1,167 @@
+"""
+Query-embedding micro-batching benchmark.
+
+Drives `batching.EmbeddingBatcher` the way concurrent chats do: each of
+`--concurrency` clients embeds one query, waits for its vector, then sends
+the next, until `--requests` queries have been answered. Every batcher
+setting (`batch_size:wait_ms`; `1:0` is the unbatched baseline) is run at
+every concurrency level, and the report gives throughput, latency
+percentiles and the mean number of queries per forward pass.
+
+With `--fake-embeddings` the model is replaced by a serialized stand-in
+that costs `--call-ms` per forward pass plus `--item-ms` per query, so the
+scheduling can be measured without MiniLM.
+
+Usage (from backend/):
+    python -m benchmarks.embedding_batching --concurrency 1 4 16 64
+    python -m benchmarks.embedding_batching --fake-embeddings --settings 1:0 32:0 32:5 64:10
+"""
+
+import argparse
+import asyncio
+import contextlib
+import json
+import os
+import sys
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(BACKEND_DIR))
+
+from benchmarks.corpus import QUARTERS, REGIONS, TOPICS  # noqa: E402
+from benchmarks.fakes import HashEmbeddings, TimedEmbeddings  # noqa: E402
+from benchmarks.pipeline import percentile  # noqa: E402
+
+
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 4, 16, 64], help="concurrent clients")
+    parser.add_argument("--requests", type=int, default=400, help="queries per run")
+    parser.add_argument(
+        "--settings", nargs="+", default=["1:0", "32:0", "32:2", "32:5", "32:10"],
+        help="batcher settings as batch_size:wait_ms",
+    )
+    parser.add_argument("--fake-embeddings", action="store_true", help="use a timed stand-in instead of MiniLM")
+    parser.add_argument("--call-ms", type=float, default=8.0, help="stand-in cost per forward pass")
+    parser.add_argument("--item-ms", type=float, default=0.4, help="stand-in cost per query in a pass")
+    parser.add_argument("--output", type=Path, help="write the JSON report here")
+    return parser.parse_args(argv)
+
+
+def parse_setting(value: str) -> Tuple[int, float]:
+    batch, _, wait = value.partition(":")
+    return int(batch), float(wait or 0)
+
+
+def queries(count: int) -> List[str]:
+    """Distinct, chat-like queries (no two clients embed the same text)."""
+    return [
+        f"What did {REGIONS[i % len(REGIONS)]} decide about the {TOPICS[i % len(TOPICS)]} "
+        f"in {QUARTERS[i % len(QUARTERS)]} (question {i})?"
+        for i in range(count)
+    ]
+
+
+def batch_totals(observability) -> Tuple[float, float]:
+    """(passes, queries) recorded by the batch-size histogram so far."""
+    passes = total = 0.0
+    for metric in observability.EMBED_BATCH_SIZE.collect():
+        for sample in metric.samples:
+            if sample.name.endswith("_count"):
+                passes = sample.value
+            elif sample.name.endswith("_sum"):
+                total = sample.value
+    return passes, total
+
+
+async def bench_setting(
+    batcher,
+    observability,
+    texts: List[str],
+    concurrency: int,
+) -> Dict[str, Any]:
+    latencies: List[float] = []
+    cursor = iter(range(len(texts)))
+
+    async def client() -> None:
+        for i in cursor:
+            start = time.perf_counter()
+            await batcher.embed(texts[i])
+            latencies.append(time.perf_counter() - start)
+
+    passes_before, queries_before = batch_totals(observability)
+    start = time.perf_counter()
+    await asyncio.gather(*(client() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - start
+    passes_after, queries_after = batch_totals(observability)
+
+    ms = [latency * 1000 for latency in latencies]
+    passes = passes_after - passes_before
+    return {
+        "concurrency": concurrency,
+        "seconds": round(elapsed, 4),
+        "queries_per_sec": round(len(latencies) / elapsed, 2),
+        "p50_ms": round(percentile(ms, 50), 2),
+        "p95_ms": round(percentile(ms, 95), 2),
+        "p99_ms": round(percentile(ms, 99), 2),
+        "forward_passes": int(passes),
+        "mean_batch": round((queries_after - queries_before) / passes, 2) if passes else 0.0,
+    }
+
+
+async def run(args: argparse.Namespace) -> Dict[str, Any]:
+    os.environ.setdefault("GROQ_API_KEY", "benchmark-stub")
+    os.environ.setdefault("LOG_LEVEL", "WARNING")
+    import observability
+    from batching import EmbeddingBatcher
+
+    if args.fake_embeddings:
+        embeddings = TimedEmbeddings(HashEmbeddings(), call_ms=args.call_ms, item_ms=args.item_ms)
+    else:
+        from service import get_embeddings
+        embeddings = get_embeddings()
+    texts = queries(args.requests)
+    embeddings.embed_query("warm-up")  # model load and first-call overhead are not measured
+
+    results = []
+    for setting in args.settings:
+        batch_size, wait_ms = parse_setting(setting)
+        runs = []
+        for concurrency in args.concurrency:
+            batcher = EmbeddingBatcher(lambda: embeddings, max_batch=batch_size, max_wait_ms=wait_ms)
+            try:
+                runs.append(await bench_setting(batcher, observability, texts, concurrency))
+            finally:
+                batcher.close()
+        results.append({"batch_size": batch_size, "wait_ms": wait_ms, "runs": runs})
+
+    # Throughput of each setting relative to the unbatched baseline, per concurrency level
+    baseline = next((r for r in results if r["batch_size"] == 1), None)
+    if baseline:
+        for result in results:
+            for run_, base in zip(result["runs"], baseline["runs"]):
+                run_["speedup"] = round(run_["queries_per_sec"] / base["queries_per_sec"], 2)
+
+    return {
+        "requests": args.requests,
+        "embeddings": f"timed({args.call_ms}+{args.item_ms}/query ms)" if args.fake_embeddings else "minilm",
+        "results": results,
+    }
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    args = parse_args(argv)
+    # Keep stdout clean for the JSON report; backend modules print at import
+    with contextlib.redirect_stdout(sys.stderr):
+        report = asyncio.run(run(args))
+    payload = json.dumps(report, indent=2)
+    print(payload)
+    if args.output:
+        args.output.write_text(payload)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
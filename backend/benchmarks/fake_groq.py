@@ -0,0 +1,176 @@
+"""
+Local stand-in for the Groq chat-completions API.
+
+Serves `POST /openai/v1/chat/completions` with the response shape the
+Groq SDK expects, so the backend runs unchanged with
+`GROQ_API_BASE=http://127.0.0.1:<port>`. Each reply takes `latency`
+seconds plus its completion tokens at `token_rate` tokens/s. Requests over
+`rpm` per minute, or a random `error_rate` share of them, get a 429 with
+a Retry-After header, like the real API's rate limits. `/stats` reports
+what was served.
+
+Usage (from backend/):
+    python -m benchmarks.fake_groq --port 8090 --latency 0.3 --token-rate 500 --rpm 300
+"""
+
+import argparse
+import asyncio
+import random
+import sys
+import time
+import uuid
+from dataclasses import asdict, dataclass
+from typing import Any, Dict, List, Optional
+
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse
+
+
+@dataclass
+class FakeGroqSettings:
+    latency: float = 0.2  # seconds before the first token
+    token_rate: float = 500.0  # completion tokens per second
+    completion_tokens: int = 150  # mean reply length (capped by max_tokens)
+    rpm: float = 0.0  # requests per minute before 429s; 0 = unlimited
+    error_rate: float = 0.0  # share of requests answered with a 429 anyway
+    seed: int = 0
+
+
+@dataclass
+class FakeGroqStats:
+    requests: int = 0
+    completed: int = 0
+    rate_limited: int = 0
+    injected_errors: int = 0
+    prompt_tokens: int = 0
+    completion_tokens: int = 0
+    in_flight: int = 0
+    max_in_flight: int = 0
+
+
+def _rate_limited(message: str, retry_after: float) -> JSONResponse:
+    return JSONResponse(
+        status_code=429,
+        content={"error": {"message": message, "type": "requests", "code": "rate_limit_exceeded"}},
+        headers={"retry-after": f"{max(retry_after, 0.01):.2f}"},
+    )
+
+
+def _prompt_tokens(messages: List[Dict[str, Any]]) -> int:
+    return sum(len(str(message.get("content") or "")) for message in messages) // 4 + 1
+
+
+def create_app(settings: Optional[FakeGroqSettings] = None) -> FastAPI:
+    """A fake Groq API; `app.state.stats` counts what it served."""
+    settings = settings or FakeGroqSettings()
+    rng = random.Random(settings.seed)
+    stats = FakeGroqStats()
+    # Token bucket for the per-minute request limit, one minute of burst
+    bucket = {"tokens": settings.rpm, "updated": time.monotonic()}
+
+    app = FastAPI(title="fake-groq")
+    app.state.settings = settings
+    app.state.stats = stats
+
+    def admit() -> float:
+        """0 if the request may run, else seconds until it could."""
+        if settings.rpm <= 0:
+            return 0.0
+        now = time.monotonic()
+        rate = settings.rpm / 60
+        bucket["tokens"] = min(settings.rpm, bucket["tokens"] + (now - bucket["updated"]) * rate)
+        bucket["updated"] = now
+        if bucket["tokens"] >= 1:
+            bucket["tokens"] -= 1
+            return 0.0
+        return (1 - bucket["tokens"]) / rate
+
+    @app.post("/openai/v1/chat/completions")
+    async def chat_completions(request: Request):
+        body = await request.json()
+        stats.requests += 1
+        if settings.error_rate and rng.random() < settings.error_rate:
+            stats.injected_errors += 1
+            return _rate_limited("Rate limit reached (injected)", rng.uniform(0.05, 0.5))
+        wait = admit()
+        if wait:
+            stats.rate_limited += 1
+            return _rate_limited("Rate limit reached for requests per minute", wait)
+
+        prompt_tokens = _prompt_tokens(body.get("messages") or [])
+        completion_tokens = max(1, int(settings.completion_tokens * rng.uniform(0.5, 1.5)))
+        if body.get("max_tokens"):
+            completion_tokens = min(completion_tokens, int(body["max_tokens"]))
+
+        stats.in_flight += 1
+        stats.max_in_flight = max(stats.max_in_flight, stats.in_flight)
+        try:
+            await asyncio.sleep(settings.latency + completion_tokens / max(settings.token_rate, 1e-6))
+        finally:
+            stats.in_flight -= 1
+        stats.completed += 1
+        stats.prompt_tokens += prompt_tokens
+        stats.completion_tokens += completion_tokens
+
+        return {
+            "id": f"chatcmpl-{uuid.uuid4().hex}",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": body.get("model", "fake"),
+            "choices": [{
+                "index": 0,
+                "message": {"role": "assistant", "content": " ".join(["lorem"] * completion_tokens)},
+                "logprobs": None,
+                "finish_reason": "stop",
+            }],
+            "usage": {
+                "prompt_tokens": prompt_tokens,
+                "completion_tokens": completion_tokens,
+                "total_tokens": prompt_tokens + completion_tokens,
+            },
+        }
+
+    @app.get("/stats")
+    async def get_stats():
+        return asdict(stats)
+
+    return app
+
+
+def add_arguments(parser: argparse.ArgumentParser, prefix: str = "") -> None:
+    """Flags for the fake's settings; `prefix` namespaces them inside another tool."""
+    defaults = FakeGroqSettings()
+    parser.add_argument(f"--{prefix}latency", type=float, default=defaults.latency, help="seconds before the first token")
+    parser.add_argument(f"--{prefix}token-rate", type=float, default=defaults.token_rate, help="completion tokens per second")
+    parser.add_argument(f"--{prefix}completion-tokens", type=int, default=defaults.completion_tokens, help="mean reply length")
+    parser.add_argument(f"--{prefix}rpm", type=float, default=defaults.rpm, help="requests per minute before 429s (0 = unlimited)")
+    parser.add_argument(f"--{prefix}error-rate", type=float, default=defaults.error_rate, help="share of requests given a 429 anyway")
+
+
+def settings_from(args: argparse.Namespace, prefix: str = "", seed: int = 0) -> FakeGroqSettings:
+    prefix = prefix.replace("-", "_")
+    return FakeGroqSettings(
+        latency=getattr(args, f"{prefix}latency"),
+        token_rate=getattr(args, f"{prefix}token_rate"),
+        completion_tokens=getattr(args, f"{prefix}completion_tokens"),
+        rpm=getattr(args, f"{prefix}rpm"),
+        error_rate=getattr(args, f"{prefix}error_rate"),
+        seed=seed,
+    )
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    import uvicorn
+
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8090)
+    parser.add_argument("--seed", type=int, default=0)
+    add_arguments(parser)
+    args = parser.parse_args(argv)
+    uvicorn.run(create_app(settings_from(args, seed=args.seed)), host=args.host, port=args.port, log_level="warning")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
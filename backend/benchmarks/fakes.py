@@ -0,0 +1,142 @@
+"""
+Stand-ins for the external services used by the pipeline.
+
+`StubChatModel` replaces the Groq client with a fixed-latency model that
+reports token usage like the real API. `HashEmbeddings` is a deterministic,
+model-free embedder for runs where MiniLM is unavailable or irrelevant;
+`LexicalEmbeddings` is its counterpart for runs that measure retrieval.
+`TimedEmbeddings` adds the cost profile of a model forward pass, for runs
+that measure how embedding calls are scheduled.
+"""
+
+import asyncio
+import hashlib
+import re
+import threading
+import time
+from typing import Any, List, Optional
+
+import numpy as np
+from langchain_core.callbacks import AsyncCallbackManagerForLLMRun, CallbackManagerForLLMRun
+from langchain_core.embeddings import Embeddings
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage, BaseMessage
+from langchain_core.outputs import ChatGeneration, ChatResult
+
+
+EMBEDDING_DIM = 384
+
+
+class StubChatModel(BaseChatModel):
+    """Chat model that sleeps for `latency` seconds and echoes a short answer."""
+
+    latency: float = 0.05
+    completion_tokens: int = 120
+
+    @property
+    def _llm_type(self) -> str:
+        return "stub-groq"
+
+    def _result(self, messages: List[BaseMessage]) -> ChatResult:
+        prompt_chars = sum(len(str(m.content)) for m in messages)
+        content = " ".join(["lorem"] * self.completion_tokens)
+        return ChatResult(
+            generations=[ChatGeneration(message=AIMessage(content=content))],
+            llm_output={
+                "token_usage": {
+                    "prompt_tokens": prompt_chars // 4,
+                    "completion_tokens": self.completion_tokens,
+                },
+                "model_name": self._llm_type,
+            },
+        )
+
+    def _generate(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[CallbackManagerForLLMRun] = None,
+        **kwargs: Any,
+    ) -> ChatResult:
+        time.sleep(self.latency)
+        return self._result(messages)
+
+    async def _agenerate(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[AsyncCallbackManagerForLLMRun] = None,
+        **kwargs: Any,
+    ) -> ChatResult:
+        await asyncio.sleep(self.latency)
+        return self._result(messages)
+
+
+class HashEmbeddings(Embeddings):
+    """Unit vectors seeded from a hash of the text (no model download)."""
+
+    def _embed(self, text: str) -> List[float]:
+        seed = int.from_bytes(hashlib.blake2b(text.encode(), digest_size=8).digest(), "little")
+        vector = np.random.default_rng(seed).standard_normal(EMBEDDING_DIM).astype("float32")
+        return (vector / np.linalg.norm(vector)).tolist()
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return [self._embed(text) for text in texts]
+
+    def embed_query(self, text: str) -> List[float]:
+        return self._embed(text)
+
+
+STOP_WORDS = frozenset(
+    "a an and are as at be by for from in is it of on or that the this to was were what with".split()
+)
+
+
+class LexicalEmbeddings(Embeddings):
+    """Hashed bag-of-words vectors, so nearest neighbours share words (no model download)."""
+
+    def _embed(self, text: str) -> List[float]:
+        vector = np.zeros(EMBEDDING_DIM, dtype="float32")
+        for token in re.findall(r"[a-z0-9]+", text.lower()):
+            if token in STOP_WORDS:
+                continue
+            h = int.from_bytes(hashlib.blake2b(token.encode(), digest_size=8).digest(), "little")
+            vector[h % EMBEDDING_DIM] += 1.0 if (h >> 32) & 1 else -1.0
+        norm = np.linalg.norm(vector)
+        return (vector / norm if norm else vector).tolist()
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return [self._embed(text) for text in texts]
+
+    def embed_query(self, text: str) -> List[float]:
+        return self._embed(text)
+
+
+class TimedEmbeddings(Embeddings):
+    """
+    Wraps another embedder with the cost of a forward pass: a fixed
+    `call_ms` per call plus `item_ms` per text. Calls are serialized, like
+    passes that each use every CPU thread the model has.
+    """
+
+    def __init__(self, base: Embeddings, call_ms: float = 8.0, item_ms: float = 0.4):
+        self.base = base
+        self.call_ms = call_ms
+        self.item_ms = item_ms
+        self.calls = 0
+        self.texts = 0
+        self._lock = threading.Lock()
+
+    def _cost(self, count: int) -> None:
+        with self._lock:
+            self.calls += 1
+            self.texts += count
+            time.sleep((self.call_ms + self.item_ms * count) / 1000)
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        self._cost(len(texts))
+        return self.base.embed_documents(texts)
+
+    def embed_query(self, text: str) -> List[float]:
+        self._cost(1)
+        return self.base.embed_query(text)
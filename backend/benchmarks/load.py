@@ -0,0 +1,337 @@
+"""
+Load test: concurrent chatters and uploaders against a running backend.
+
+Starts the fake Groq API (`benchmarks.fake_groq`) and the FastAPI app in
+its own process, pointed at the fake and at a throwaway database and
+storage directory. Then `--chatters` virtual users send chat requests and
+`--uploaders` upload PDFs through the real HTTP routes, for `--duration`
+seconds. Each virtual user has its own `X-API-Key`, so per-client
+admission limits apply to it as they would to a real client.
+
+Every `--interval` seconds a line goes to stderr with throughput, latency
+and errors of that window. The JSON report on stdout repeats that
+timeline and adds totals per route, status counts, what the fake Groq
+served, and per-stage server timings scraped from `/metrics`.
+
+Usage (from backend/):
+    python -m benchmarks.load --chatters 16 --uploaders 2 --duration 60
+    python -m benchmarks.load --fake-embeddings --groq-latency 0.5 --groq-rpm 300 --groq-error-rate 0.02
+    python -m benchmarks.load --url http://localhost:8000 --chatters 32   # an already running backend
+"""
+
+import argparse
+import asyncio
+import contextlib
+import itertools
+import json
+import os
+import random
+import re
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from collections import Counter
+from pathlib import Path
+from typing import Any, Dict, List, NamedTuple, Optional
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(BACKEND_DIR))
+
+from benchmarks import fake_groq  # noqa: E402
+from benchmarks.corpus import TOPICS, generate_corpus  # noqa: E402
+from benchmarks.pipeline import percentile  # noqa: E402
+
+
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--chatters", type=int, default=8, help="concurrent chat users")
+    parser.add_argument("--uploaders", type=int, default=1, help="concurrent uploading users")
+    parser.add_argument("--sessions", type=int, default=4, help="sessions the users spread across")
+    parser.add_argument("--duration", type=float, default=30, help="seconds of load after setup")
+    parser.add_argument("--interval", type=float, default=5, help="seconds per timeline window")
+    parser.add_argument("--chat-think", type=float, default=1.0, help="mean pause between a user's chats (s)")
+    parser.add_argument("--upload-think", type=float, default=5.0, help="mean pause between a user's uploads (s)")
+    parser.add_argument("--docs", type=int, default=12, help="PDFs in the upload pool")
+    parser.add_argument("--pages", type=int, default=6, help="pages per PDF")
+    parser.add_argument("--timeout", type=float, default=120, help="per-request timeout (s)")
+    parser.add_argument("--url", help="load an already running backend instead of starting one")
+    parser.add_argument("--database-url", help="backend DATABASE_URL (default: a throwaway SQLite file)")
+    parser.add_argument("--no-admission", action="store_true", help="start the backend with rate limits off")
+    parser.add_argument("--fake-embeddings", action="store_true", help="timed stand-in instead of MiniLM")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", type=Path, help="write the JSON report here")
+    parser.add_argument("--serve", action="store_true", help=argparse.SUPPRESS)  # backend process mode
+    parser.add_argument("--port", type=int, default=0, help=argparse.SUPPRESS)
+    fake_groq.add_arguments(parser, prefix="groq-")
+    return parser.parse_args(argv)
+
+
+class Sample(NamedTuple):
+    kind: str  # "chat" or "upload"
+    finished: float  # seconds since the load started
+    latency: float
+    status: int  # HTTP status; 0 for timeouts and connection errors
+
+
+# Processes
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def serve_backend(port: int, fake_embeddings: bool) -> None:
+    """Run the app (backend process mode); env is set up by `start_backend`."""
+    import uvicorn
+    import service
+
+    if fake_embeddings:
+        from benchmarks.fakes import HashEmbeddings, TimedEmbeddings
+        embeddings = TimedEmbeddings(HashEmbeddings())
+        service.get_embeddings = lambda: embeddings
+    from main import app
+
+    uvicorn.run(app, host="127.0.0.1", port=port, log_level="warning")
+
+
+def start_backend(args: argparse.Namespace, workdir: Path, groq_url: str) -> "tuple[subprocess.Popen, str]":
+    port = free_port()
+    env = dict(
+        os.environ,
+        GROQ_API_KEY="load-test",
+        GROQ_API_BASE=groq_url,
+        DATABASE_URL=args.database_url or f"sqlite+aiosqlite:///{workdir / 'load.db'}",
+        STORAGE_DIR=str(workdir / "storage"),
+        FAISS_INDEX_DIR=str(workdir / "faiss_indexes"),
+        LOG_LEVEL=os.environ.get("LOG_LEVEL", "WARNING"),
+    )
+    if args.no_admission:
+        env["RATE_LIMITS_ENABLED"] = "0"
+    command = [sys.executable, "-m", "benchmarks.load", "--serve", "--port", str(port)]
+    if args.fake_embeddings:
+        command.append("--fake-embeddings")
+    process = subprocess.Popen(command, cwd=BACKEND_DIR, env=env, stdout=sys.stderr)
+    return process, f"http://127.0.0.1:{port}"
+
+
+def start_fake_groq(settings: fake_groq.FakeGroqSettings):
+    """Serve the fake Groq API from a background thread; returns (server, app, url)."""
+    import uvicorn
+
+    app = fake_groq.create_app(settings)
+    port = free_port()
+    server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=port, log_level="warning"))
+    threading.Thread(target=server.run, name="fake-groq", daemon=True).start()
+    return server, app, f"http://127.0.0.1:{port}"
+
+
+async def wait_ready(client, url: str, process: Optional[subprocess.Popen], timeout: float = 300) -> None:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process is not None and process.poll() is not None:
+            raise RuntimeError(f"backend exited with code {process.returncode}")
+        with contextlib.suppress(Exception):
+            if (await client.get(f"{url}/health")).status_code == 200:
+                return
+        await asyncio.sleep(0.2)
+    raise RuntimeError(f"{url} did not become ready in {timeout:.0f}s")
+
+
+# Workload
+
+async def setup_sessions(client, url: str, pdfs: List[Path], count: int) -> List[int]:
+    """Create the sessions and give each one document, so every chat has something to search."""
+    session_ids = []
+    for i in range(count):
+        response = await client.post(f"{url}/sessions", json={"name": f"load-{i}"}, headers={"X-API-Key": "setup"})
+        response.raise_for_status()
+        session_id = response.json()["id"]
+        pdf = pdfs[i % len(pdfs)]
+        with open(pdf, "rb") as handle:
+            response = await client.post(
+                f"{url}/sessions/{session_id}/upload",
+                files={"file": (pdf.name, handle, "application/pdf")},
+                headers={"X-API-Key": "setup"},
+            )
+        response.raise_for_status()
+        session_ids.append(session_id)
+    return session_ids
+
+
+async def drive(client, url: str, args: argparse.Namespace, session_ids: List[int], pdfs: List[Path]) -> List[Sample]:
+    samples: List[Sample] = []
+    rng = random.Random(args.seed)
+    queries = [f"What was decided about the {topic}?" for topic in TOPICS]
+    start = time.perf_counter()
+    stop_at = start + args.duration
+
+    async def request(kind: str, call) -> None:
+        sent = time.perf_counter()
+        try:
+            status = (await call()).status_code
+        except Exception:
+            status = 0
+        done = time.perf_counter()
+        samples.append(Sample(kind, done - start, done - sent, status))
+
+    async def pause(mean: float) -> None:
+        if mean > 0:
+            await asyncio.sleep(min(rng.expovariate(1 / mean), max(0.0, stop_at - time.perf_counter())))
+
+    async def chatter(user: int) -> None:
+        headers = {"X-API-Key": f"chatter-{user}"}
+        session_id = session_ids[user % len(session_ids)]
+        await pause(args.chat_think)  # stagger the first requests
+        while time.perf_counter() < stop_at:
+            query = rng.choice(queries)
+            await request("chat", lambda: client.post(
+                f"{url}/sessions/{session_id}/chat", json={"query": query}, headers=headers,
+            ))
+            await pause(args.chat_think)
+
+    async def uploader(user: int) -> None:
+        headers = {"X-API-Key": f"uploader-{user}"}
+        await pause(args.upload_think)
+        while time.perf_counter() < stop_at:
+            session_id = rng.choice(session_ids)
+            pdf = rng.choice(pdfs)
+            data = pdf.read_bytes()
+            await request("upload", lambda: client.post(
+                f"{url}/sessions/{session_id}/upload",
+                files={"file": (pdf.name, data, "application/pdf")},
+                headers=headers,
+            ))
+            await pause(args.upload_think)
+
+    async def progress() -> None:
+        for window in itertools.count(1):
+            await asyncio.sleep(max(0.0, start + window * args.interval - time.perf_counter()))
+            row = window_stats(samples, (window - 1) * args.interval, window * args.interval)
+            print(format_window(row), file=sys.stderr)
+            if time.perf_counter() >= stop_at:
+                return
+
+    reporter = asyncio.create_task(progress())
+    await asyncio.gather(
+        *(chatter(i) for i in range(args.chatters)),
+        *(uploader(i) for i in range(args.uploaders)),
+    )
+    reporter.cancel()
+    return samples
+
+
+# Reporting
+
+def summarize(samples: List[Sample], seconds: float) -> Dict[str, Any]:
+    ok = [s.latency * 1000 for s in samples if 200 <= s.status < 300]
+    statuses = Counter(str(s.status) if s.status else "error" for s in samples)
+    return {
+        "requests": len(samples),
+        "ok": len(ok),
+        "ok_per_sec": round(len(ok) / seconds, 3) if seconds else 0.0,
+        "error_rate": round(1 - len(ok) / len(samples), 4) if samples else 0.0,
+        "p50_ms": round(percentile(ok, 50), 1),
+        "p95_ms": round(percentile(ok, 95), 1),
+        "p99_ms": round(percentile(ok, 99), 1),
+        "max_ms": round(max(ok, default=0.0), 1),
+        "statuses": dict(sorted(statuses.items())),
+    }
+
+
+def window_stats(samples: List[Sample], begin: float, end: float) -> Dict[str, Any]:
+    row: Dict[str, Any] = {"t": round(end, 1)}
+    for kind in ("chat", "upload"):
+        window = [s for s in samples if s.kind == kind and begin <= s.finished < end]
+        stats = summarize(window, end - begin)
+        row[kind] = {key: stats[key] for key in ("ok_per_sec", "p50_ms", "p95_ms", "p99_ms", "error_rate", "statuses")}
+    return row
+
+
+def format_window(row: Dict[str, Any]) -> str:
+    chat, upload = row["chat"], row["upload"]
+    return (
+        f"t={row['t']:>6}s  chat {chat['ok_per_sec']:>7.2f}/s p50 {chat['p50_ms']:>7.0f}ms "
+        f"p99 {chat['p99_ms']:>7.0f}ms err {chat['error_rate']:>6.1%}  "
+        f"upload {upload['ok_per_sec']:>5.2f}/s p99 {upload['p99_ms']:>7.0f}ms err {upload['error_rate']:>6.1%}"
+    )
+
+
+_STAGE_SAMPLE = re.compile(r'^briefly_stage_duration_seconds_(sum|count)\{stage="([^"]+)"\} ([0-9.eE+-]+)$')
+
+
+def server_stages(metrics_text: str) -> Dict[str, Dict[str, float]]:
+    """Per-stage count and mean latency from the backend's /metrics payload."""
+    totals: Dict[str, Dict[str, float]] = {}
+    for line in metrics_text.splitlines():
+        match = _STAGE_SAMPLE.match(line)
+        if match:
+            field, stage, value = match.groups()
+            totals.setdefault(stage, {})[field] = float(value)
+    return {
+        stage: {"count": int(values.get("count", 0)), "mean_ms": round(values["sum"] / values["count"] * 1000, 2)}
+        for stage, values in sorted(totals.items()) if values.get("count")
+    }
+
+
+async def run(args: argparse.Namespace) -> Dict[str, Any]:
+    import httpx
+
+    groq_server = groq_app = backend = None
+    with tempfile.TemporaryDirectory(prefix="briefly-load-") as tmp:
+        workdir = Path(tmp)
+        url = args.url
+        if not url:
+            groq_server, groq_app, groq_url = start_fake_groq(fake_groq.settings_from(args, "groq-", seed=args.seed))
+            backend, url = start_backend(args, workdir, groq_url)
+        pdfs = generate_corpus(workdir / "corpus", args.docs, args.pages, seed=args.seed)
+
+        limits = httpx.Limits(max_connections=args.chatters + args.uploaders + 4)
+        try:
+            async with httpx.AsyncClient(timeout=args.timeout, limits=limits) as client:
+                await wait_ready(client, url, backend)
+                session_ids = await setup_sessions(client, url, pdfs, args.sessions)
+                started = time.perf_counter()
+                samples = await drive(client, url, args, session_ids, pdfs)
+                elapsed = time.perf_counter() - started
+                metrics = await client.get(f"{url}/metrics")
+        finally:
+            if backend is not None:
+                backend.terminate()
+                with contextlib.suppress(subprocess.TimeoutExpired):
+                    backend.wait(timeout=30)
+            if groq_server is not None:
+                groq_server.should_exit = True
+
+    windows = int(-(-elapsed // args.interval))
+    return {
+        "config": {k: str(v) if isinstance(v, Path) else v for k, v in vars(args).items() if k not in ("serve", "port")},
+        "seconds": round(elapsed, 2),
+        "chat": summarize([s for s in samples if s.kind == "chat"], elapsed),
+        "upload": summarize([s for s in samples if s.kind == "upload"], elapsed),
+        "timeline": [window_stats(samples, i * args.interval, (i + 1) * args.interval) for i in range(windows)],
+        "fake_groq": vars(groq_app.state.stats).copy() if groq_app else None,
+        "server_stages": server_stages(metrics.text) if metrics.status_code == 200 else {},
+    }
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    args = parse_args(argv)
+    if args.serve:
+        serve_backend(args.port, args.fake_embeddings)
+        return 0
+    # Keep stdout clean for the JSON report; backend modules print at import
+    with contextlib.redirect_stdout(sys.stderr):
+        report = asyncio.run(run(args))
+    payload = json.dumps(report, indent=2)
+    print(payload)
+    if args.output:
+        args.output.write_text(payload)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
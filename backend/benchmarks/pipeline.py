@@ -0,0 +1,260 @@
+"""
+In-process benchmark for `ingest_pdf` and `chat_with_documents`.
+
+Generates a synthetic PDF corpus, ingests it into a throwaway SQLite
+database and FAISS directory with a stubbed Groq model, then fires chat
+requests at a fixed concurrency. Results are printed (and optionally
+written) as JSON; pass `--baseline` to fail when a run regresses.
+
+Usage (from backend/):
+    python -m benchmarks.pipeline --docs 20 --pages 10 --chat-requests 200 --concurrency 8
+    python -m benchmarks.pipeline --output new.json --baseline old.json
+"""
+
+import argparse
+import asyncio
+import contextlib
+import importlib
+import json
+import os
+import platform
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(BACKEND_DIR))
+
+from benchmarks.corpus import TOPICS, generate_corpus  # noqa: E402
+from benchmarks.fakes import HashEmbeddings, StubChatModel  # noqa: E402
+
+
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--docs", type=int, default=10, help="number of PDFs to generate")
+    parser.add_argument("--pages", type=int, default=8, help="pages per PDF")
+    parser.add_argument("--sessions", type=int, default=2, help="sessions the PDFs are spread across")
+    parser.add_argument("--chat-requests", type=int, default=100, help="total chat requests")
+    parser.add_argument("--concurrency", type=int, default=8, help="concurrent chat requests")
+    parser.add_argument("--llm-latency", type=float, default=0.05, help="stub LLM latency in seconds")
+    parser.add_argument("--bulk", action="store_true", help="ingest each session's PDFs in one bulk pass")
+    parser.add_argument("--fake-embeddings", action="store_true", help="use hash embeddings instead of MiniLM")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", type=Path, help="write the JSON report here")
+    parser.add_argument("--baseline", type=Path, help="compare against a previous JSON report")
+    parser.add_argument("--tolerance", type=float, default=0.15, help="allowed relative regression")
+    return parser.parse_args(argv)
+
+
+def percentile(samples: List[float], pct: float) -> float:
+    """Nearest-rank percentile of `samples` (pct in 0-100)."""
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    rank = max(1, int(round(pct / 100 * len(ordered) + 0.5)))
+    return ordered[min(rank, len(ordered)) - 1]
+
+
+def peak_rss_mb() -> float:
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports KiB, macOS reports bytes
+    return rss / (1024 * 1024) if sys.platform == "darwin" else rss / 1024
+
+
+def git_revision() -> Optional[str]:
+    try:
+        return subprocess.check_output(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=BACKEND_DIR, stderr=subprocess.DEVNULL, text=True,
+        ).strip()
+    except Exception:
+        return None
+
+
+def load_backend(workdir: Path, args: argparse.Namespace):
+    """Import the backend against an isolated database and index directory."""
+    os.environ["DATABASE_URL"] = f"sqlite+aiosqlite:///{workdir / 'bench.db'}"
+    os.environ.setdefault("GROQ_API_KEY", "benchmark-stub")
+    os.environ.setdefault("LOG_LEVEL", "WARNING")
+
+    database = importlib.import_module("database")
+    service = importlib.import_module("service")
+    observability = importlib.import_module("observability")
+
+    faiss_store = importlib.import_module("vectorstores").get_vector_store("faiss")
+    faiss_store.root = workdir / "faiss_indexes"
+    faiss_store.root.mkdir(parents=True, exist_ok=True)
+    service.get_llm = lambda: StubChatModel(latency=args.llm_latency)
+    if args.fake_embeddings:
+        embeddings = HashEmbeddings()
+        service.get_embeddings = lambda: embeddings
+    return database, service, observability
+
+
+def stage_breakdown(observability) -> Dict[str, Dict[str, float]]:
+    stages: Dict[str, Dict[str, float]] = {}
+    for metric in observability.STAGE_LATENCY.collect():
+        for sample in metric.samples:
+            stage = sample.labels.get("stage")
+            if sample.name.endswith("_count"):
+                stages.setdefault(stage, {})["count"] = sample.value
+            elif sample.name.endswith("_sum"):
+                stages.setdefault(stage, {})["total_s"] = round(sample.value, 4)
+    return stages
+
+
+async def bench_ingest(database, service, pdfs: List[Path], args: argparse.Namespace) -> Dict[str, Any]:
+    from models import Session
+    from vectorstores import store_for
+
+    async with database.async_session() as db:
+        # Every session gets at least one document so all of them are chat-able
+        sessions = [Session(name=f"bench-{i}") for i in range(max(1, min(args.sessions, len(pdfs))))]
+        db.add_all(sessions)
+        await db.commit()
+        session_ids = [s.id for s in sessions]
+
+    start = time.perf_counter()
+    if args.bulk:
+        for n, session_id in enumerate(session_ids):
+            batch = [str(pdf) for pdf in pdfs[n::len(session_ids)]]
+            async with database.async_session() as db:
+                await service.index_documents(session_id, await service.extract_pdfs(batch), db)
+    else:
+        for i, pdf in enumerate(pdfs):
+            async with database.async_session() as db:
+                await service.ingest_pdf(session_ids[i % len(session_ids)], str(pdf), db)
+    elapsed = time.perf_counter() - start
+
+    chunks = 0
+    async with database.async_session() as db:
+        for session_id in session_ids:
+            session = await service.get_session_row(session_id, db)
+            chunks += await store_for(session).count(session, db)
+
+    pages = len(pdfs) * args.pages
+    return {
+        "session_ids": session_ids,
+        "documents": len(pdfs),
+        "pages": pages,
+        "chunks": chunks,
+        "seconds": round(elapsed, 4),
+        "pages_per_sec": round(pages / elapsed, 3),
+        "chunks_per_sec": round(chunks / elapsed, 3),
+    }
+
+
+async def bench_chat(database, service, session_ids: List[int], args: argparse.Namespace) -> Dict[str, Any]:
+    queries = [f"What was decided about the {topic}?" for topic in TOPICS]
+    semaphore = asyncio.Semaphore(args.concurrency)
+    latencies: List[float] = []
+    errors = 0
+
+    async def one(i: int) -> None:
+        nonlocal errors
+        async with semaphore:
+            start = time.perf_counter()
+            try:
+                async with database.async_session() as db:
+                    await service.chat_with_documents(
+                        session_ids[i % len(session_ids)], queries[i % len(queries)], db,
+                    )
+            except Exception:
+                errors += 1
+                return
+            latencies.append(time.perf_counter() - start)
+
+    # Warm-up request so model loading is not counted
+    await one(0)
+    latencies.clear()
+
+    start = time.perf_counter()
+    await asyncio.gather(*(one(i) for i in range(args.chat_requests)))
+    elapsed = time.perf_counter() - start
+
+    ms = [latency * 1000 for latency in latencies]
+    return {
+        "requests": args.chat_requests,
+        "concurrency": args.concurrency,
+        "errors": errors,
+        "seconds": round(elapsed, 4),
+        "requests_per_sec": round(len(latencies) / elapsed, 3),
+        "p50_ms": round(percentile(ms, 50), 2),
+        "p95_ms": round(percentile(ms, 95), 2),
+        "p99_ms": round(percentile(ms, 99), 2),
+        "max_ms": round(max(ms, default=0.0), 2),
+    }
+
+
+def compare(report: Dict[str, Any], baseline: Dict[str, Any], tolerance: float) -> List[str]:
+    """Return human-readable regressions of `report` against `baseline`."""
+    checks = [
+        # (section, key, higher_is_better)
+        ("ingest", "pages_per_sec", True),
+        ("ingest", "chunks_per_sec", True),
+        ("chat", "requests_per_sec", True),
+        ("chat", "p95_ms", False),
+        ("chat", "p99_ms", False),
+    ]
+    regressions = []
+    for section, key, higher_is_better in checks:
+        old = baseline.get(section, {}).get(key)
+        new = report.get(section, {}).get(key)
+        if not old or new is None:
+            continue
+        change = (new - old) / old
+        if (higher_is_better and change < -tolerance) or (not higher_is_better and change > tolerance):
+            regressions.append(f"{section}.{key}: {old} -> {new} ({change:+.1%})")
+    old_rss, new_rss = baseline.get("peak_rss_mb"), report.get("peak_rss_mb")
+    if old_rss and new_rss and (new_rss - old_rss) / old_rss > tolerance:
+        regressions.append(f"peak_rss_mb: {old_rss} -> {new_rss}")
+    return regressions
+
+
+async def run(args: argparse.Namespace) -> Dict[str, Any]:
+    with tempfile.TemporaryDirectory(prefix="briefly-bench-") as tmp:
+        workdir = Path(tmp)
+        database, service, observability = load_backend(workdir, args)
+        await database.init_db()
+        pdfs = generate_corpus(workdir / "corpus", args.docs, args.pages, seed=args.seed)
+
+        ingest = await bench_ingest(database, service, pdfs, args)
+        chat = await bench_chat(database, service, ingest.pop("session_ids"), args)
+        await database.close_db()
+        service.close_ingest_pool()
+
+    return {
+        "git_revision": git_revision(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "config": {k: str(v) if isinstance(v, Path) else v for k, v in vars(args).items()},
+        "ingest": ingest,
+        "chat": chat,
+        "stages": stage_breakdown(observability),
+        "peak_rss_mb": round(peak_rss_mb(), 1),
+    }
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    args = parse_args(argv)
+    # Keep stdout clean for the JSON report; backend modules print at import
+    with contextlib.redirect_stdout(sys.stderr):
+        report = asyncio.run(run(args))
+    payload = json.dumps(report, indent=2)
+    print(payload)
+    if args.output:
+        args.output.write_text(payload)
+
+    if args.baseline:
+        regressions = compare(report, json.loads(args.baseline.read_text()), args.tolerance)
+        for line in regressions:
+            print(f"[!] Regression: {line}", file=sys.stderr)
+        return 1 if regressions else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,184 @@
+"""
+Quantization benchmark: index memory against recall@k.
+
+Chunks a synthetic corpus, embeds it once, then builds the session index
+with each quantization through the same code path ingestion uses. Every
+probe query is searched against the exact float32 index, against the
+quantized index alone, and through `quantization.search` (quantized
+candidates re-ranked with the full-precision vectors, for the kinds in
+QUANT_EXACT_VECTORS). `disk_bytes` includes those vectors, so it can
+exceed the unquantized index. `recall_at_k` is
+the share of retrieved chunks that are as close as the exact k-th
+neighbour (so ties count as hits); `hit_rate` counts queries whose answer
+is in a retrieved chunk.
+
+Usage (from backend/):
+    python -m benchmarks.quantization --docs 40 --pages 10
+    python -m benchmarks.quantization --fake-embeddings --kinds none int8 pq --rerank-factor 8
+"""
+
+import argparse
+import contextlib
+import json
+import os
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(BACKEND_DIR))
+
+from benchmarks.corpus import Probe, generate_structured_pages, write_pdf  # noqa: E402
+from benchmarks.fakes import LexicalEmbeddings  # noqa: E402
+
+
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--docs", type=int, default=40, help="number of PDFs to generate")
+    parser.add_argument("--pages", type=int, default=10, help="pages per PDF")
+    parser.add_argument("--kinds", nargs="+", default=["none", "fp16", "int8", "pq"], help="quantizations to compare")
+    parser.add_argument("--k", type=int, default=None, help="results per query (default RETRIEVAL_K)")
+    parser.add_argument("--rerank-factor", type=int, default=None, help="candidates per result (default QUANT_RERANK_FACTOR)")
+    parser.add_argument("--fake-embeddings", action="store_true", help="use bag-of-words embeddings instead of MiniLM")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", type=Path, help="write the JSON report here")
+    return parser.parse_args(argv)
+
+
+def _normalize(text: str) -> str:
+    return " ".join(text.split())
+
+
+def _recall(found: List[int], distances: np.ndarray, kth: float, k: int) -> float:
+    return sum(1 for i in found if distances[i] <= kth + 1e-6) / k
+
+
+def bench_kind(
+    kind: str,
+    texts: List[str],
+    vectors: np.ndarray,
+    queries: np.ndarray,
+    probes: List[Probe],
+    embeddings,
+    k: int,
+) -> Dict[str, Any]:
+    import faiss
+    from langchain_community.vectorstores import FAISS
+    import quantization
+
+    pairs = list(zip(texts, vectors.tolist()))
+    metadatas = [{"row": i} for i in range(len(texts))]
+    with tempfile.TemporaryDirectory(prefix="briefly-quant-") as index_dir:
+        start = time.perf_counter()
+        store = FAISS.from_embeddings(pairs, embeddings, metadatas=metadatas)
+        if kind != "none":
+            quantization.apply_quantization(store, Path(index_dir), kind, vectors)
+        build_s = time.perf_counter() - start
+        index_bytes = len(faiss.serialize_index(store.index))
+
+        plain_recall, rerank_recall, hits, latencies = [], [], 0, []
+        for query, probe in zip(queries, probes):
+            # Exact distances to every chunk; the k-th smallest is the bar for recall
+            distances = ((vectors - query) ** 2).sum(axis=1)
+            kth = float(np.partition(distances, k - 1)[k - 1])
+            _, ids = store.index.search(query[None, :], k)
+            plain_recall.append(_recall([int(i) for i in ids[0] if i >= 0], distances, kth, k))
+
+            start = time.perf_counter()
+            docs = quantization.search(store, Path(index_dir), query.tolist(), k)
+            latencies.append(time.perf_counter() - start)
+            rerank_recall.append(_recall([doc.metadata["row"] for doc in docs], distances, kth, k))
+            chunks = [_normalize(doc.page_content) for doc in docs]
+            hits += any(all(_normalize(part) in chunk for part in probe.answer) for chunk in chunks)
+
+        vectors_file = Path(index_dir) / quantization.VECTORS_FILE
+        disk_bytes = index_bytes + (vectors_file.stat().st_size if vectors_file.exists() else 0)
+
+    return {
+        "kind": kind,
+        "index": quantization.index_kind(store.index),
+        "index_bytes": index_bytes,
+        "bytes_per_vector": round(index_bytes / len(texts), 1),  # includes codebooks
+        "code_bytes": store.index.sa_code_size(),
+        "disk_bytes": disk_bytes,
+        "build_s": round(build_s, 4),
+        "recall_at_k": round(statistics.fmean(plain_recall), 4),
+        "recall_at_k_reranked": round(statistics.fmean(rerank_recall), 4),
+        "hit_rate": round(hits / max(1, len(probes)), 4),
+        "search_ms_p50": round(statistics.median(latencies) * 1000, 3),
+    }
+
+
+def run(args: argparse.Namespace) -> Dict[str, Any]:
+    os.environ.setdefault("GROQ_API_KEY", "benchmark-stub")
+    os.environ.setdefault("LOG_LEVEL", "WARNING")
+    if args.rerank_factor:
+        os.environ["QUANT_RERANK_FACTOR"] = str(args.rerank_factor)
+    from config import RETRIEVAL_K, QUANT_RERANK_FACTOR
+    from chunking import chunk_pages
+    from extraction import scan_pdf
+
+    k = args.k or RETRIEVAL_K
+    if args.fake_embeddings:
+        embeddings = LexicalEmbeddings()
+    else:
+        from service import get_embeddings
+        embeddings = get_embeddings()
+
+    texts: List[str] = []
+    probes: List[Probe] = []
+    with tempfile.TemporaryDirectory(prefix="briefly-quant-corpus-") as tmp:
+        for i in range(args.docs):
+            pages, doc_probes = generate_structured_pages(
+                args.pages, seed=args.seed * 100003 + i, first_section=len(probes) + 1,
+            )
+            path = Path(tmp) / f"pack_{i:04d}.pdf"
+            write_pdf(path, pages)
+            texts.extend(chunk.text for chunk in chunk_pages(scan_pdf(str(path)).pages))
+            probes.extend(doc_probes)
+
+    start = time.perf_counter()
+    vectors = np.asarray(embeddings.embed_documents(texts), dtype="float32")
+    queries = np.asarray([embeddings.embed_query(probe.query) for probe in probes], dtype="float32")
+    embed_s = time.perf_counter() - start
+
+    results = [bench_kind(kind, texts, vectors, queries, probes, embeddings, k) for kind in args.kinds]
+    baseline = next((r["index_bytes"] for r in results if r["kind"] == "none"), vectors.nbytes)
+    for result in results:
+        result["memory_saved"] = round(1 - result["index_bytes"] / baseline, 4)
+        # Negative when the exact vectors kept for re-ranking outweigh the smaller codes
+        result["disk_saved"] = round(1 - result["disk_bytes"] / baseline, 4)
+
+    return {
+        "docs": args.docs,
+        "pages": args.docs * args.pages,
+        "vectors": len(texts),
+        "dim": int(vectors.shape[1]),
+        "queries": len(probes),
+        "k": k,
+        "rerank_factor": QUANT_RERANK_FACTOR,
+        "embeddings": "lexical" if args.fake_embeddings else "minilm",
+        "embed_s": round(embed_s, 4),
+        "results": results,
+    }
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    args = parse_args(argv)
+    # Keep stdout clean for the JSON report; backend modules print at import
+    with contextlib.redirect_stdout(sys.stderr):
+        report = run(args)
+    payload = json.dumps(report, indent=2)
+    print(payload)
+    if args.output:
+        args.output.write_text(payload)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
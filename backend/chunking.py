@@ -0,0 +1,275 @@
+"""
+Structure-aware chunking of extracted PDF pages.
+
+Each page is split into blocks (headings, prose lines and table rows)
+using the line structure pypdf extracts. Blocks are then packed into
+chunks of up to `chunk_size` characters:
+
+- a chunk never spans two pages, so every chunk has an exact page number
+- chunks are cut between lines, so table rows and headings stay whole
+- a table that fits in one chunk is kept in one chunk, and a table that
+  does not fit repeats its header row in each part
+- sections are packed whole while they fit, and a chunk that continues a
+  section starts with the section heading (at most two short lines)
+- heading-like lines with no body under them (agendas, action items, a
+  table of contents) are kept as ordinary text
+- only prose that runs past a chunk boundary is overlapped, by whole
+  trailing lines up to `chunk_overlap` characters (PROSE_OVERLAP unless
+  the session sets one)
+
+With `CHUNKER=recursive`, the previous character splitter is used instead,
+over the whole document text.
+"""
+
+import re
+from dataclasses import dataclass
+from typing import List, Optional, Tuple
+
+from langchain_text_splitters import RecursiveCharacterTextSplitter
+
+from config import CHUNK_SIZE, CHUNK_OVERLAP, CHUNKER, PROSE_OVERLAP
+
+
+HEADING_MAX_CHARS = 80  # per heading line, and for a title merged with the heading below it
+HEADING_MAX_LINES = 2
+_MINOR_WORDS = {"a", "an", "and", "as", "at", "by", "for", "in", "of", "on", "or", "the", "to", "vs", "with"}
+_NUMBERED = re.compile(r"^(\d{1,3}(\.\d{1,3})*\.?|[IVX]{1,4}\.|[A-Z]\.)\s+[A-Z]")  # "4.2 Budget", "IV. Risks"
+_NUMERIC = re.compile(r"^[-+(]?[$€£]?\d[\d,.]*[%kKmM]?\)?$")
+_CELL_GAP = re.compile(r"\s{2,}|\t|\s?\|\s?")
+_SENTENCE_END = ".!?:;"
+
+
+@dataclass
+class Chunk:
+    """A piece of one page, ready to embed."""
+    text: str
+    page: Optional[int] = None  # 1-based; None when chunked without page structure
+
+
+@dataclass
+class _Block:
+    kind: str  # "heading", "text" or "table"
+    lines: List[str]
+    header: Optional[str] = None  # table header row, repeated when a table is split
+
+
+def _is_table_row(line: str) -> bool:
+    cells = [cell for cell in _CELL_GAP.split(line.strip()) if cell]
+    if len(cells) >= 3:
+        return True
+    tokens = line.split()
+    numeric = sum(1 for token in tokens if _NUMERIC.match(token))
+    # "EMEA 120,000 95,000 130,000", not "allocate $12,000 to the project"
+    return len(tokens) >= 3 and numeric >= 2 and numeric * 2 >= len(tokens)
+
+
+def _is_heading(line: str, after_break: bool) -> bool:
+    text = line.strip()
+    if not after_break or not text or len(text) > HEADING_MAX_CHARS or text[-1] in ".,;":
+        return False
+    if _NUMBERED.match(text):
+        return True
+    words = text.rstrip(":").split()
+    if not words or len(words) > 12:
+        return False
+    letters = sum(char.isalpha() for char in text)
+    if letters >= 3 and text.isupper():
+        return True
+    return words[0][0].isupper() and all(
+        word[0].isupper() or not word[0].isalpha() or word.lower() in _MINOR_WORDS for word in words
+    )
+
+
+def _is_header_row(line: str, row: str) -> bool:
+    """Whether `line`, just above table row `row`, is that table's column header."""
+    text = line.strip()
+    if not text or len(text) > HEADING_MAX_CHARS or text[-1] in _SENTENCE_END:
+        return False
+    return abs(len(text.split()) - len(row.split())) <= 2
+
+
+def _is_caption(line: str) -> bool:
+    text = line.strip()
+    return bool(text) and len(text) <= HEADING_MAX_CHARS and text[-1] not in ".!?;,"
+
+
+def split_blocks(page_text: str) -> List[_Block]:
+    """Classify the lines of one page into heading, prose and table blocks."""
+    blocks: List[_Block] = []
+    after_break = True  # start of page, blank line, or a line that ended a sentence
+    for raw in page_text.splitlines():
+        line = raw.rstrip()
+        if not line.strip():
+            after_break = True
+            if blocks and blocks[-1].kind == "text":
+                blocks.append(_Block("text", []))  # paragraph break
+            continue
+        current = blocks[-1] if blocks else None
+        if _is_table_row(line):
+            if current and current.kind == "table":
+                current.lines.append(line)
+            else:
+                table = _Block("table", [line])
+                if current and current.kind != "table" and current.lines and _is_header_row(current.lines[-1], line):
+                    # Column headers often look like a heading ("Region Q1 Q2 Total")
+                    table.header = current.lines.pop()
+                    table.lines.insert(0, table.header)
+                if current and current.kind == "text" and current.lines and _is_caption(current.lines[-1]):
+                    table.lines.insert(0, current.lines.pop())  # "Table 3: spend by region"
+                blocks.append(table)
+        elif _is_heading(line, after_break or (current is not None and current.kind != "text")):
+            if (
+                current and current.kind == "heading" and len(current.lines) < HEADING_MAX_LINES
+                and sum(len(part) + 1 for part in current.lines) + len(line) <= HEADING_MAX_CHARS
+            ):
+                current.lines.append(line)  # title followed by a section heading
+            else:
+                blocks.append(_Block("heading", [line]))
+        elif current and current.kind == "text":
+            current.lines.append(line)
+        else:
+            blocks.append(_Block("text", [line]))
+        after_break = line.strip()[-1] in _SENTENCE_END
+
+    blocks = [block for block in blocks if block.lines]
+    for i, block in enumerate(blocks):
+        # A lone numeric line is not a table
+        if block.kind == "table" and sum(1 for line in block.lines if _is_table_row(line)) < 2:
+            block.kind, block.header = "text", None
+        # A heading with nothing under it (agenda, list of short items, table of contents) is content
+        if block.kind == "heading" and (i + 1 == len(blocks) or blocks[i + 1].kind == "heading"):
+            block.kind = "text"
+    return blocks
+
+
+class _PageChunker:
+    """Packs one page's blocks into chunks."""
+
+    def __init__(self, page: int, chunk_size: int, chunk_overlap: int, heading: Optional[str]):
+        self.page = page
+        self.chunk_size = chunk_size
+        self.chunk_overlap = chunk_overlap
+        self.heading = heading
+        self.chunks: List[Chunk] = []
+        self.lines: List[str] = [heading] if heading else []
+        self.body = 0  # lines in `self.lines` beyond the carried heading/overlap
+        self.size = sum(len(line) + 1 for line in self.lines)
+
+    def fits(self, length: int) -> bool:
+        return self.size + length + 1 <= self.chunk_size
+
+    def flush(self, carry: Tuple[str, ...] = ()) -> None:
+        if self.body:
+            self.chunks.append(Chunk("\n".join(self.lines), self.page))
+        self.lines = ([self.heading] if self.heading else []) + list(carry)
+        self.size = sum(len(line) + 1 for line in self.lines)
+        self.body = 0
+
+    def add(self, line: str) -> None:
+        self.lines.append(line)
+        self.size += len(line) + 1
+        self.body += 1
+
+    def prose_overlap(self) -> Tuple[str, ...]:
+        """Trailing whole lines of the current chunk, up to `chunk_overlap` characters."""
+        carry: List[str] = []
+        total = 0
+        for line in reversed(self.lines[len(self.lines) - self.body:]):
+            total += len(line) + 1
+            if total > self.chunk_overlap:
+                break
+            carry.insert(0, line)
+        # Leave room for new content after the carried lines
+        return tuple(carry) if len(carry) < self.body else ()
+
+    def add_heading(self, line: str, section_chars: int) -> None:
+        # Start a new chunk at a heading unless the section still fits in this one;
+        # a chunk less than half full is filled anyway rather than left short
+        start_new = not self.body or (not self.fits(section_chars) and self.size >= self.chunk_size // 2)
+        self.heading = line
+        if start_new:
+            self.flush()  # the new chunk opens with this heading
+        else:
+            self.add(line)
+
+    def add_text(self, lines: List[str]) -> None:
+        for i, line in enumerate(lines):
+            if len(line) + 1 > self.chunk_size - len(self.heading or "") - 1:
+                self._add_long_line(line)
+                continue
+            if not self.fits(len(line)):
+                # Overlap only when the paragraph itself is cut
+                self.flush(self.prose_overlap() if i else ())
+                if not self.fits(len(line)):  # carried lines plus this one are too long
+                    self.flush()
+            self.add(line)
+
+    def _add_long_line(self, line: str) -> None:
+        # Text without usable line breaks: fall back to character splitting
+        self.flush()
+        prefix = len(self.heading) + 1 if self.heading else 0
+        size = max(1, self.chunk_size - prefix)
+        splitter = RecursiveCharacterTextSplitter(chunk_size=size, chunk_overlap=min(self.chunk_overlap, size // 2))
+        for piece in splitter.split_text(line):
+            self.add(piece)
+            self.flush()
+
+    def add_table(self, block: _Block) -> None:
+        prefix = len(self.heading) + 1 if self.heading else 0
+        total = sum(len(line) + 1 for line in block.lines)
+        if not self.fits(total) and prefix + total <= self.chunk_size:
+            self.flush()  # keep the whole table together in a fresh chunk
+        for i, row in enumerate(block.lines):
+            if len(row) + 1 > self.chunk_size - prefix:
+                self._add_long_line(row)
+                continue
+            if not self.fits(len(row)):
+                self.flush((block.header,) if block.header and i > 0 else ())
+                if not self.fits(len(row)):
+                    self.flush()
+            self.add(row)
+
+    def finish(self) -> Tuple[List[Chunk], Optional[str]]:
+        self.flush()
+        return self.chunks, self.heading
+
+
+def chunk_pages(
+    pages: List[str],
+    chunk_size: Optional[int] = None,
+    chunk_overlap: Optional[int] = None,
+    strategy: Optional[str] = None,
+) -> List[Chunk]:
+    """Split a document, given as one string per page, into chunks."""
+    chunk_size = chunk_size or CHUNK_SIZE
+    recursive = (strategy or CHUNKER) == "recursive"
+    if chunk_overlap is None:
+        chunk_overlap = CHUNK_OVERLAP if recursive else PROSE_OVERLAP
+    chunk_overlap = max(0, min(chunk_overlap, chunk_size // 2))
+    if recursive:
+        splitter = RecursiveCharacterTextSplitter(chunk_size=chunk_size, chunk_overlap=chunk_overlap)
+        text = "".join(page + "\n" for page in pages)
+        return [Chunk(piece) for piece in splitter.split_text(text)] if text.strip() else []
+
+    chunks: List[Chunk] = []
+    heading: Optional[str] = None  # carried across pages until the next heading
+    for number, page_text in enumerate(pages, start=1):
+        chunker = _PageChunker(number, chunk_size, chunk_overlap, heading)
+        blocks = split_blocks(page_text)
+        for i, block in enumerate(blocks):
+            if block.kind == "heading":
+                # Size of the section on this page: the heading and blocks up to the next one
+                section = [block]
+                for following in blocks[i + 1:]:
+                    if following.kind == "heading":
+                        break
+                    section.append(following)
+                section_chars = sum(len(line) + 1 for part in section for line in part.lines)
+                chunker.add_heading("\n".join(block.lines), section_chars)
+            elif block.kind == "table":
+                chunker.add_table(block)
+            else:
+                chunker.add_text(block.lines)
+        page_chunks, heading = chunker.finish()
+        chunks.extend(page_chunks)
+    return chunks
@@ -3,9 +3,14 @@ Development environment configuration.
 Load this to set up environment variables for local development.
 """
 
+import logging
 import os
 from dotenv import load_dotenv
 
+# observability imports this module, so use the `briefly` logger namespace directly. Logging is
+# configured after import; until then warnings still reach stderr through logging's last resort
+logger = logging.getLogger("briefly.config")
+
 # Load .env file from backend directory
 load_dotenv()
 
@@ -15,10 +20,10 @@ REQUIRED_VARS = ["GROQ_API_KEY"]
 
 missing_vars = [var for var in REQUIRED_VARS if not os.getenv(var)]
 if missing_vars:
-    print(f"[!] Missing environment variables: {', '.join(missing_vars)}")
-    print("    Please create a .env file in backend/ with these variables:")
-    for var in missing_vars:
-        print(f"    {var}=your_value_here")
+    logger.warning(
+        "Missing environment variables: %s. Please create a .env file in backend/ with %s",
+        ", ".join(missing_vars), ", ".join(f"{var}=your_value_here" for var in missing_vars),
+    )
 
 # Database
 DATABASE_URL = os.getenv(
@@ -33,11 +38,91 @@ GROQ_MODEL = os.getenv("GROQ_MODEL", "llama-3.1-8b-instant")
 
 # Vector Store
 EMBEDDINGS_MODEL = "sentence-transformers/all-MiniLM-L6-v2"
-CHUNK_SIZE = 1000
-CHUNK_OVERLAP = 200
+EMBEDDINGS_DIM = 384
+CHUNK_SIZE = int(os.getenv("CHUNK_SIZE", "1000"))  # characters; sessions can override
+CHUNK_OVERLAP = int(os.getenv("CHUNK_OVERLAP", "200"))  # characters; sessions can override
+# The structure chunker overlaps only prose cut across chunks, so it needs less by default
+PROSE_OVERLAP = int(os.getenv("PROSE_OVERLAP", str(CHUNK_OVERLAP // 2)))
+CHUNKER = os.getenv("CHUNKER", "structure").lower()  # "structure" or "recursive" (plain character splitter)
 RETRIEVAL_K = 5
+# Index quantization: "none" (float32), "fp16", "int8" or "pq"; sessions can override
+INDEX_QUANTIZATION = os.getenv("INDEX_QUANTIZATION", "none").lower()
+QUANT_RERANK_FACTOR = int(os.getenv("QUANT_RERANK_FACTOR", "4"))  # candidates re-ranked per result
+# Quantizations that keep exact float32 vectors on disk for re-ranking (more disk, better recall);
+# fp16 codes are nearly exact on their own
+QUANT_EXACT_VECTORS = {kind.strip() for kind in os.getenv("QUANT_EXACT_VECTORS", "int8,pq").lower().split(",") if kind.strip()}
+PQ_SUBQUANTIZERS = int(os.getenv("PQ_SUBQUANTIZERS", "48"))  # bytes per vector; must divide the dimension
+PQ_MIN_VECTORS = int(os.getenv("PQ_MIN_VECTORS", "1024"))  # smaller "pq" indexes use int8
+EMBEDDING_BATCH_SIZE = int(os.getenv("EMBEDDING_BATCH_SIZE", "64"))
+# Concurrent chat queries are embedded together: a query waits up to the wait for others, then
+# up to the batch size go through the model in one pass. Batch size 1 embeds each query on its own
+EMBED_QUERY_BATCH_SIZE = int(os.getenv("EMBED_QUERY_BATCH_SIZE", "32"))
+EMBED_QUERY_BATCH_WAIT_MS = float(os.getenv("EMBED_QUERY_BATCH_WAIT_MS", "2"))  # higher = bigger batches, slower replies
+# Where new sessions keep their vectors: "faiss" (local index files), "qdrant" or "pgvector"; sessions can override
+VECTOR_BACKEND = os.getenv("VECTOR_BACKEND", "faiss").lower()
+QDRANT_URL = os.getenv("QDRANT_URL", "http://localhost:6333")
+QDRANT_API_KEY = os.getenv("QDRANT_API_KEY")
+QDRANT_COLLECTION = os.getenv("QDRANT_COLLECTION", "briefly_chunks")  # one collection, filtered by session
+QDRANT_POOL_SIZE = int(os.getenv("QDRANT_POOL_SIZE", "16"))  # pooled HTTP connections per worker
+QDRANT_BATCH_SIZE = int(os.getenv("QDRANT_BATCH_SIZE", "256"))  # points per upsert request
+QDRANT_TIMEOUT = float(os.getenv("QDRANT_TIMEOUT", "30"))  # seconds
+# pgvector (PostgreSQL DATABASE_URL with the vector extension). Index build settings apply when the table is created
+PGVECTOR_HNSW_M = int(os.getenv("PGVECTOR_HNSW_M", "16"))
+PGVECTOR_HNSW_EF_CONSTRUCTION = int(os.getenv("PGVECTOR_HNSW_EF_CONSTRUCTION", "64"))
+PGVECTOR_EF_SEARCH = int(os.getenv("PGVECTOR_EF_SEARCH", "100"))  # HNSW candidates per query; 0 = server default
+# Keep scanning the HNSW graph until enough rows pass the session filter (pgvector >= 0.8; older versions ignore it)
+PGVECTOR_ITERATIVE_SCAN = os.getenv("PGVECTOR_ITERATIVE_SCAN", "strict_order").lower()
+
+# Ingestion
+INGEST_WORKERS = int(os.getenv("INGEST_WORKERS", str(min(4, os.cpu_count() or 1))))
+MAX_UPLOAD_FILES = int(os.getenv("MAX_UPLOAD_FILES", "100"))
+MAX_ZIP_UNCOMPRESSED_BYTES = int(os.getenv("MAX_ZIP_UNCOMPRESSED_BYTES", str(500 * 1024 * 1024)))
+# OCR for pages without a text layer (needs pytesseract, Pillow and tesseract installed)
+OCR_ENABLED = os.getenv("OCR_ENABLED", "0") == "1"
+OCR_LANG = os.getenv("OCR_LANG", "eng")  # tesseract language codes, e.g. "eng+deu"
+
+# Admission control (per worker process). Rates are per minute; 0 disables that limit
+RATE_LIMITS_ENABLED = os.getenv("RATE_LIMITS_ENABLED", "1") == "1"
+RATE_LIMIT_MAX_KEYS = int(os.getenv("RATE_LIMIT_MAX_KEYS", "10000"))  # buckets kept per limit
+CHAT_RATE_PER_SESSION = float(os.getenv("CHAT_RATE_PER_SESSION", "20"))
+CHAT_RATE_PER_CLIENT = float(os.getenv("CHAT_RATE_PER_CLIENT", "60"))
+CHAT_BURST = float(os.getenv("CHAT_BURST", "5"))
+UPLOAD_RATE_PER_SESSION = float(os.getenv("UPLOAD_RATE_PER_SESSION", "30"))  # files
+UPLOAD_RATE_PER_CLIENT = float(os.getenv("UPLOAD_RATE_PER_CLIENT", "60"))
+UPLOAD_BURST = float(os.getenv("UPLOAD_BURST", str(MAX_UPLOAD_FILES)))  # room for one full bulk upload
+MAX_CONCURRENT_CHATS = int(os.getenv("MAX_CONCURRENT_CHATS", "8"))
+CHAT_QUEUE_SIZE = int(os.getenv("CHAT_QUEUE_SIZE", "16"))
+CHAT_QUEUE_TIMEOUT = float(os.getenv("CHAT_QUEUE_TIMEOUT", "10"))  # seconds
+MAX_CONCURRENT_INGESTS = int(os.getenv("MAX_CONCURRENT_INGESTS", str(INGEST_WORKERS)))
+INGEST_QUEUE_SIZE = int(os.getenv("INGEST_QUEUE_SIZE", "8"))
+INGEST_QUEUE_TIMEOUT = float(os.getenv("INGEST_QUEUE_TIMEOUT", "30"))
 
 # LLM Parameters
 LLM_TEMPERATURE = 0.7
 
-print("[OK] Environment configured successfully")
+# Storage
+SESSION_QUOTA_BYTES = int(os.getenv("SESSION_QUOTA_BYTES", "0"))  # 0 = no quota, report only
+STORAGE_GC_GRACE_HOURS = float(os.getenv("STORAGE_GC_GRACE_HOURS", "24"))
+
+# Workers (gunicorn/uvicorn processes per node) and cross-worker cache coherence
+WORKERS = int(os.getenv("WEB_CONCURRENCY", "1"))
+CACHE_COHERENCE = os.getenv("CACHE_COHERENCE", "1" if WORKERS > 1 else "0") == "1"
+# Message ids below the newest cached one that are re-checked for turns committed late
+CACHE_COHERENCE_LOOKBACK = int(os.getenv("CACHE_COHERENCE_LOOKBACK", "32"))
+INDEX_CACHE_SESSIONS = int(os.getenv("INDEX_CACHE_SESSIONS", "64"))
+PRELOAD_EMBEDDINGS = os.getenv("PRELOAD_EMBEDDINGS", "1") == "1"
+
+# Conversation memory
+MEMORY_WINDOW_TURNS = int(os.getenv("MEMORY_WINDOW_TURNS", "4"))  # verbatim user/assistant pairs
+MEMORY_TURN_MAX_CHARS = int(os.getenv("MEMORY_TURN_MAX_CHARS", "800"))
+MEMORY_SUMMARY_MAX_CHARS = int(os.getenv("MEMORY_SUMMARY_MAX_CHARS", "2000"))
+MEMORY_COMPRESS_BATCH_TURNS = int(os.getenv("MEMORY_COMPRESS_BATCH_TURNS", "2"))
+MEMORY_CACHE_SESSIONS = int(os.getenv("MEMORY_CACHE_SESSIONS", "1000"))
+# "auto" rewrites only queries that look like follow-ups, "always" or "off"
+MEMORY_REWRITE = os.getenv("MEMORY_REWRITE", "auto").lower()
+
+# Logging ("json" for structured output, "text" for human-readable lines)
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()
+LOG_FORMAT = os.getenv("LOG_FORMAT", "json").lower()
+
+logger.debug("environment configured")
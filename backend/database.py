@@ -1,9 +1,15 @@
 from typing import AsyncGenerator
 from sqlmodel import SQLModel, create_engine, Session
+from sqlalchemy import inspect, text
 from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
 from sqlalchemy.orm import sessionmaker
 import os
 from pathlib import Path
+from config import PGVECTOR_EF_SEARCH, PGVECTOR_ITERATIVE_SCAN
+from observability import get_logger
+
+
+logger = get_logger("database")
 
 # Use absolute path for database to avoid working directory issues
 BASE_DIR = Path(__file__).parent
@@ -15,11 +21,25 @@ DATABASE_URL = os.getenv(
     f"sqlite+aiosqlite:///{DB_PATH}"
 )
 
+
+def _connect_args(url: str) -> dict:
+    """Per-connection settings; pgvector's HNSW search settings go in the asyncpg startup packet."""
+    if not url.startswith("postgresql+asyncpg"):
+        return {}
+    settings = {}
+    if PGVECTOR_EF_SEARCH > 0:
+        settings["hnsw.ef_search"] = str(PGVECTOR_EF_SEARCH)
+    if PGVECTOR_ITERATIVE_SCAN != "off":
+        settings["hnsw.iterative_scan"] = PGVECTOR_ITERATIVE_SCAN
+    return {"server_settings": settings} if settings else {}
+
+
 # Create async engine
 engine = create_async_engine(
     DATABASE_URL,
     echo=False,
     future=True,
+    connect_args=_connect_args(DATABASE_URL),
 )
 
 # Create async session factory
@@ -31,15 +51,40 @@ async_session = sessionmaker(
 )
 
 
+def _add_missing_columns(conn) -> None:
+    """Add nullable columns that were introduced after a table was created."""
+    inspector = inspect(conn)
+    for table in SQLModel.metadata.sorted_tables:
+        if not inspector.has_table(table.name):
+            continue
+        existing = {column["name"] for column in inspector.get_columns(table.name)}
+        for column in table.columns:
+            if column.name in existing or not column.nullable:
+                continue
+            column_type = column.type.compile(dialect=conn.dialect)
+            conn.execute(text(f'ALTER TABLE "{table.name}" ADD COLUMN "{column.name}" {column_type}'))
+            logger.info("added column", extra={"table": table.name, "column": column.name})
+
+
+# Set once tables exist; workers forked from a preloaded master inherit it
+_initialized = False
+
+
 async def init_db():
     """Initialize database tables."""
+    global _initialized
+    if _initialized:
+        return
     try:
-        print("[*] Initializing database...")
+        logger.info("initializing database")
         async with engine.begin() as conn:
             await conn.run_sync(SQLModel.metadata.create_all)
-        print("[OK] Database initialized successfully!")
-    except Exception as e:
-        print(f"[!] Database initialization failed: {e}")
+            # create_all never alters existing tables; older databases need new columns added
+            await conn.run_sync(_add_missing_columns)
+        _initialized = True
+        logger.info("database initialized")
+    except Exception:
+        logger.exception("database initialization failed")
         raise
 
 
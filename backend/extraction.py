@@ -0,0 +1,137 @@
+"""
+PDF text extraction run inside worker processes.
+
+Kept free of heavy imports (LangChain, torch) so spawned pool workers
+start quickly. OCR needs pytesseract, Pillow and the `tesseract` binary;
+they are optional and only imported when a page has no text layer.
+
+Scanned pages are OCRed from the images embedded in the page, and the
+result is cached on disk under the SHA-256 of those images, so a page
+seen before (the same scan uploaded again, a repeated cover sheet) is
+never OCRed twice.
+"""
+
+import gzip
+import hashlib
+import io
+import os
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Iterator, List, Optional, Tuple
+from pypdf import PdfReader
+
+
+@dataclass
+class PageScan:
+    """Text of each page of a PDF, plus the pages still waiting for OCR."""
+    pages: List[str]
+    pending: List[Tuple[int, str]] = field(default_factory=list)  # (page index, image digest)
+    cache_hits: int = 0
+
+
+def _open_pdf(file_path: str) -> PdfReader:
+    if file_path.endswith(".gz"):
+        # Cold blobs are stored gzip-compressed
+        with gzip.open(file_path, "rb") as compressed:
+            return PdfReader(io.BytesIO(compressed.read()))
+    return PdfReader(file_path)
+
+
+def _image_streams(resources, depth: int = 0) -> Iterator:
+    """Yield image XObjects drawn by a page, including those inside forms."""
+    if resources is None or depth > 4:
+        return
+    xobjects = resources.get_object().get("/XObject")
+    if xobjects is None:
+        return
+    xobjects = xobjects.get_object()
+    for name in sorted(xobjects):
+        obj = xobjects[name].get_object()
+        subtype = obj.get("/Subtype")
+        if subtype == "/Image":
+            yield obj
+        elif subtype == "/Form":
+            yield from _image_streams(obj.get("/Resources"), depth + 1)
+
+
+def page_image_digest(page) -> Optional[str]:
+    """SHA-256 of the encoded images on a page, or None if it has none."""
+    digest = hashlib.sha256()
+    found = False
+    for image in _image_streams(page.get("/Resources")):
+        # Hash the stream as stored; decoding a full-page scan just to hash it is wasted work
+        digest.update(image.hash_value_data())
+        found = True
+    return digest.hexdigest() if found else None
+
+
+def _cache_path(cache_dir: str, digest: str) -> Path:
+    return Path(cache_dir) / digest[:2] / f"{digest}.txt"
+
+
+def _read_cache(cache_dir: str, digest: str) -> Optional[str]:
+    try:
+        return _cache_path(cache_dir, digest).read_text(encoding="utf-8")
+    except FileNotFoundError:
+        return None
+
+
+def _write_cache(cache_dir: str, digest: str, text: str) -> None:
+    path = _cache_path(cache_dir, digest)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_name(f".{path.name}.{os.getpid()}.tmp")
+    tmp.write_text(text, encoding="utf-8")
+    os.replace(tmp, path)
+
+
+def scan_pdf(file_path: str, ocr_cache_dir: Optional[str] = None) -> PageScan:
+    """
+    Extract the text layer of every page.
+
+    With `ocr_cache_dir` set, pages without text are looked up in the OCR
+    cache; misses are returned in `pending` for `ocr_page` to handle.
+    """
+    reader = _open_pdf(file_path)
+    scan = PageScan(pages=[])
+    for index, page in enumerate(reader.pages):
+        text = page.extract_text() or ""
+        if not text.strip() and ocr_cache_dir:
+            digest = page_image_digest(page)
+            if digest:
+                cached = _read_cache(ocr_cache_dir, digest)
+                if cached is None:
+                    scan.pending.append((index, digest))
+                else:
+                    text = cached
+                    scan.cache_hits += 1
+        scan.pages.append(text)
+    return scan
+
+
+def ocr_page(file_path: str, page_index: int, digest: str, cache_dir: str, lang: str = "eng") -> str:
+    """OCR the images of one page and store the text in the cache."""
+    import pytesseract
+
+    # Pages are already OCRed in parallel across the pool; keep each tesseract single-threaded
+    os.environ.setdefault("OMP_THREAD_LIMIT", "1")
+    page = _open_pdf(file_path).pages[page_index]
+    parts = []
+    for image in page.images:
+        text = pytesseract.image_to_string(image.image, lang=lang).strip()
+        if text:
+            parts.append(text)
+    text = "\n".join(parts)
+    _write_cache(cache_dir, digest, text)
+    return text
+
+
+def ocr_available() -> bool:
+    """Whether pytesseract, Pillow and the tesseract binary are all installed."""
+    try:
+        import pytesseract
+        import PIL  # noqa: F401  (needed by pypdf to decode page images)
+
+        pytesseract.get_tesseract_version()
+    except Exception:
+        return False
+    return True
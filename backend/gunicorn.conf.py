@@ -0,0 +1,61 @@
+"""
+Gunicorn configuration for multi-worker deployments.
+
+Usage:
+    gunicorn -c gunicorn.conf.py main:app
+
+The app is imported once in the master (`preload_app`), which also creates
+the database tables and loads the embedding model before forking, so
+workers share the model weights copy-on-write instead of loading them N
+times. Worker count comes from WEB_CONCURRENCY.
+"""
+
+import asyncio
+import gc
+import os
+import tempfile
+
+# Must be set before prometheus_client is imported by the app
+if not os.getenv("PROMETHEUS_MULTIPROC_DIR"):
+    os.environ["PROMETHEUS_MULTIPROC_DIR"] = tempfile.mkdtemp(prefix="briefly-metrics-")
+
+bind = f"0.0.0.0:{os.getenv('PORT', '8000')}"
+workers = int(os.getenv("WEB_CONCURRENCY", "2"))
+os.environ["WEB_CONCURRENCY"] = str(workers)  # read by config.CACHE_COHERENCE
+worker_class = "uvicorn.workers.UvicornWorker"
+preload_app = True
+timeout = int(os.getenv("WORKER_TIMEOUT", "300"))  # ingestion of large uploads is slow
+graceful_timeout = 30
+
+
+def when_ready(server):
+    """Runs in the master after the app is imported, before workers fork."""
+    import database
+    import service
+    from config import PRELOAD_EMBEDDINGS
+
+    async def create_tables():
+        await database.init_db()
+        # Drop master connections; each worker opens its own pool
+        await database.close_db()
+
+    asyncio.run(create_tables())
+    if PRELOAD_EMBEDDINGS:
+        service.get_embeddings()
+    # Keep preloaded objects out of the GC's reach so refcount/GC writes do not un-share pages
+    gc.freeze()
+
+
+def post_fork(server, worker):
+    """Split CPU threads between workers instead of oversubscribing."""
+    try:
+        import torch
+    except ImportError:
+        return
+    torch.set_num_threads(max(1, (os.cpu_count() or 1) // workers))
+
+
+def child_exit(server, worker):
+    from prometheus_client import multiprocess
+
+    multiprocess.mark_process_dead(worker.pid)
@@ -0,0 +1,144 @@
+"""
+Session FAISS indexes shared between worker processes.
+
+Indexes are rewritten atomically under an exclusive file lock and read
+under a shared one. Loaded indexes are cached in-process and keyed by the
+identity of the files on disk, so an index rewritten by another worker
+(or another node on a shared volume) is reloaded on the next lookup
+without a restart.
+"""
+
+import asyncio
+import os
+import shutil
+from collections import OrderedDict
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Callable, Iterator, Optional, Tuple
+
+from langchain_community.vectorstores import FAISS
+from langchain_core.embeddings import Embeddings
+
+from config import INDEX_CACHE_SESSIONS
+from observability import record_cache, stage_timer
+
+try:
+    import fcntl
+except ImportError:  # Windows: single-process deployments only
+    fcntl = None
+
+
+INDEX_FILES = ("index.faiss", "index.pkl")
+
+Signature = Tuple[Tuple[int, int, int], ...]
+
+# LRU cache: index directory -> (file signature, loaded store)
+_cache: "OrderedDict[str, Tuple[Signature, FAISS]]" = OrderedDict()
+
+
+@contextmanager
+def index_lock(index_dir: Path, exclusive: bool) -> Iterator[None]:
+    """Hold a cross-process lock on a session index (blocking)."""
+    lock_path = Path(f"{index_dir}.lock")
+    lock_path.parent.mkdir(parents=True, exist_ok=True)
+    with open(lock_path, "a+") as lock_file:
+        if fcntl is not None:
+            fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH)
+        try:
+            yield
+        finally:
+            if fcntl is not None:
+                fcntl.flock(lock_file.fileno(), fcntl.LOCK_UN)
+
+
+def _signature(index_dir: Path) -> Signature:
+    """Identity of the index files; changes whenever they are replaced."""
+    stats = (os.stat(Path(index_dir) / name) for name in INDEX_FILES)
+    return tuple((st.st_ino, st.st_mtime_ns, st.st_size) for st in stats)
+
+
+def _remember(index_dir: Path, signature: Signature, store: FAISS) -> None:
+    key = str(index_dir)
+    _cache[key] = (signature, store)
+    _cache.move_to_end(key)
+    while len(_cache) > INDEX_CACHE_SESSIONS:
+        _cache.popitem(last=False)
+
+
+def _save_atomic(store: FAISS, index_dir: Path) -> None:
+    """Write next to the target, then swap files in with os.replace."""
+    index_dir.mkdir(parents=True, exist_ok=True)
+    tmp_dir = index_dir.parent / f".{index_dir.name}.tmp-{os.getpid()}"
+    store.save_local(str(tmp_dir))
+    try:
+        for name in INDEX_FILES:
+            os.replace(tmp_dir / name, index_dir / name)
+    finally:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+
+
+def _load_locked(index_dir: Path, embeddings: Embeddings) -> Tuple[Signature, FAISS]:
+    with index_lock(index_dir, exclusive=False):
+        signature = _signature(index_dir)
+        store = FAISS.load_local(str(index_dir), embeddings, allow_dangerous_deserialization=True)
+    return signature, store
+
+
+async def load_index(index_dir: Path, embeddings: Embeddings) -> FAISS:
+    """Return the session index, reloading it only if the files changed."""
+    index_dir = Path(index_dir)
+    cached = _cache.get(str(index_dir))
+    try:
+        fresh = cached is not None and cached[0] == _signature(index_dir)
+    except FileNotFoundError:
+        fresh = False
+    record_cache("faiss_index", fresh)
+    if fresh:
+        _cache.move_to_end(str(index_dir))
+        return cached[1]
+
+    with stage_timer("index_load"):
+        signature, store = await asyncio.to_thread(_load_locked, index_dir, embeddings)
+    _remember(index_dir, signature, store)
+    return store
+
+
+def _update_locked(
+    index_dir: Path,
+    embeddings: Embeddings,
+    mutate: Callable[[Optional[FAISS]], FAISS],
+    load_existing: bool,
+) -> Tuple[Signature, FAISS]:
+    with index_lock(index_dir, exclusive=True):
+        store = None
+        # Always start from disk, never from a cached copy another worker may have outdated
+        if load_existing and all((index_dir / name).exists() for name in INDEX_FILES):
+            with stage_timer("index_load"):
+                store = FAISS.load_local(str(index_dir), embeddings, allow_dangerous_deserialization=True)
+        store = mutate(store)
+        with stage_timer("index_save"):
+            _save_atomic(store, index_dir)
+        return _signature(index_dir), store
+
+
+async def update_index(
+    index_dir: Path,
+    embeddings: Embeddings,
+    mutate: Callable[[Optional[FAISS]], FAISS],
+    load_existing: bool = True,
+) -> FAISS:
+    """
+    Load-modify-save a session index as one locked step.
+
+    `mutate` receives the current store (or None if there is none yet) and
+    returns the store to persist.
+    """
+    index_dir = Path(index_dir)
+    signature, store = await asyncio.to_thread(_update_locked, index_dir, embeddings, mutate, load_existing)
+    _remember(index_dir, signature, store)
+    return store
+
+
+def drop_index(index_dir: Path) -> None:
+    """Forget a cached index."""
+    _cache.pop(str(index_dir), None)
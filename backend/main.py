@@ -1,18 +1,43 @@
+import asyncio
 import os
-from contextlib import asynccontextmanager
+import tempfile
+import zipfile
+import zlib
+from contextlib import asynccontextmanager, nullcontext
 from pathlib import Path
 import sys
 sys.path.insert(0, str(Path(__file__).parent))
 
-from fastapi import FastAPI, Depends, UploadFile, File, HTTPException
+from fastapi import FastAPI, Depends, UploadFile, File, Form, HTTPException, Request, Response
+from fastapi.responses import FileResponse, JSONResponse
+from starlette.background import BackgroundTask
 from fastapi.middleware.cors import CORSMiddleware
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlmodel import select
 from models import Session as DBSession, Document, ChatMessage
 from database import init_db, get_session, close_db
-from service import ingest_pdf, chat_with_documents
-from pydantic import BaseModel
+from service import (
+    ingest_pdf,
+    chat_with_documents,
+    extract_pdfs,
+    index_documents,
+    requantize_index,
+    close_ingest_pool,
+    query_embedder,
+)
+from admission import Overloaded, TooLarge, chat_slots, ingest_slots, rate_limit, check_rate, client_key
+from snapshot import export_session, import_session, SnapshotError
+from storage import store_blob, session_usage
+from vectorstores import close_vector_stores, resolve_backend
+from config import MAX_UPLOAD_FILES, MAX_ZIP_UNCOMPRESSED_BYTES, SESSION_QUOTA_BYTES
+from observability import configure_logging, get_logger, render_metrics
+from pydantic import BaseModel, Field
 from datetime import datetime
+from typing import Literal
+
+
+configure_logging()
+logger = get_logger("api")
 
 
 # Lifespan startup
@@ -20,14 +45,17 @@ from datetime import datetime
 async def lifespan(app: FastAPI):
     """Initialize database on startup."""
     try:
-        print("[*] FastAPI startup...")
+        logger.info("startup")
         await init_db()
-        print("[OK] Startup complete, server ready!")
-    except Exception as e:
-        print(f"[!] Startup failed: {e}")
+        logger.info("startup complete")
+    except Exception:
+        logger.exception("startup failed")
         raise
     yield
-    print("[*] FastAPI shutdown...")
+    logger.info("shutdown")
+    close_ingest_pool()
+    query_embedder.close()
+    await close_vector_stores()
     await close_db()
 
 
@@ -48,9 +76,43 @@ app.add_middleware(
 )
 
 
+@app.exception_handler(Overloaded)
+async def overloaded_handler(request: Request, exc: Overloaded):
+    """Reject requests over a rate or concurrency limit with 429 and Retry-After."""
+    return JSONResponse(
+        status_code=429,
+        content={"detail": exc.reason},
+        headers={"Retry-After": str(exc.retry_after)},
+    )
+
+
+@app.exception_handler(TooLarge)
+async def too_large_handler(request: Request, exc: TooLarge):
+    """Reject requests that cost more than a rate limit's burst; retrying would not help."""
+    return JSONResponse(status_code=413, content={"detail": exc.reason})
+
+
 # Request/Response models
+Quantization = Literal["none", "fp16", "int8", "pq"]
+VectorBackend = Literal["faiss", "qdrant", "pgvector"]
+
+
 class SessionCreate(BaseModel):
     name: str
+    # Chunking for documents uploaded to this session; None uses CHUNK_SIZE/CHUNK_OVERLAP
+    chunk_size: int | None = Field(default=None, ge=200, le=8000)
+    chunk_overlap: int | None = Field(default=None, ge=0, le=2000)
+    # Vector encoding of the session index; None uses INDEX_QUANTIZATION
+    index_quantization: Quantization | None = None
+    # Where the session's vectors are stored; None uses VECTOR_BACKEND
+    vector_backend: VectorBackend | None = None
+
+
+class SessionUpdate(BaseModel):
+    name: str | None = None
+    chunk_size: int | None = Field(default=None, ge=200, le=8000)
+    chunk_overlap: int | None = Field(default=None, ge=0, le=2000)
+    index_quantization: Quantization | None = None
 
 
 class SessionResponse(BaseModel):
@@ -58,6 +120,10 @@ class SessionResponse(BaseModel):
     name: str
     current_summary: str | None
     created_at: datetime
+    chunk_size: int | None = None
+    chunk_overlap: int | None = None
+    index_quantization: str | None = None
+    vector_backend: str | None = None
 
     class Config:
         from_attributes = True
@@ -65,12 +131,35 @@ class SessionResponse(BaseModel):
 
 class ChatRequest(BaseModel):
     query: str
+    # Only search chunks of these documents (by filename)
+    sources: list[str] | None = None
 
 
 class ChatResponse(BaseModel):
     response: str
 
 
+class BulkFileResult(BaseModel):
+    filename: str
+    status: str  # "uploaded", "skipped" (no text) or "failed" (unreadable PDF)
+    chunks: int
+    error: str | None = None
+
+
+class BulkUploadResponse(BaseModel):
+    files: list[BulkFileResult]
+    summary_updated: bool
+
+
+class StorageUsageResponse(BaseModel):
+    documents: int
+    document_bytes: int
+    index_bytes: int
+    total_bytes: int
+    quota_bytes: int | None
+    over_quota: bool
+
+
 class DocumentResponse(BaseModel):
     id: int
     filename: str
@@ -97,13 +186,26 @@ async def health_check():
     return {"status": "healthy"}
 
 
+@app.get("/metrics")
+async def metrics():
+    """Prometheus metrics endpoint."""
+    payload, content_type = render_metrics()
+    return Response(content=payload, media_type=content_type)
+
+
 @app.post("/sessions", response_model=SessionResponse)
 async def create_session(
     request: SessionCreate,
     session: AsyncSession = Depends(get_session),
 ):
     """Create a new session."""
-    db_session = DBSession(name=request.name)
+    db_session = DBSession(
+        name=request.name,
+        chunk_size=request.chunk_size,
+        chunk_overlap=request.chunk_overlap,
+        index_quantization=request.index_quantization,
+        vector_backend=resolve_backend(request.vector_backend),
+    )
     session.add(db_session)
     await session.commit()
     await session.refresh(db_session)
@@ -138,72 +240,93 @@ async def get_session_detail(
 @app.patch("/sessions/{session_id}", response_model=SessionResponse)
 async def update_session(
     session_id: int,
-    request: SessionCreate,
+    request: SessionUpdate,
     session: AsyncSession = Depends(get_session),
 ):
-    """Update a session's name."""
-    query = select(DBSession).where(DBSession.id == session_id)
-    result = await session.execute(query)
-    db_session = result.scalar_one_or_none()
-    
-    if not db_session:
-        raise HTTPException(status_code=404, detail="Session not found")
-    
-    db_session.name = request.name
-    await session.commit()
+    """
+    Update a session's name, chunking or index quantization.
+
+    Chunking applies to later uploads; a new quantization rebuilds the
+    existing index right away.
+    """
+    changes = request.model_dump(exclude_unset=True)
+    # A new quantization rebuilds the index: queue for an ingest slot before the first query,
+    # which checks out a pooled connection
+    async with ingest_slots.slot() if "index_quantization" in changes else nullcontext():
+        query = select(DBSession).where(DBSession.id == session_id)
+        result = await session.execute(query)
+        db_session = result.scalar_one_or_none()
+        
+        if not db_session:
+            raise HTTPException(status_code=404, detail="Session not found")
+        
+        # Only fields present in the request change; send null to reset settings to the defaults
+        previous_quantization = db_session.index_quantization
+        for key, value in changes.items():
+            if key == "name" and value is None:
+                continue
+            setattr(db_session, key, value)
+        
+        if db_session.index_quantization != previous_quantization:
+            try:
+                await requantize_index(db_session)
+            except Exception as e:
+                await session.rollback()
+                logger.exception("requantize failed", extra={"session_id": session_id})
+                raise HTTPException(status_code=500, detail=f"Index rebuild failed: {str(e)}")
+        await session.commit()
     await session.refresh(db_session)
     return db_session
 
 
-@app.post("/sessions/{session_id}/upload")
+@app.post("/sessions/{session_id}/upload", dependencies=[Depends(rate_limit("upload"))])
 async def upload_document(
     session_id: int,
     file: UploadFile = File(...),
     session: AsyncSession = Depends(get_session),
 ):
     """Upload a PDF to a session."""
-    # Validate session exists
-    query = select(DBSession).where(DBSession.id == session_id)
-    result = await session.execute(query)
-    db_session = result.scalar_one_or_none()
-    
-    if not db_session:
-        raise HTTPException(status_code=404, detail="Session not found")
-    
     # Validate file type
     if not file.filename.endswith(".pdf"):
         raise HTTPException(status_code=400, detail="Only PDF files are allowed")
     
-    # Save file
-    storage_dir = Path("backend/storage")
-    storage_dir.mkdir(parents=True, exist_ok=True)
+    # Queue before the first query: the session checks out a pooled connection on first use
+    async with ingest_slots.slot():
+        # Validate session exists
+        query = select(DBSession).where(DBSession.id == session_id)
+        result = await session.execute(query)
+        db_session = result.scalar_one_or_none()
+        
+        if not db_session:
+            raise HTTPException(status_code=404, detail="Session not found")
     
-    file_path = storage_dir / f"session_{session_id}_{file.filename}"
+        # Save file (content-addressed; identical PDFs share one blob)
+        file_path = await asyncio.to_thread(store_blob, file.file)
     
-    with open(file_path, "wb") as buffer:
-        content = await file.read()
-        buffer.write(content)
+        # Create document record; committed together with the index and summary update
+        document = Document(
+            session_id=session_id,
+            filename=file.filename,
+            file_path=str(file_path),
+        )
+        session.add(document)
     
-    # Create document record
-    document = Document(
-        session_id=session_id,
-        filename=file.filename,
-        file_path=str(file_path),
-    )
-    session.add(document)
-    await session.commit()
-    
-    # Ingest PDF (update FAISS and summary)
-    try:
-        await ingest_pdf(session_id, str(file_path), session)
-    except Exception as e:
-        # Cleanup file on error
-        if file_path.exists():
-            file_path.unlink()
-        import traceback
-        print(f"[!] Ingestion error: {str(e)}")
-        print(traceback.format_exc())
-        raise HTTPException(status_code=500, detail=f"Ingestion failed: {str(e)}")
+        # Ingest PDF (update FAISS and summary)
+        try:
+            await ingest_pdf(
+                session_id,
+                str(file_path),
+                session,
+                filename=file.filename,
+                chunk_size=db_session.chunk_size,
+                chunk_overlap=db_session.chunk_overlap,
+                session=db_session,
+            )
+        except Exception as e:
+            # Drop the pending row; the blob may be shared with a concurrent upload, GC removes it if unused
+            await session.rollback()
+            logger.exception("ingestion failed", extra={"session_id": session_id, "upload": file.filename})
+            raise HTTPException(status_code=500, detail=f"Ingestion failed: {str(e)}")
     
     return {
         "filename": file.filename,
@@ -212,6 +335,189 @@ async def upload_document(
     }
 
 
+def _save_uploads(files: list[UploadFile]) -> dict[str, Path]:
+    """
+    Store the PDFs of a bulk upload, unpacking ZIP archives. Runs in a
+    worker thread. Returns original filename -> blob path; on failure,
+    blobs already saved are left to the storage GC.
+    """
+    saved: dict[str, Path] = {}  # original filename -> blob path
+
+    def save(filename: str, source) -> None:
+        if filename in saved:
+            raise HTTPException(status_code=400, detail=f"Duplicate filename in upload: {filename}")
+        if len(saved) >= MAX_UPLOAD_FILES:
+            raise HTTPException(status_code=400, detail=f"At most {MAX_UPLOAD_FILES} PDFs per upload")
+        saved[filename] = store_blob(source)
+
+    for upload in files:
+        name = upload.filename or ""
+        if name.lower().endswith(".zip"):
+            try:
+                archive = zipfile.ZipFile(upload.file)
+            except zipfile.BadZipFile:
+                raise HTTPException(status_code=400, detail=f"Invalid ZIP archive: {name}")
+            with archive:
+                members = [
+                    member for member in archive.infolist()
+                    if not member.is_dir()
+                    and member.filename.lower().endswith(".pdf")
+                    and not member.filename.startswith("__MACOSX/")
+                ]
+                if sum(member.file_size for member in members) > MAX_ZIP_UNCOMPRESSED_BYTES:
+                    raise HTTPException(status_code=400, detail=f"ZIP archive too large: {name}")
+                for member in members:
+                    # Flatten directories; never trust archive paths
+                    try:
+                        with archive.open(member) as source:
+                            save(Path(member.filename).name, source)
+                    except (zipfile.BadZipFile, zlib.error, EOFError):
+                        # Truncated archive or a member failing its CRC check
+                        raise HTTPException(status_code=400, detail=f"Corrupt ZIP archive: {name} ({member.filename})")
+        elif name.endswith(".pdf"):
+            save(name, upload.file)
+        else:
+            raise HTTPException(status_code=400, detail=f"Only PDF or ZIP files are allowed: {name}")
+    return saved
+
+
+@app.post("/sessions/{session_id}/upload/bulk", response_model=BulkUploadResponse)
+async def upload_documents_bulk(
+    session_id: int,
+    request: Request,
+    files: list[UploadFile] = File(...),
+    session: AsyncSession = Depends(get_session),
+):
+    """
+    Upload many PDFs (or ZIP archives of PDFs) to a session at once.
+
+    All files are parsed in parallel, embedded in one batch, written to the
+    FAISS index once and folded into a single summary refresh.
+    """
+    # Each PDF counts against the upload rate. ZIPs are only counted once unpacked,
+    # so check first that at least the parts themselves would be admitted
+    client = client_key(request)
+    check_rate("upload", session_id, client, cost=len(files), consume=False)
+    
+    # Queue before the first query: the session checks out a pooled connection on first use
+    async with ingest_slots.slot():
+        # Validate session exists
+        query = select(DBSession).where(DBSession.id == session_id)
+        result = await session.execute(query)
+        db_session = result.scalar_one_or_none()
+        
+        if not db_session:
+            raise HTTPException(status_code=404, detail="Session not found")
+    
+        # Unpacking, hashing and writing blobs is blocking I/O; keep it off the event loop
+        saved = await asyncio.to_thread(_save_uploads, files)
+    
+        if not saved:
+            raise HTTPException(status_code=400, detail="No PDF files found in upload")
+        check_rate("upload", session_id, client, cost=len(saved))
+    
+        # Parse everything in parallel, then index and summarize once
+        try:
+            extracted = await extract_pdfs(
+                [str(file_path) for file_path in saved.values()],
+                list(saved),
+                chunk_size=db_session.chunk_size,
+                chunk_overlap=db_session.chunk_overlap,
+            )
+            results = []
+            for doc in extracted:
+                chunks = len(doc.chunks)
+                status = "failed" if doc.error else "uploaded" if chunks else "skipped"
+                results.append({"filename": doc.filename, "status": status, "chunks": chunks, "error": doc.error})
+                if chunks:
+                    session.add(Document(session_id=session_id, filename=doc.filename, file_path=doc.file_path))
+        
+            # Unreadable PDFs fail and PDFs without extractable text are skipped, per file
+            # (no Document row; the GC removes their blobs)
+            if not any(result["chunks"] for result in results):
+                raise HTTPException(status_code=400, detail="None of the uploaded PDFs could be read or contain extractable text")
+        
+            # Commits the new Document rows together with the refreshed summary
+            await index_documents(session_id, extracted, session, session=db_session)
+        except HTTPException:
+            await session.rollback()
+            raise
+        except Exception as e:
+            await session.rollback()
+            logger.exception("bulk ingestion failed", extra={"session_id": session_id, "files": len(saved)})
+            raise HTTPException(status_code=500, detail=f"Ingestion failed: {str(e)}")
+    
+    return {"files": results, "summary_updated": True}
+
+
+@app.get("/sessions/{session_id}/storage", response_model=StorageUsageResponse)
+async def get_storage_usage(
+    session_id: int,
+    session: AsyncSession = Depends(get_session),
+):
+    """Report disk used by a session's PDFs and index against its quota."""
+    query = select(DBSession).where(DBSession.id == session_id)
+    result = await session.execute(query)
+    if not result.scalar_one_or_none():
+        raise HTTPException(status_code=404, detail="Session not found")
+    
+    usage = await session_usage(session_id, session)
+    return {
+        "documents": usage.documents,
+        "document_bytes": usage.document_bytes,
+        "index_bytes": usage.index_bytes,
+        "total_bytes": usage.total_bytes,
+        "quota_bytes": SESSION_QUOTA_BYTES or None,
+        "over_quota": bool(SESSION_QUOTA_BYTES) and usage.total_bytes > SESSION_QUOTA_BYTES,
+    }
+
+
+@app.get("/sessions/{session_id}/export")
+async def export_snapshot(
+    session_id: int,
+    session: AsyncSession = Depends(get_session),
+):
+    """Download a session (documents, messages, index) as a snapshot archive."""
+    query = select(DBSession).where(DBSession.id == session_id)
+    result = await session.execute(query)
+    if not result.scalar_one_or_none():
+        raise HTTPException(status_code=404, detail="Session not found")
+    
+    fd, archive_path = tempfile.mkstemp(prefix="briefly-export-", suffix=".zip")
+    try:
+        with os.fdopen(fd, "wb") as target:
+            await export_session(session_id, target, session)
+    except Exception as e:
+        os.unlink(archive_path)
+        logger.exception("export failed", extra={"session_id": session_id})
+        raise HTTPException(status_code=500, detail=f"Export failed: {str(e)}")
+    
+    return FileResponse(
+        archive_path,
+        media_type="application/zip",
+        filename=f"session_{session_id}.zip",
+        background=BackgroundTask(os.unlink, archive_path),
+    )
+
+
+@app.post("/sessions/import", response_model=SessionResponse, dependencies=[Depends(rate_limit("upload"))])
+async def import_snapshot(
+    file: UploadFile = File(...),
+    name: str | None = Form(None),
+    session: AsyncSession = Depends(get_session),
+):
+    """Create a new session from a snapshot archive produced by the export endpoint."""
+    async with ingest_slots.slot():
+        try:
+            # UploadFile spools to disk past 1MB, so the archive is never held in memory
+            return await import_session(file.file, session, name=name)
+        except SnapshotError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        except Exception as e:
+            logger.exception("import failed")
+            raise HTTPException(status_code=500, detail=f"Import failed: {str(e)}")
+
+
 @app.get("/sessions/{session_id}/documents", response_model=list[DocumentResponse])
 async def get_documents(
     session_id: int,
@@ -224,33 +530,31 @@ async def get_documents(
     return documents
 
 
-@app.post("/sessions/{session_id}/chat", response_model=ChatResponse)
+@app.post("/sessions/{session_id}/chat", response_model=ChatResponse, dependencies=[Depends(rate_limit("chat"))])
 async def chat(
     session_id: int,
     request: ChatRequest,
     session: AsyncSession = Depends(get_session),
 ):
     """Chat with documents in a session."""
-    print(f"[*] Chat request - Session: {session_id}, Query: {request.query}")
-    
-    # Validate session exists
-    query = select(DBSession).where(DBSession.id == session_id)
-    result = await session.execute(query)
-    db_session = result.scalar_one_or_none()
-    
-    if not db_session:
-        raise HTTPException(status_code=404, detail="Session not found")
-    
-    try:
-        print("[*] Calling chat_with_documents...")
-        response = await chat_with_documents(session_id, request.query, session)
-        print(f"[OK] Chat response generated: {response[:100]}...")
-        return {"response": response}
-    except Exception as e:
-        import traceback
-        print(f"[!] Chat error: {str(e)}")
-        print(traceback.format_exc())
-        raise HTTPException(status_code=500, detail=f"Chat failed: {str(e)}")
+    # Queue before the first query: the session checks out a pooled connection on first use
+    async with chat_slots.slot():
+        # Validate session exists
+        query = select(DBSession).where(DBSession.id == session_id)
+        result = await session.execute(query)
+        db_session = result.scalar_one_or_none()
+        
+        if not db_session:
+            raise HTTPException(status_code=404, detail="Session not found")
+        
+        try:
+            response = await chat_with_documents(
+                session_id, request.query, session, session=db_session, sources=request.sources,
+            )
+            return {"response": response}
+        except Exception as e:
+            logger.exception("chat failed", extra={"session_id": session_id})
+            raise HTTPException(status_code=500, detail=f"Chat failed: {str(e)}")
 
 
 @app.get("/sessions/{session_id}/messages", response_model=list[MessageResponse])
@@ -267,4 +571,9 @@ async def get_messages(
 
 if __name__ == "__main__":
     import uvicorn
-    uvicorn.run(app, host="0.0.0.0", port=8000)
+    from config import WORKERS
+    if WORKERS > 1:
+        # Prefer `gunicorn -c gunicorn.conf.py main:app`, which shares the embedding model between workers
+        uvicorn.run("main:app", host="0.0.0.0", port=8000, workers=WORKERS)
+    else:
+        uvicorn.run(app, host="0.0.0.0", port=8000)
@@ -0,0 +1,169 @@
+"""
+Per-session conversation memory.
+
+Keeps the last few messages verbatim plus a rolling summary of everything
+older, so chat prompts stay bounded however long a session runs. Memories
+are cached in-process (LRU). The summary is also saved on the session row
+with the id of the newest message it covers, so on a miss (eviction,
+restart, another worker) the memory is rebuilt from that summary and the
+`ChatMessage` rows after it.
+"""
+
+import asyncio
+from collections import OrderedDict, deque
+from itertools import chain
+from typing import Deque, List, NamedTuple, Optional
+
+from sqlalchemy import or_, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlmodel import select
+
+from config import (
+    CACHE_COHERENCE,
+    CACHE_COHERENCE_LOOKBACK,
+    MEMORY_WINDOW_TURNS,
+    MEMORY_TURN_MAX_CHARS,
+    MEMORY_COMPRESS_BATCH_TURNS,
+    MEMORY_CACHE_SESSIONS,
+)
+from models import ChatMessage, Session
+from observability import record_cache
+
+
+class Message(NamedTuple):
+    role: str
+    content: str
+    message_id: Optional[int] = None
+
+
+# If compression keeps failing, the oldest overflow is dropped to stay bounded
+MAX_OVERFLOW = MEMORY_COMPRESS_BATCH_TURNS * 2 * 4
+
+
+def _clip(text: str, limit: int) -> str:
+    return text if len(text) <= limit else text[: limit - 3] + "..."
+
+
+class ConversationMemory:
+    """Recent-message window plus an incrementally compressed summary."""
+
+    def __init__(self, window_turns: int = MEMORY_WINDOW_TURNS):
+        self.window = window_turns * 2  # a turn is a user + assistant message
+        self.summary: str = ""
+        self.recent: Deque[Message] = deque()
+        self.overflow: List[Message] = []  # evicted from the window, not yet summarized
+        self.last_message_id = 0  # newest ChatMessage reflected in the memory
+        self.summary_through: Optional[int] = None  # newest ChatMessage folded into the summary
+        self.lock = asyncio.Lock()
+
+    @property
+    def is_empty(self) -> bool:
+        return not self.summary and not self.recent
+
+    def has(self, message_id: int) -> bool:
+        """Whether a message is already in the window or waiting to be summarized."""
+        return any(message.message_id == message_id for message in chain(self.recent, self.overflow))
+
+    def window_start(self) -> int:
+        """Id of the oldest message in the window; messages before it are summarized or overflow."""
+        ids = [message.message_id for message in self.recent if message.message_id is not None]
+        return min(ids) if ids else self.last_message_id
+
+    def add(self, role: str, content: str, message_id: Optional[int] = None) -> None:
+        if message_id is not None:
+            if self.has(message_id):
+                return
+            self.last_message_id = max(self.last_message_id, message_id)
+        self.recent.append(Message(role, _clip(content, MEMORY_TURN_MAX_CHARS), message_id))
+        while len(self.recent) > self.window:
+            self.overflow.append(self.recent.popleft())
+        if len(self.overflow) > MAX_OVERFLOW:
+            del self.overflow[: len(self.overflow) - MAX_OVERFLOW]
+
+    def needs_compression(self) -> bool:
+        return len(self.overflow) >= MEMORY_COMPRESS_BATCH_TURNS * 2
+
+    def take_overflow(self) -> List[Message]:
+        batch, self.overflow = self.overflow, []
+        return batch
+
+    def restore_overflow(self, batch: List[Message]) -> None:
+        """Put back a batch whose compression failed."""
+        self.overflow = batch + self.overflow
+
+    def recent_text(self, limit: Optional[int] = None) -> str:
+        messages = list(self.recent)[-limit:] if limit else list(self.recent)
+        return "".join(f"{message.role.upper()}: {message.content}\n" for message in messages)
+
+    def render(self) -> str:
+        """Render the memory as a prompt block."""
+        parts = []
+        if self.summary:
+            parts.append(f"Summary of earlier conversation:\n{self.summary}")
+        if self.recent:
+            parts.append(f"Recent messages:\n{self.recent_text()}")
+        return "\n\n".join(parts)
+
+
+# LRU cache of memories keyed by session id
+_memories: "OrderedDict[int, ConversationMemory]" = OrderedDict()
+
+
+async def get_memory(session_id: int, session_db: AsyncSession) -> ConversationMemory:
+    """Return the cached memory for a session, loading recent messages on a miss."""
+    memory = _memories.get(session_id)
+    record_cache("conversation_memory", memory is not None)
+    if memory is not None:
+        _memories.move_to_end(session_id)
+        if CACHE_COHERENCE:
+            # Pick up turns answered by other workers since we last looked. Ids are assigned
+            # before commit, so a turn just below the newest one may have been committed late:
+            # look back a few ids, never past the window. `add` skips the ones already held
+            # (also this worker's own turns)
+            since = max(memory.window_start(), memory.last_message_id - CACHE_COHERENCE_LOOKBACK)
+            query = (
+                select(ChatMessage)
+                .where(ChatMessage.session_id == session_id, ChatMessage.id > since)
+                .order_by(ChatMessage.id)
+            )
+            result = await session_db.execute(query)
+            for msg in result.scalars().all():
+                memory.add(msg.role, msg.content, message_id=msg.id)
+        return memory
+
+    memory = ConversationMemory()
+    result = await session_db.execute(
+        select(Session.memory_summary, Session.memory_summary_through).where(Session.id == session_id)
+    )
+    saved = result.first()
+    query = select(ChatMessage).where(ChatMessage.session_id == session_id)
+    if saved and saved.memory_summary_through is not None:
+        # Resume from the saved summary; turns after it refill the window and the overflow
+        memory.summary = saved.memory_summary or ""
+        memory.summary_through = memory.last_message_id = saved.memory_summary_through
+        query = query.where(ChatMessage.id > saved.memory_summary_through).limit(memory.window + MAX_OVERFLOW)
+    else:
+        query = query.limit(memory.window)
+    result = await session_db.execute(query.order_by(ChatMessage.id.desc()))
+    for msg in reversed(result.scalars().all()):
+        memory.add(msg.role, msg.content, message_id=msg.id)
+
+    _memories[session_id] = memory
+    while len(_memories) > MEMORY_CACHE_SESSIONS:
+        _memories.popitem(last=False)
+    return memory
+
+
+async def save_summary(session_id: int, memory: ConversationMemory, session_db: AsyncSession) -> None:
+    """Persist the memory's summary unless the row already has one covering newer messages."""
+    if memory.summary_through is None:
+        return
+    await session_db.execute(
+        update(Session)
+        .where(
+            Session.id == session_id,
+            or_(Session.memory_summary_through.is_(None), Session.memory_summary_through < memory.summary_through),
+        )
+        .values(memory_summary=memory.summary, memory_summary_through=memory.summary_through)
+    )
+    await session_db.commit()
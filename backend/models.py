@@ -9,6 +9,12 @@ class Session(SQLModel, table=True):
     name: str = Field(index=True)
     current_summary: Optional[str] = Field(default=None)  # Evolving summary
     faiss_index_path: Optional[str] = Field(default=None)  # Path to .index file
+    chunk_size: Optional[int] = Field(default=None)  # None = config.CHUNK_SIZE
+    chunk_overlap: Optional[int] = Field(default=None)  # None = config.CHUNK_OVERLAP (PROSE_OVERLAP for the structure chunker)
+    index_quantization: Optional[str] = Field(default=None)  # None = config.INDEX_QUANTIZATION
+    vector_backend: Optional[str] = Field(default=None)  # set at creation; None = "faiss" (older sessions)
+    memory_summary: Optional[str] = Field(default=None)  # compressed chat history older than the memory window
+    memory_summary_through: Optional[int] = Field(default=None)  # newest ChatMessage id in memory_summary
     created_at: datetime = Field(default_factory=datetime.utcnow)
     
     # Relationships
@@ -0,0 +1,194 @@
+"""
+Structured logging and Prometheus metrics for the backend.
+
+Log records are rendered as one JSON object per line and written by a
+background listener thread, so request handlers never block on stdout.
+Pipeline stages are timed with `stage_timer` and exposed at `/metrics`.
+"""
+
+import atexit
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import sys
+import time
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from typing import Any, Iterator, Optional
+
+from prometheus_client import (
+    CONTENT_TYPE_LATEST,
+    CollectorRegistry,
+    Counter,
+    Histogram,
+    generate_latest,
+    multiprocess,
+)
+
+from config import LOG_LEVEL, LOG_FORMAT
+
+
+# Attributes every LogRecord carries; anything else came in through `extra=`
+_RESERVED_ATTRS = set(vars(logging.makeLogRecord({}))) | {"message", "asctime"}
+
+_listener: Optional[logging.handlers.QueueListener] = None
+_queue_handler: Optional[logging.handlers.QueueHandler] = None
+
+
+class JsonFormatter(logging.Formatter):
+    """Render a log record and its `extra` fields as a single JSON line."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        payload = {
+            "ts": datetime.fromtimestamp(record.created, tz=timezone.utc).isoformat(),
+            "level": record.levelname.lower(),
+            "logger": record.name,
+            "event": record.getMessage(),
+        }
+        for key, value in vars(record).items():
+            if key not in _RESERVED_ATTRS and not key.startswith("_"):
+                payload[key] = value
+        if record.exc_info:
+            payload["exc_info"] = self.formatException(record.exc_info)
+        return json.dumps(payload, default=str)
+
+
+def configure_logging() -> None:
+    """Route the `briefly` logger hierarchy through a non-blocking queue."""
+    global _listener, _queue_handler
+    if _listener is not None:
+        return
+
+    stream_handler = logging.StreamHandler(sys.stdout)
+    if LOG_FORMAT == "json":
+        stream_handler.setFormatter(JsonFormatter())
+    else:
+        stream_handler.setFormatter(
+            logging.Formatter("%(asctime)s %(levelname)s %(name)s: %(message)s")
+        )
+
+    log_queue: "queue.SimpleQueue[logging.LogRecord]" = queue.SimpleQueue()
+    _queue_handler = logging.handlers.QueueHandler(log_queue)
+    root = logging.getLogger("briefly")
+    root.setLevel(LOG_LEVEL)
+    root.addHandler(_queue_handler)
+    root.propagate = False
+
+    _listener = logging.handlers.QueueListener(log_queue, stream_handler)
+    _listener.start()
+    atexit.register(_listener.stop)
+
+
+def _restart_listener_after_fork() -> None:
+    """The listener thread does not survive fork(); give the child its own."""
+    global _listener
+    if _listener is None:
+        return
+    log_queue: "queue.SimpleQueue[logging.LogRecord]" = queue.SimpleQueue()
+    _queue_handler.queue = log_queue
+    _listener = logging.handlers.QueueListener(log_queue, *_listener.handlers)
+    _listener.start()
+    atexit.register(_listener.stop)
+
+
+os.register_at_fork(after_in_child=_restart_listener_after_fork)
+
+
+def get_logger(name: str) -> logging.Logger:
+    """Return a logger under the `briefly` namespace."""
+    return logging.getLogger(f"briefly.{name}")
+
+
+# Metrics
+REGISTRY = CollectorRegistry()
+
+STAGE_LATENCY = Histogram(
+    "briefly_stage_duration_seconds",
+    "Wall-clock time spent in each ingestion/chat pipeline stage.",
+    ["stage"],
+    buckets=(0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60),
+    registry=REGISTRY,
+)
+
+STAGE_ERRORS = Counter(
+    "briefly_stage_errors_total",
+    "Pipeline stages that raised an exception.",
+    ["stage"],
+    registry=REGISTRY,
+)
+
+LLM_TOKENS = Counter(
+    "briefly_llm_tokens_total",
+    "Tokens exchanged with the LLM provider.",
+    ["direction"],  # "sent" (prompt) or "received" (completion)
+    registry=REGISTRY,
+)
+
+CACHE_EVENTS = Counter(
+    "briefly_cache_events_total",
+    "In-process cache lookups by cache name and outcome.",
+    ["cache", "result"],  # result: "hit" or "miss"
+    registry=REGISTRY,
+)
+
+ADMISSION_REJECTIONS = Counter(
+    "briefly_admission_rejections_total",
+    "Requests turned away with 429 by admission control.",
+    ["scope", "reason"],  # scope: "chat", "upload" or "ingest"; reason: limit that was hit
+    registry=REGISTRY,
+)
+
+EMBED_BATCH_SIZE = Histogram(
+    "briefly_embed_query_batch_size",
+    "Chat queries embedded together in one forward pass.",
+    buckets=(1, 2, 4, 8, 16, 32, 64, 128),
+    registry=REGISTRY,
+)
+
+
+@contextmanager
+def stage_timer(stage: str) -> Iterator[None]:
+    """Record the duration of a pipeline stage into `STAGE_LATENCY`."""
+    start = time.perf_counter()
+    try:
+        yield
+    except Exception:
+        STAGE_ERRORS.labels(stage=stage).inc()
+        raise
+    finally:
+        STAGE_LATENCY.labels(stage=stage).observe(time.perf_counter() - start)
+
+
+def record_llm_usage(response: Any) -> None:
+    """Count prompt/completion tokens reported on a chat model response."""
+    metadata = getattr(response, "response_metadata", None) or {}
+    usage = metadata.get("token_usage") or {}
+    LLM_TOKENS.labels(direction="sent").inc(usage.get("prompt_tokens", 0) or 0)
+    LLM_TOKENS.labels(direction="received").inc(usage.get("completion_tokens", 0) or 0)
+
+
+def record_cache(cache: str, hit: bool) -> None:
+    """Count a cache lookup."""
+    CACHE_EVENTS.labels(cache=cache, result="hit" if hit else "miss").inc()
+
+
+def record_rejection(scope: str, reason: str) -> None:
+    """Count a request rejected by admission control."""
+    ADMISSION_REJECTIONS.labels(scope=scope, reason=reason).inc()
+
+
+def record_embed_batch(size: int) -> None:
+    """Count the queries in one batched embedding pass."""
+    EMBED_BATCH_SIZE.observe(size)
+
+
+def render_metrics() -> tuple[bytes, str]:
+    """Return the Prometheus exposition payload and its content type."""
+    if os.getenv("PROMETHEUS_MULTIPROC_DIR"):
+        # Aggregate the values every worker wrote to the shared directory
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+        return generate_latest(registry), CONTENT_TYPE_LATEST
+    return generate_latest(REGISTRY), CONTENT_TYPE_LATEST
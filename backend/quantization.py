@@ -0,0 +1,267 @@
+"""
+Quantized session indexes with full-precision re-ranking.
+
+A session index can hold its vectors as float32 (`none`), float16 (`fp16`,
+2x smaller), int8 scalar codes (`int8`, 4x) or product-quantization codes
+(`pq`, 32x with the default PQ_SUBQUANTIZERS=48 at 384 dims).
+
+Indexes quantized as one of QUANT_EXACT_VECTORS (default int8 and pq)
+keep the exact float32 vectors next to them in `vectors.f32` (raw
+little-endian rows, the same layout as session snapshots). That file is
+memory-mapped at query time: the quantized index picks
+`k * QUANT_RERANK_FACTOR` candidates, and only those rows are read back to
+re-rank them by exact distance. The vectors therefore stay on disk and in
+the page cache instead of in every worker's heap. This shrinks memory,
+not disk: the sidecar is as large as an unquantized index, so such a
+session takes more disk than with `none`.
+
+Without the sidecar (fp16 by default) the index is searched directly, and
+exports and rebuilds use the vectors decoded from its codes. For fp16 they
+are nearly exact, and the disk footprint halves.
+
+Rows are appended, so a `vectors.f32` with more rows than its index (left
+behind by a failed save) is still valid for the first `ntotal` rows. The
+one exception is discarding the chunks of a failed upload, which rewrites
+the file without their rows.
+"""
+
+import os
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+
+import faiss
+import numpy as np
+from langchain_community.vectorstores import FAISS
+from langchain_core.documents import Document
+
+from config import INDEX_QUANTIZATION, QUANT_RERANK_FACTOR, QUANT_EXACT_VECTORS, PQ_SUBQUANTIZERS, PQ_MIN_VECTORS
+from observability import get_logger
+
+
+logger = get_logger("quantization")
+
+QUANTIZATIONS = ("none", "fp16", "int8", "pq")
+VECTORS_FILE = "vectors.f32"
+
+
+def resolve_quantization(kind: Optional[str]) -> str:
+    """A session's quantization, falling back to INDEX_QUANTIZATION."""
+    kind = (kind or INDEX_QUANTIZATION).lower()
+    if kind not in QUANTIZATIONS:
+        raise ValueError(f"Unknown index quantization {kind!r}; expected one of {', '.join(QUANTIZATIONS)}")
+    return kind
+
+
+def index_kind(index: faiss.Index) -> str:
+    """The quantization a FAISS index was built with."""
+    if isinstance(index, faiss.IndexFlat):
+        return "none"
+    if isinstance(index, faiss.IndexScalarQuantizer):
+        return "fp16" if index.sq.qtype == faiss.ScalarQuantizer.QT_fp16 else "int8"
+    if isinstance(index, faiss.IndexPQ):
+        return "pq"
+    raise ValueError(f"Unsupported index type {type(index).__name__}")
+
+
+def keeps_exact_vectors(kind: str) -> bool:
+    """Whether indexes of this quantization keep a float32 `vectors.f32` for re-ranking."""
+    return kind != "none" and kind in QUANT_EXACT_VECTORS
+
+
+def effective_kind(kind: str, count: int, dim: int) -> str:
+    """PQ needs enough vectors to train its codebooks; smaller indexes use int8 until then."""
+    if kind == "pq" and (count < PQ_MIN_VECTORS or dim % PQ_SUBQUANTIZERS):
+        return "int8"
+    return kind
+
+
+def build_index(kind: str, vectors: np.ndarray) -> faiss.Index:
+    """Create, train and fill an index of the given kind."""
+    dim = vectors.shape[1]
+    if kind == "none":
+        index = faiss.IndexFlatL2(dim)
+    elif kind == "fp16":
+        index = faiss.IndexScalarQuantizer(dim, faiss.ScalarQuantizer.QT_fp16, faiss.METRIC_L2)
+    elif kind == "int8":
+        index = faiss.IndexScalarQuantizer(dim, faiss.ScalarQuantizer.QT_8bit, faiss.METRIC_L2)
+    else:
+        index = faiss.IndexPQ(dim, PQ_SUBQUANTIZERS, 8, faiss.METRIC_L2)
+        # Re-ranking absorbs the coarser codebooks of small training sets; skip the warning
+        index.pq.cp.min_points_per_centroid = 1
+    if not index.is_trained:
+        index.train(vectors)
+    index.add(vectors)
+    return index
+
+
+def vectors_path(index_dir: Path) -> Path:
+    return Path(index_dir) / VECTORS_FILE
+
+
+def read_vectors(index_dir: Path, store: FAISS, start: int = 0, count: Optional[int] = None) -> np.ndarray:
+    """
+    Float32 vectors of rows `start`..`start+count` of a session index: exact
+    when the index is flat or keeps `vectors.f32`, decoded from the codes otherwise.
+    """
+    total = store.index.ntotal
+    count = total - start if count is None else count
+    if isinstance(store.index, faiss.IndexFlat) or not vectors_path(index_dir).exists():
+        return store.index.reconstruct_n(start, count)
+    vectors = np.memmap(vectors_path(index_dir), dtype="<f4", mode="r", shape=(total, store.index.d))
+    return np.array(vectors[start:start + count])
+
+
+def _write_vectors(index_dir: Path, vectors: np.ndarray) -> None:
+    path = vectors_path(index_dir)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_name(f".{path.name}.{os.getpid()}.tmp")
+    np.ascontiguousarray(vectors, dtype="<f4").tofile(tmp)
+    os.replace(tmp, path)
+
+
+def apply_quantization(store: FAISS, index_dir: Path, kind: str, vectors: np.ndarray) -> FAISS:
+    """
+    Make `store` hold `vectors` (every row, in order) quantized as `kind`.
+
+    The current index is kept when it already matches and its encoding does
+    not depend on the data seen so far; int8 is retrained on every call so
+    its value ranges cover new vectors. Call under the index's write lock.
+    """
+    kind = effective_kind(kind, len(vectors), vectors.shape[1])
+    current = index_kind(store.index)
+    if kind != current or kind == "int8":
+        store.index = build_index(kind, vectors)
+    if keeps_exact_vectors(kind):
+        _write_vectors(index_dir, vectors)
+    return store
+
+
+def drop_vectors(index_dir: Path) -> None:
+    """Remove the re-ranking vectors of an index that no longer keeps them."""
+    vectors_path(index_dir).unlink(missing_ok=True)
+
+
+def add_to_index(
+    store: Optional[FAISS],
+    index_dir: Path,
+    kind: str,
+    batches: Iterable[Tuple[List[str], Sequence, List[dict], Optional[List[str]]]],
+    embeddings,
+) -> FAISS:
+    """
+    Append batches of embedded chunks (texts, vectors, metadatas, ids or
+    None) to a session index, keeping it quantized as `kind`. The index is re-encoded
+    once, after the last batch. Vectors of quantized indexes without
+    `vectors.f32` are carried over decoded.
+    """
+    # A flat index that stays flat needs no copy of its vectors
+    requantize = kind != "none" or (store is not None and not isinstance(store.index, faiss.IndexFlat))
+    parts = [read_vectors(index_dir, store)] if requantize and store is not None else []
+    for texts, vectors, metadatas, ids in batches:
+        pairs = list(zip(texts, vectors))
+        if store is None:
+            store = FAISS.from_embeddings(pairs, embeddings, metadatas=metadatas, ids=ids)
+        else:
+            store.add_embeddings(pairs, metadatas=metadatas, ids=ids)
+        if requantize:
+            parts.append(np.asarray(vectors, dtype="float32"))
+    if store is None:
+        raise ValueError("No chunks to add to the index")
+    if not requantize:
+        return store
+    return apply_quantization(store, index_dir, kind, np.concatenate(parts))
+
+
+def remove_from_index(store: FAISS, index_dir: Path, ids: Iterable[str]) -> int:
+    """
+    Delete chunks by id, keeping `vectors.f32` row-aligned with the index.
+    Ids not in the index are ignored. Call under the index's write lock;
+    returns the number of chunks removed.
+    """
+    rows_by_id = {docstore_id: row for row, docstore_id in store.index_to_docstore_id.items()}
+    present = [docstore_id for docstore_id in ids if docstore_id in rows_by_id]
+    if not present:
+        return 0
+    path = vectors_path(index_dir)
+    if not isinstance(store.index, faiss.IndexFlat) and path.exists():
+        vectors = read_vectors(index_dir, store)
+        _write_vectors(index_dir, np.delete(vectors, [rows_by_id[docstore_id] for docstore_id in present], axis=0))
+    store.delete(present)
+    return len(present)
+
+
+def _matches(metadata: dict, filter: Dict[str, Any]) -> bool:
+    """Metadata filter: every key must equal the value, or be one of a list of values."""
+    for key, expected in filter.items():
+        value = metadata.get(key)
+        if isinstance(expected, (list, tuple, set)):
+            if value not in expected:
+                return False
+        elif value != expected:
+            return False
+    return True
+
+
+def _matching_rows(store: FAISS, filter: Dict[str, Any]) -> np.ndarray:
+    rows = [
+        row for row, doc_id in store.index_to_docstore_id.items()
+        if _matches(store.docstore.search(doc_id).metadata, filter)
+    ]
+    return np.asarray(sorted(rows), dtype="int64")
+
+
+def _rank(store: FAISS, index_dir: Path, query: np.ndarray, rows: np.ndarray) -> np.ndarray:
+    """Order rows of a quantized index by exact distance to `query`."""
+    rows = np.sort(rows)
+    vectors = None
+    if vectors_path(index_dir).exists():
+        try:
+            memmap = np.memmap(vectors_path(index_dir), dtype="<f4", mode="r", shape=(store.index.ntotal, store.index.d))
+            vectors = memmap[rows]
+        except (OSError, ValueError):
+            logger.warning("re-ranking vectors unreadable", extra={"index": str(index_dir)})
+    if vectors is None:
+        # No (usable) vectors file: rank by the decoded codes instead
+        vectors = store.index.reconstruct_batch(rows)
+    distances = ((vectors - query) ** 2).sum(axis=1)
+    return rows[np.argsort(distances, kind="stable")]
+
+
+def _documents(store: FAISS, rows: np.ndarray) -> List[Document]:
+    return [store.docstore.search(store.index_to_docstore_id[int(i)]) for i in rows]
+
+
+def search(
+    store: FAISS,
+    index_dir: Path,
+    query_vector: List[float],
+    k: int,
+    filter: Optional[Dict[str, Any]] = None,
+) -> List[Document]:
+    """
+    Top-k chunks for a query vector, re-ranked by exact distance on
+    quantized indexes. With a metadata `filter` only matching chunks are
+    searched: a flat index skips the others during the scan, a quantized
+    one ranks the matching rows exactly.
+    """
+    query = np.asarray([query_vector], dtype="float32")
+    if filter:
+        rows = _matching_rows(store, filter)
+        if not len(rows):
+            return []
+        if not isinstance(store.index, faiss.IndexFlat):
+            return _documents(store, _rank(store, index_dir, query, rows)[:k])
+        selector = faiss.IDSelectorBatch(rows)
+        _, ids = store.index.search(query, min(k, len(rows)), params=faiss.SearchParameters(sel=selector))
+        return _documents(store, ids[0][ids[0] >= 0])
+
+    if isinstance(store.index, faiss.IndexFlat):
+        return store.similarity_search_by_vector(query_vector, k=k)
+    if not vectors_path(index_dir).exists():
+        # Re-ranking by decoded codes would not change the index's own order
+        _, ids = store.index.search(query, k)
+        return _documents(store, ids[0][ids[0] >= 0])
+
+    fetch = min(store.index.ntotal, k * max(1, QUANT_RERANK_FACTOR))
+    _, ids = store.index.search(query, fetch)
+    return _documents(store, _rank(store, index_dir, query, ids[0][ids[0] >= 0])[:k])
@@ -8,6 +8,7 @@ from datetime import datetime
 from sqlmodel import select
 from database import async_session, init_db
 from models import Session, Document
+from storage import STORAGE_DIR, FAISS_INDEX_DIR
 
 
 async def recover_sessions():
@@ -17,8 +18,8 @@ async def recover_sessions():
     
     await init_db()
     
-    faiss_dir = Path("backend/faiss_indexes")
-    storage_dir = Path("backend/storage")
+    faiss_dir = FAISS_INDEX_DIR
+    storage_dir = STORAGE_DIR
     
     # Find all session directories
     session_dirs = [d for d in faiss_dir.iterdir() if d.is_dir() and d.name.startswith("session_")]
@@ -39,7 +40,8 @@ async def recover_sessions():
                 print(f"  ✓ Session {session_id} already exists")
                 continue
             
-            # Find associated documents in storage
+            # Find associated documents in storage (legacy per-session file names;
+            # content-addressed blobs carry no session and cannot be recovered this way)
             doc_files = list(storage_dir.glob(f"session_{session_id}_*"))
             
             print(f"\n  📁 Recovering Session {session_id}")
@@ -51,7 +53,7 @@ async def recover_sessions():
                 id=session_id,
                 name=f"Recovered Session {session_id}",
                 created_at=datetime.utcnow(),
-                faiss_index_path=str(session_dir / "index.faiss") if (session_dir / "index.faiss").exists() else None
+                faiss_index_path=str(session_dir) if (session_dir / "index.faiss").exists() else None
             )
             db.add(new_session)
             
@@ -65,7 +67,6 @@ async def recover_sessions():
                     session_id=session_id,
                     filename=original_name,
                     file_path=str(doc_file),
-                    content_preview="[Recovered document - content not available]"
                 )
                 db.add(doc)
                 print(f"     - {original_name}")
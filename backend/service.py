@@ -1,19 +1,43 @@
-import os
-import shutil
-from typing import Optional, List
+import re
+import asyncio
+import uuid
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Optional, List, Dict, Tuple
 from pathlib import Path
-import faiss
-import numpy as np
-from pypdf import PdfReader
-from langchain_text_splitters import RecursiveCharacterTextSplitter
 from langchain_huggingface import HuggingFaceEmbeddings
 from langchain_groq import ChatGroq
-from config import GROQ_API_KEY, GROQ_MODEL
+from config import (
+    GROQ_API_KEY,
+    GROQ_MODEL,
+    EMBEDDINGS_MODEL,
+    EMBEDDING_BATCH_SIZE,
+    INGEST_WORKERS,
+    OCR_ENABLED,
+    OCR_LANG,
+    MEMORY_REWRITE,
+    RETRIEVAL_K,
+    MEMORY_SUMMARY_MAX_CHARS,
+)
 from langchain_core.prompts import PromptTemplate
-from langchain_community.vectorstores import FAISS
+from sqlalchemy import insert
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlmodel import select, Session as SQLSession
-from models import Session, Document, ChatMessage
+from sqlmodel import select
+from models import Session, ChatMessage
+from extraction import scan_pdf, ocr_page, ocr_available
+from chunking import Chunk, chunk_pages
+from memory import ConversationMemory, Message, get_memory, save_summary
+from database import async_session
+from vectorstores import ChunkBatch, store_for
+from storage import OCR_CACHE_DIR, resolve_blob
+from batching import EmbeddingBatcher
+from observability import get_logger, stage_timer, record_llm_usage, record_cache
+
+
+logger = get_logger("service")
 
 
 # Lazy-load embeddings to avoid slow initialization at import time
@@ -22,12 +46,20 @@ _embeddings = None
 def get_embeddings() -> HuggingFaceEmbeddings:
     """Get or create embeddings instance (lazy-loaded)."""
     global _embeddings
+    record_cache("embeddings_model", _embeddings is not None)
     if _embeddings is None:
-        print("[*] Loading HuggingFace embeddings (this may take a moment)...")
-        _embeddings = HuggingFaceEmbeddings(model_name="sentence-transformers/all-MiniLM-L6-v2")
-        print("[OK] Embeddings loaded")
+        logger.info("loading embeddings model")
+        with stage_timer("embeddings_model_load"):
+            _embeddings = HuggingFaceEmbeddings(
+                model_name=EMBEDDINGS_MODEL,
+                encode_kwargs={"batch_size": EMBEDDING_BATCH_SIZE},
+            )
+        logger.info("embeddings model loaded")
     return _embeddings
 
+# Chat queries from concurrent requests share forward passes (looked up per batch, so stubs apply)
+query_embedder = EmbeddingBatcher(lambda: get_embeddings())
+
 def get_llm() -> ChatGroq:
     """Create a Groq client on-demand. Raises if API key missing."""
     if not GROQ_API_KEY:
@@ -41,29 +73,132 @@ def get_llm() -> ChatGroq:
         groq_api_key=GROQ_API_KEY,
     )
 
-# Text splitter configuration
-text_splitter = RecursiveCharacterTextSplitter(
-    chunk_size=1000,
-    chunk_overlap=200,
-)
 
-# Use absolute paths based on this file's location to avoid working directory issues
-BASE_DIR = Path(__file__).parent
-STORAGE_DIR = BASE_DIR / "storage"
-FAISS_INDEX_DIR = BASE_DIR / "faiss_indexes"
+# Process pool for PDF parsing (pypdf is pure Python and holds the GIL)
+_ingest_pool: Optional[ProcessPoolExecutor] = None
 
-# Ensure directories exist
-STORAGE_DIR.mkdir(parents=True, exist_ok=True)
-FAISS_INDEX_DIR.mkdir(parents=True, exist_ok=True)
+def get_ingest_pool() -> ProcessPoolExecutor:
+    """Get or create the PDF extraction process pool (lazy-loaded)."""
+    global _ingest_pool
+    if _ingest_pool is None:
+        _ingest_pool = ProcessPoolExecutor(
+            max_workers=INGEST_WORKERS,
+            mp_context=multiprocessing.get_context("spawn"),
+        )
+    return _ingest_pool
+
+
+def close_ingest_pool() -> None:
+    """Shut down the extraction pool, if it was started."""
+    global _ingest_pool
+    if _ingest_pool is not None:
+        _ingest_pool.shutdown(wait=False, cancel_futures=True)
+        _ingest_pool = None
+
+
+@dataclass
+class ExtractedPDF:
+    """Text and chunks pulled out of one PDF, ready to be indexed."""
+    file_path: str
+    text: str
+    chunks: List[Chunk] = field(default_factory=list)
+    name: Optional[str] = None  # original upload name; blobs are named by hash
+    error: Optional[str] = None  # why the PDF could not be read (corrupt, encrypted...); no chunks then
+
+    @property
+    def filename(self) -> str:
+        return self.name or Path(self.file_path).name
+
+
+_ocr_ready: Optional[bool] = None
+
+
+def ocr_enabled() -> bool:
+    """Whether OCR is configured and its dependencies are installed (checked once)."""
+    global _ocr_ready
+    if _ocr_ready is None:
+        _ocr_ready = OCR_ENABLED and ocr_available()
+        if OCR_ENABLED and not _ocr_ready:
+            logger.warning("OCR_ENABLED is set but pytesseract, Pillow or tesseract is missing; scanned pages will be empty")
+    return _ocr_ready
+
+
+async def extract_pages_from_pdf(file_path: str) -> List[str]:
+    """Extract the text of each page of a PDF without blocking the event loop."""
+    resolved = resolve_blob(file_path)
+    if resolved is None:
+        raise FileNotFoundError(f"PDF not found: {file_path}")
+    loop = asyncio.get_running_loop()
+    pool = get_ingest_pool()
+    cache_dir = str(OCR_CACHE_DIR) if ocr_enabled() else None
+    with stage_timer("pdf_extract"):
+        scan = await loop.run_in_executor(pool, scan_pdf, str(resolved), cache_dir)
+
+    for _ in range(scan.cache_hits):
+        record_cache("ocr", True)
+    if scan.pending:
+        # OCR each distinct page image once, spreading pages across the pool
+        by_digest: Dict[str, List[int]] = {}
+        for index, digest in scan.pending:
+            by_digest.setdefault(digest, []).append(index)
+        with stage_timer("ocr"):
+            results = await asyncio.gather(
+                *(
+                    loop.run_in_executor(pool, ocr_page, str(resolved), indexes[0], digest, cache_dir, OCR_LANG)
+                    for digest, indexes in by_digest.items()
+                ),
+                return_exceptions=True,
+            )
+        for (digest, indexes), text in zip(by_digest.items(), results):
+            record_cache("ocr", False)
+            if isinstance(text, BaseException):
+                logger.warning("ocr failed", extra={"file": str(resolved), "page": indexes[0], "error": str(text)})
+                continue
+            for index in indexes:
+                scan.pages[index] = text
+        logger.info(
+            "ocr complete",
+            extra={"file": str(resolved), "pages": len(scan.pending), "cached": scan.cache_hits},
+        )
+    return scan.pages
 
 
 async def extract_text_from_pdf(file_path: str) -> str:
-    """Extract text from a PDF file."""
-    reader = PdfReader(file_path)
-    text = ""
-    for page in reader.pages:
-        text += page.extract_text() + "\n"
-    return text
+    """Extract the text of a PDF, one page per line block."""
+    return "".join(page + "\n" for page in await extract_pages_from_pdf(file_path))
+
+
+async def extract_pdfs(
+    file_paths: List[str],
+    filenames: Optional[List[str]] = None,
+    chunk_size: Optional[int] = None,
+    chunk_overlap: Optional[int] = None,
+) -> List[ExtractedPDF]:
+    """
+    Extract and chunk several PDFs, parsing them in parallel.
+
+    `chunk_size`/`chunk_overlap` default to CHUNK_SIZE/CHUNK_OVERLAP;
+    pass a session's own settings to override them. A PDF that cannot be
+    read comes back with `error` set instead of failing the others.
+    """
+    documents = await asyncio.gather(
+        *(extract_pages_from_pdf(path) for path in file_paths), return_exceptions=True,
+    )
+    names = filenames or [None] * len(file_paths)
+    extracted = []
+    for path, name, pages in zip(file_paths, names, documents):
+        if isinstance(pages, BaseException):
+            # A crashed pool or a cancelled request is not the file's fault
+            if isinstance(pages, BrokenProcessPool) or not isinstance(pages, Exception):
+                raise pages
+            logger.warning("pdf extraction failed", extra={"file": name or path, "error": str(pages)})
+            extracted.append(ExtractedPDF(file_path=path, text="", name=name, error=str(pages) or type(pages).__name__))
+            continue
+        with stage_timer("split"):
+            chunks = chunk_pages(pages, chunk_size, chunk_overlap)
+        text = "".join(page + "\n" for page in pages)
+        extracted.append(ExtractedPDF(file_path=path, text=text, chunks=chunks, name=name))
+    return extracted
 
 
 async def generate_new_summary(text: str) -> str:
@@ -83,7 +218,9 @@ Provide a clear, structured summary."""
     
     llm = get_llm()
     chain = prompt | llm
-    result = chain.invoke({"text": trimmed_text})
+    with stage_timer("llm_summary"):
+        result = await chain.ainvoke({"text": trimmed_text})
+    record_llm_usage(result)
     return result.content
 
 
@@ -122,133 +259,334 @@ Return the refined, integrated summary."""
     
     llm = get_llm()
     chain = prompt | llm
-    result = chain.invoke({
-        "old_summary": old_summary,
-        "new_summary": new_summary,
-        "context": recent_context,
-    })
+    with stage_timer("llm_refine"):
+        result = await chain.ainvoke({
+            "old_summary": old_summary,
+            "new_summary": new_summary,
+            "context": recent_context,
+        })
+    record_llm_usage(result)
     return result.content
 
 
 async def get_recent_context(session_id: int, session_db: AsyncSession) -> str:
-    """Retrieve recent chat messages for context."""
-    query = select(ChatMessage).where(ChatMessage.session_id == session_id).order_by(ChatMessage.timestamp.desc()).limit(5)
-    result = await session_db.execute(query)
-    messages = result.scalars().all()
+    """Retrieve recent chat messages for context (served from conversation memory)."""
+    memory = await get_memory(session_id, session_db)
+    context = memory.recent_text(limit=5)
+    return context if context else "No recent context."
+
+
+# Follow-ups that cannot stand alone: an elliptical opener ("and the second?"), a pronoun
+# pointing back at earlier turns, or a query ending on "that", "one", "more"...
+FOLLOW_UP_PATTERN = re.compile(
+    r"^\s*(and|but|so|or|also|then|why|what about|how about)\b"
+    r"|\b(it|its|they|them|their|these|those|he|she|him|her|his|former|latter)\b"
+    r"|\b(this|that|one|ones|more|again)\W*$",
+    re.IGNORECASE,
+)
+
+
+def needs_rewrite(query: str, memory: ConversationMemory) -> bool:
+    """Decide whether a query should be rewritten into a standalone question."""
+    if memory.is_empty or MEMORY_REWRITE == "off":
+        return False
+    if MEMORY_REWRITE == "always":
+        return True
+    return bool(FOLLOW_UP_PATTERN.search(query))
+
+
+async def condense_question(history: str, query: str) -> str:
+    """Rewrite a follow-up question into a standalone retrieval query."""
+    prompt = PromptTemplate(
+        input_variables=["history", "query"],
+        template="""Given the conversation below and a follow-up question, rewrite the follow-up as a single standalone question that can be understood without the conversation. Keep names, numbers and dates. Return only the rewritten question.
+
+{history}
+
+Follow-up question: {query}
+
+Standalone question:"""
+    )
     
-    context = ""
-    for msg in reversed(messages):
-        context += f"{msg.role.upper()}: {msg.content}\n"
+    llm = get_llm()
+    chain = prompt | llm
+    with stage_timer("llm_rewrite"):
+        result = await chain.ainvoke({"history": history, "query": query})
+    record_llm_usage(result)
+    return result.content.strip() or query
+
+
+async def compress_history(summary: str, messages: List[Message]) -> str:
+    """Fold messages that left the memory window into the running summary."""
+    transcript = "".join(f"{message.role.upper()}: {message.content}\n" for message in messages)
+    prompt = PromptTemplate(
+        input_variables=["summary", "transcript", "max_chars"],
+        template="""Update the running summary of a conversation about meeting documents with the new messages. Keep facts, names, numbers and what the user was interested in; drop pleasantries. Stay under {max_chars} characters.
+
+CURRENT SUMMARY:
+{summary}
+
+NEW MESSAGES:
+{transcript}
+
+Updated summary:"""
+    )
     
-    return context if context else "No recent context."
+    llm = get_llm()
+    chain = prompt | llm
+    with stage_timer("llm_compress"):
+        result = await chain.ainvoke({
+            "summary": summary or "(empty)",
+            "transcript": transcript,
+            "max_chars": MEMORY_SUMMARY_MAX_CHARS,
+        })
+    record_llm_usage(result)
+    return result.content.strip()[:MEMORY_SUMMARY_MAX_CHARS]
+
+
+# Keep references so background tasks are not garbage-collected mid-flight
+_background_tasks: set = set()
+
+
+async def _compress_memory(session_id: int, memory: ConversationMemory) -> None:
+    async with memory.lock:
+        if not memory.needs_compression():
+            return
+        batch = memory.take_overflow()
+        try:
+            memory.summary = await compress_history(memory.summary, batch)
+        except Exception:
+            memory.restore_overflow(batch)
+            logger.exception("history compression failed")
+            return
+        ids = [message.message_id for message in batch if message.message_id is not None]
+        if ids:
+            memory.summary_through = max(ids + [memory.summary_through or 0])
+        try:
+            # Keep the summary across cache evictions, restarts and workers
+            async with async_session() as session_db:
+                await save_summary(session_id, memory, session_db)
+        except Exception:
+            logger.exception("saving history summary failed", extra={"session_id": session_id})
+
+
+def remember_turn(memory: ConversationMemory, user_msg: ChatMessage, assistant_msg: ChatMessage) -> None:
+    """Record a chat turn and compress older turns in the background when due."""
+    memory.add("user", user_msg.content, message_id=user_msg.id)
+    memory.add("assistant", assistant_msg.content, message_id=assistant_msg.id)
+    if memory.needs_compression():
+        task = asyncio.create_task(_compress_memory(user_msg.session_id, memory))
+        _background_tasks.add(task)
+        task.add_done_callback(_background_tasks.discard)
+
+
+async def get_session_row(session_id: int, session_db: AsyncSession) -> Optional[Session]:
+    """Load a session by id."""
+    result = await session_db.execute(select(Session).where(Session.id == session_id))
+    return result.scalar_one_or_none()
+
+
+async def save_turn(
+    session_db: AsyncSession,
+    session_id: int,
+    query: str,
+    answer: str,
+    asked_at: datetime,
+) -> Tuple[ChatMessage, ChatMessage]:
+    """Insert a user question and its answer in one statement (not committed)."""
+    messages = (
+        ChatMessage(session_id=session_id, role="user", content=query, timestamp=asked_at),
+        ChatMessage(session_id=session_id, role="assistant", content=answer, timestamp=datetime.utcnow()),
+    )
+    result = await session_db.execute(
+        insert(ChatMessage)
+        .values([message.model_dump(exclude={"id"}) for message in messages])
+        .returning(ChatMessage.id, ChatMessage.role)
+    )
+    # RETURNING order is not guaranteed on every backend; roles tell the rows apart
+    ids = {role: message_id for message_id, role in result.all()}
+    for message in messages:
+        message.id = ids[message.role]
+    return messages
 
 
-async def ingest_pdf(session_id: int, file_path: str, session_db: AsyncSession) -> None:
+async def ingest_pdf(
+    session_id: int,
+    file_path: str,
+    session_db: AsyncSession,
+    filename: Optional[str] = None,
+    chunk_size: Optional[int] = None,
+    chunk_overlap: Optional[int] = None,
+    session: Optional[Session] = None,
+) -> None:
     """
     Ingest a PDF file:
     1. Extract text
-    2. Update FAISS index
+    2. Add its chunks to the session's vector store
     3. Update session summary
     """
-    # Get session
-    query = select(Session).where(Session.id == session_id)
-    result = await session_db.execute(query)
-    session = result.scalar_one_or_none()
+    extracted = await extract_pdfs(
+        [file_path], [filename] if filename else None, chunk_size=chunk_size, chunk_overlap=chunk_overlap,
+    )
+
+    if extracted[0].error:
+        raise ValueError(f"Could not read PDF: {extracted[0].error}")
+    # Guard: if no text was extracted, fail fast to avoid an empty index
+    if not extracted[0].chunks:
+        raise ValueError("PDF has no extractable text; please upload a PDF with text content")
+
+    await index_documents(session_id, extracted, session_db, session=session)
+
+
+def _summary_input(extracted: List[ExtractedPDF], max_chars: int = 12000) -> str:
+    """Combine several documents into one summary prompt, sharing the size budget."""
+    if len(extracted) == 1:
+        return extracted[0].text
+    budget = max_chars // len(extracted)
+    return "\n\n".join(
+        f"--- Document: {doc.filename} ---\n{doc.text[:budget]}" for doc in extracted
+    )
+
+
+async def index_documents(
+    session_id: int,
+    extracted: List[ExtractedPDF],
+    session_db: AsyncSession,
+    session: Optional[Session] = None,
+) -> Dict[str, int]:
+    """
+    Add already-extracted documents to a session in one pass:
+    1. Embed all chunks in a single batched call
+    2. Write them to the session's vector store in one upsert
+    3. Refresh the session summary once for the whole batch
+
+    Pending changes on `session_db` (e.g. new Document rows) are committed
+    together with the summary. Pass `session` when the caller has already
+    loaded it from `session_db`. Returns the chunk count per file path.
+    """
+    if session is None:
+        session = await get_session_row(session_id, session_db)
     
     if not session:
         raise ValueError(f"Session {session_id} not found")
-    
-    # Extract text from PDF
-    text = await extract_text_from_pdf(file_path)
-    
-    # Chunk the text
-    chunks = text_splitter.split_text(text)
 
-    # Guard: if no text was extracted, fail fast to avoid empty FAISS index
-    if not text.strip() or not chunks:
-        raise ValueError("PDF has no extractable text; please upload a PDF with text content")
-    
-    # Load or create FAISS index
-    faiss_path = FAISS_INDEX_DIR / f"session_{session_id}"
-    
-    if session.faiss_index_path and os.path.exists(faiss_path):
-        # Load existing index
-        vector_store = FAISS.load_local(str(faiss_path), get_embeddings(), allow_dangerous_deserialization=True)
-    else:
-        # Create new index with the first batch of chunks
-        vector_store = FAISS.from_texts(chunks, get_embeddings())
-        chunks = []  # already added on creation
-    
-    # Add remaining chunks to the index (if any)
-    if chunks:
-        vector_store.add_texts(chunks)
-    
-    # Save updated index
-    vector_store.save_local(str(faiss_path))
-    
-    # Update session with FAISS path
-    session.faiss_index_path = str(faiss_path)
-    
-    # Generate summary of new PDF
-    new_summary = await generate_new_summary(text)
-    
-    # Get recent context
-    recent_context = await get_recent_context(session_id, session_db)
-    
-    # Refine the overall summary
-    refined_summary = await refine_summary(
-        new_summary=new_summary,
-        old_summary=session.current_summary,
-        recent_context=recent_context,
-    )
+    extracted = [doc for doc in extracted if doc.chunks]
+    if not extracted:
+        raise ValueError("No documents with extractable text to ingest")
+
+    chunks = [chunk.text for doc in extracted for chunk in doc.chunks]
+    metadatas = [
+        {"source": doc.filename, "page": chunk.page} if chunk.page else {"source": doc.filename}
+        for doc in extracted for chunk in doc.chunks
+    ]
     
-    session.current_summary = refined_summary
+    # Embed chunks up front so embedding time is measured apart from index I/O
+    embeddings = get_embeddings()
+    with stage_timer("embed"):
+        vectors = await asyncio.to_thread(embeddings.embed_documents, chunks)
     
-    # Save changes
-    session_db.add(session)
-    await session_db.commit()
+    store = store_for(session)
+    ids = [str(uuid.uuid4()) for _ in chunks]
+    try:
+        # May record where the vectors live on the session (e.g. its FAISS path); database-backed
+        # stores write in this transaction, so chunks are committed together with the new rows
+        await store.upsert(session, [ChunkBatch(chunks, vectors, metadatas, ids)], session_db)
+        
+        # Generate one summary covering every new PDF
+        new_summary = await generate_new_summary(_summary_input(extracted))
+        
+        # Get recent context
+        recent_context = await get_recent_context(session_id, session_db)
+        
+        # Refine the overall summary
+        refined_summary = await refine_summary(
+            new_summary=new_summary,
+            old_summary=session.current_summary,
+            recent_context=recent_context,
+        )
+        
+        session.current_summary = refined_summary
+        
+        # Save changes
+        session_db.add(session)
+        with stage_timer("db_commit"):
+            await session_db.commit()
+    except Exception:
+        if not store.transactional:
+            # The caller rolls back the Document rows; remove their chunks so they are neither
+            # searchable nor duplicated when the upload is retried
+            try:
+                await store.discard(session, ids, session_db)
+            except Exception:
+                logger.exception("ingestion cleanup failed", extra={"session_id": session_id})
+        raise
     await session_db.refresh(session)
+    logger.info(
+        "documents ingested",
+        extra={"session_id": session_id, "documents": len(extracted), "chunks": len(chunks)},
+    )
+    return {doc.file_path: len(doc.chunks) for doc in extracted}
+
+
+async def requantize_index(session: Session) -> None:
+    """Rebuild a session's index with its current quantization setting."""
+    store = store_for(session)
+    await store.requantize(session)
+    logger.info(
+        "index requantized",
+        extra={"session_id": session.id, "backend": store.name, "quantization": session.index_quantization},
+    )
 
 
 async def chat_with_documents(
     session_id: int,
     query: str,
     session_db: AsyncSession,
+    session: Optional[Session] = None,
+    sources: Optional[List[str]] = None,
 ) -> str:
     """
     Chat with documents using RAG:
-    1. Load FAISS index
-    2. Perform similarity search
+    1. Embed the (possibly rewritten) query
+    2. Search the session's vector store
     3. Generate response with LLM
     4. Save messages to DB
     5. Return response
+    
+    Pass `session` when the caller has already loaded it from `session_db`.
+    `sources` limits retrieval to chunks of those document filenames.
     """
-    print(f"[*] chat_with_documents called for session {session_id}, query: '{query}'")
+    logger.info("chat started", extra={"session_id": session_id, "query_chars": len(query)})
+    asked_at = datetime.utcnow()
     
-    # Get session
-    query_obj = select(Session).where(Session.id == session_id)
-    result = await session_db.execute(query_obj)
-    session = result.scalar_one_or_none()
+    if session is None:
+        session = await get_session_row(session_id, session_db)
     
-    if not session or not session.faiss_index_path:
-        print("[!] No FAISS index found")
+    if not session:
+        logger.warning("no index for session", extra={"session_id": session_id})
         return "No documents uploaded yet. Please upload PDFs first."
     
-    # Load FAISS index
-    faiss_path = session.faiss_index_path
-    if not os.path.exists(faiss_path):
-        print(f"[!] FAISS path not found: {faiss_path}")
-        return "Vector store not found. Please re-upload documents."
+    vector_store = store_for(session)
+    if not await vector_store.has_vectors(session, session_db):
+        logger.warning("no index for session", extra={"session_id": session_id, "backend": vector_store.name})
+        return "No documents uploaded yet. Please upload PDFs first."
     
     try:
-        print(f"[*] Loading FAISS index from {faiss_path}")
-        vector_store = FAISS.load_local(faiss_path, get_embeddings(), allow_dangerous_deserialization=True)
-        print("[OK] FAISS index loaded")
+        # Rewrite follow-ups ("and the second one?") into standalone queries for retrieval
+        memory = await get_memory(session_id, session_db)
+        history = memory.render()
+        search_query = query
+        if needs_rewrite(query, memory):
+            search_query = await condense_question(history, query)
         
         # Retrieve relevant documents
-        print("[*] Retrieving relevant documents...")
-        docs = vector_store.similarity_search(query, k=5)
-        print(f"[OK] Found {len(docs)} relevant documents")
+        with stage_timer("embed_query"):
+            query_vector = await query_embedder.embed(search_query)
+        with stage_timer("search"):
+            docs = await vector_store.search(
+                session, query_vector, k=RETRIEVAL_K,
+                filter={"source": sources} if sources else None, session_db=session_db,
+            )
         
         if not docs:
             answer = "I couldn't find relevant information in the documents to answer your question."
@@ -283,18 +621,20 @@ Requirements:
                 format_instruction = "\n\nIMPORTANT: Keep your answer brief and concise, maximum 2-3 sentences."
             elif "lines" in query_lower:
                 # Extract number of lines if specified (e.g., "in 2 lines", "in 5 lines")
-                import re
                 match = re.search(r'(\d+)\s+lines?', query_lower)
                 if match:
                     num_lines = match.group(1)
                     format_instruction = f"\n\nIMPORTANT: Provide your answer in exactly {num_lines} lines or fewer."
             
+            # Earlier conversation, bounded by the memory window and summary size
+            history_block = "Conversation so far:\n{history}\n\n" if history else ""
+            
             # Create prompt with format enforcement
             prompt = PromptTemplate(
-                input_variables=["context", "query"],
+                input_variables=["context", "query"] + (["history"] if history else []),
                 template="""Based on the following context from documents, answer the question. If the answer is not in the context, say so.
 
-Context:
+""" + history_block + """Context:
 {context}
 
 Question: {query}""" + format_instruction + """
@@ -302,31 +642,35 @@ Question: {query}""" + format_instruction + """
 Answer:"""
             )
             
-            print("[*] Creating LLM chain...")
             llm = get_llm()
             chain = prompt | llm
             
-            print(f"[*] Invoking LLM with query: {query[:100]}...")
-            response = chain.invoke({"context": context, "query": query})
+            inputs = {"context": context, "query": query}
+            if history:
+                inputs["history"] = history
+            with stage_timer("llm_chat"):
+                response = await chain.ainvoke(inputs)
+            record_llm_usage(response)
             answer = response.content if hasattr(response, 'content') else str(response)
-            print(f"[OK] Response received: {answer[:100]}...")
-        
-        # Save user message
-        user_msg = ChatMessage(session_id=session_id, role="user", content=query)
-        session_db.add(user_msg)
         
-        # Save assistant message
-        assistant_msg = ChatMessage(session_id=session_id, role="assistant", content=answer)
-        session_db.add(assistant_msg)
-        
-        await session_db.commit()
-        print("[OK] Messages saved to database")
+        # Save the question and answer together
+        with stage_timer("db_commit"):
+            user_msg, assistant_msg = await save_turn(session_db, session_id, query, answer, asked_at)
+            await session_db.commit()
+        remember_turn(memory, user_msg, assistant_msg)
+        logger.info(
+            "chat answered",
+            extra={
+                "session_id": session_id,
+                "retrieved": len(docs),
+                "answer_chars": len(answer),
+                "rewritten": search_query != query,
+            },
+        )
         
         return answer
         
-    except Exception as e:
-        import traceback
-        print(f"[!] Error in chat_with_documents: {str(e)}")
-        print(traceback.format_exc())
+    except Exception:
+        logger.exception("chat_with_documents failed", extra={"session_id": session_id})
         raise
 
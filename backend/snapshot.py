@@ -0,0 +1,316 @@
+"""
+Session snapshots: export a session to one archive and import it elsewhere.
+
+A snapshot is a ZIP file, which can be written as a stream and read back
+member by member through its central directory. It contains:
+
+    manifest.json      format version, session row, counts, embedding model/dim
+    documents.jsonl    Document rows, each pointing at a member under blobs/
+    messages.jsonl     ChatMessage rows
+    chunks.jsonl       chunk text + metadata, in vector order
+    vectors.f32        raw little-endian float32 vectors (count x dim)
+    blobs/<name>       the PDFs, copied as stored (possibly .gz)
+
+Vectors are carried over, so importing never re-embeds. Chunks and vectors
+are read in batches, so large sessions import without loading the whole
+archive into memory. No pickles are read from the archive. Snapshots do
+not depend on the vector backend: a session exported from one backend is
+imported into VECTOR_BACKEND.
+
+Usage:
+    python snapshot.py export <session_id> <archive.zip>
+    python snapshot.py import <archive.zip> [--name NAME]
+"""
+
+import asyncio
+import gzip
+import io
+import json
+import shutil
+import tempfile
+import zipfile
+from datetime import datetime
+from pathlib import Path
+from typing import BinaryIO, Iterator, List, Optional, Tuple
+
+import numpy as np
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlmodel import select
+
+from config import EMBEDDINGS_MODEL
+from quantization import QUANTIZATIONS
+from models import Session, Document, ChatMessage
+from observability import get_logger, stage_timer
+from storage import resolve_blob, store_blob
+from vectorstores import ChunkBatch, VectorStore, get_vector_store, store_for
+
+
+logger = get_logger("snapshot")
+
+FORMAT_VERSION = 1
+BATCH_SIZE = 2048  # chunks/vectors handled per step
+
+
+class SnapshotError(ValueError):
+    """Raised for archives that cannot be imported."""
+
+
+def _dump_jsonl(archive: zipfile.ZipFile, name: str, rows: Iterator[dict]) -> None:
+    with archive.open(name, "w", force_zip64=True) as member:
+        for row in rows:
+            member.write(json.dumps(row, default=str).encode() + b"\n")
+
+
+def _read_jsonl(archive: zipfile.ZipFile, name: str) -> Iterator[dict]:
+    with archive.open(name) as member:
+        for line in io.TextIOWrapper(member, encoding="utf-8"):
+            if line.strip():
+                yield json.loads(line)
+
+
+def _parse_time(value: Optional[str]) -> Optional[datetime]:
+    return datetime.fromisoformat(value) if value else None
+
+
+async def export_session(session_id: int, target: BinaryIO, session_db: AsyncSession) -> dict:
+    """Write a snapshot of a session to `target` and return its manifest."""
+    session = (await session_db.execute(select(Session).where(Session.id == session_id))).scalar_one_or_none()
+    if not session:
+        raise ValueError(f"Session {session_id} not found")
+
+    documents = (await session_db.execute(
+        select(Document).where(Document.session_id == session_id).order_by(Document.id)
+    )).scalars().all()
+    messages = (await session_db.execute(
+        select(ChatMessage).where(ChatMessage.session_id == session_id).order_by(ChatMessage.id)
+    )).scalars().all()
+
+    manifest = {
+        "format": "briefly-session",
+        "version": FORMAT_VERSION,
+        "exported_at": datetime.utcnow().isoformat(),
+        "embeddings_model": EMBEDDINGS_MODEL,
+        "session": {
+            "name": session.name,
+            "current_summary": session.current_summary,
+            "created_at": session.created_at.isoformat(),
+            "chunk_size": session.chunk_size,
+            "chunk_overlap": session.chunk_overlap,
+            "index_quantization": session.index_quantization,
+        },
+        "documents": len(documents),
+        "messages": len(messages),
+    }
+    with stage_timer("snapshot_export"), zipfile.ZipFile(target, "w", zipfile.ZIP_DEFLATED) as archive:
+        await asyncio.to_thread(_write_rows, archive, documents, messages)
+        manifest["chunks"], manifest["dim"] = await _write_chunks(archive, store_for(session), session, session_db)
+        # Written last so a truncated archive has no manifest and is rejected
+        archive.writestr("manifest.json", json.dumps(manifest, indent=2))
+
+    logger.info("session exported", extra={"session_id": session_id, "chunks": manifest["chunks"]})
+    return manifest
+
+
+def _write_rows(archive: zipfile.ZipFile, documents: List[Document], messages: List[ChatMessage]) -> None:
+    doc_rows = []
+    for doc in documents:
+        blob = resolve_blob(doc.file_path)
+        member = f"blobs/{blob.name}" if blob else None
+        if blob and member not in archive.NameToInfo:
+            # PDFs are already compressed; store them as-is
+            archive.write(blob, member, compress_type=zipfile.ZIP_STORED)
+        doc_rows.append({
+            "filename": doc.filename,
+            "upload_timestamp": doc.upload_timestamp,
+            "blob": member,
+        })
+    _dump_jsonl(archive, "documents.jsonl", iter(doc_rows))
+    _dump_jsonl(archive, "messages.jsonl", (
+        {"role": msg.role, "content": msg.content, "timestamp": msg.timestamp} for msg in messages
+    ))
+
+
+def _copy_member(archive: zipfile.ZipFile, info: zipfile.ZipInfo, source: BinaryIO) -> None:
+    source.seek(0)
+    with archive.open(info, "w", force_zip64=True) as member:
+        shutil.copyfileobj(source, member)
+
+
+async def _write_chunks(
+    archive: zipfile.ZipFile, store: VectorStore, session: Session, session_db: AsyncSession,
+) -> Tuple[int, int]:
+    """Stream a session's chunks and vectors into the archive; returns (count, dim)."""
+    count, dim = 0, 0
+    # One archive member can be open for writing at a time, so vectors are
+    # spooled to a temporary file while chunks.jsonl is written
+    with tempfile.TemporaryFile() as spool:
+        with archive.open("chunks.jsonl", "w", force_zip64=True) as chunks:
+            async for batch in store.iter_chunks(session, BATCH_SIZE, session_db):
+                vectors = np.ascontiguousarray(batch.vectors, dtype="<f4")
+                rows = b"".join(
+                    json.dumps({"text": text, "metadata": metadata}, default=str).encode() + b"\n"
+                    for text, metadata in zip(batch.texts, batch.metadatas)
+                )
+                await asyncio.to_thread(chunks.write, rows)
+                await asyncio.to_thread(spool.write, vectors.tobytes())
+                count, dim = count + len(vectors), vectors.shape[1]
+        if count:
+            vectors_info = zipfile.ZipInfo("vectors.f32")
+            vectors_info.compress_type = zipfile.ZIP_STORED  # float noise does not deflate
+            await asyncio.to_thread(_copy_member, archive, vectors_info, spool)
+    return count, dim
+
+
+def _iter_embeddings(archive: zipfile.ZipFile, count: int, dim: int) -> Iterator[ChunkBatch]:
+    """Yield batches of chunks and their vectors from a snapshot."""
+    row_bytes = dim * 4
+    chunks = _read_jsonl(archive, "chunks.jsonl")
+    with archive.open("vectors.f32") as vectors:
+        remaining = count
+        while remaining:
+            n = min(BATCH_SIZE, remaining)
+            raw = vectors.read(n * row_bytes)
+            if len(raw) != n * row_bytes:
+                raise SnapshotError("vectors.f32 is truncated")
+            texts, metadatas = [], []
+            for _ in range(n):
+                row = next(chunks, None)
+                if row is None:
+                    raise SnapshotError("chunks.jsonl has fewer rows than vectors")
+                texts.append(row["text"])
+                metadatas.append(row.get("metadata") or {})
+            yield ChunkBatch(texts, np.frombuffer(raw, dtype="<f4").reshape(n, dim), metadatas)
+            remaining -= n
+
+
+def _restore_blob(archive: zipfile.ZipFile, member_name: str) -> Path:
+    with archive.open(member_name) as member:
+        stream = gzip.GzipFile(fileobj=member) if member_name.endswith(".gz") else member
+        return store_blob(stream)
+
+
+def _check_members(archive: zipfile.ZipFile, count: int, dim: int) -> None:
+    """Fail before any row is created if a member the snapshot refers to is missing."""
+    required = ["documents.jsonl", "messages.jsonl"]
+    if count:
+        required += ["chunks.jsonl", "vectors.f32"]
+    if "documents.jsonl" in archive.NameToInfo:
+        required += [row["blob"] for row in _read_jsonl(archive, "documents.jsonl") if row.get("blob")]
+    missing = [name for name in required if name not in archive.NameToInfo]
+    if missing:
+        raise SnapshotError(f"Snapshot is missing {', '.join(missing[:5])}")
+    if count and archive.NameToInfo["vectors.f32"].file_size != count * dim * 4:
+        raise SnapshotError("vectors.f32 does not match the manifest")
+
+
+async def import_session(
+    source: BinaryIO,
+    session_db: AsyncSession,
+    name: Optional[str] = None,
+) -> Session:
+    """Create a new session from a snapshot archive (seekable file object)."""
+    try:
+        archive = zipfile.ZipFile(source)
+    except zipfile.BadZipFile:
+        raise SnapshotError("Not a snapshot archive")
+
+    with archive, stage_timer("snapshot_import"):
+        try:
+            manifest = json.loads(archive.read("manifest.json"))
+        except KeyError:
+            raise SnapshotError("Snapshot has no manifest.json")
+        if manifest.get("format") != "briefly-session" or manifest.get("version", 0) > FORMAT_VERSION:
+            raise SnapshotError("Unsupported snapshot format or version")
+        count, dim = int(manifest.get("chunks", 0)), int(manifest.get("dim", 0))
+        if count and manifest.get("embeddings_model") != EMBEDDINGS_MODEL:
+            raise SnapshotError(
+                f"Snapshot was embedded with {manifest.get('embeddings_model')}, this server uses {EMBEDDINGS_MODEL}"
+            )
+
+        meta = manifest["session"]
+        if meta.get("index_quantization") not in (None, *QUANTIZATIONS):
+            raise SnapshotError(f"Unknown index quantization {meta['index_quantization']!r}")
+        await asyncio.to_thread(_check_members, archive, count, dim)
+        session = Session(
+            name=name or meta["name"],
+            current_summary=meta.get("current_summary"),
+            created_at=_parse_time(meta.get("created_at")) or datetime.utcnow(),
+            chunk_size=meta.get("chunk_size"),
+            chunk_overlap=meta.get("chunk_overlap"),
+            index_quantization=meta.get("index_quantization"),
+            vector_backend=get_vector_store().name,
+        )
+        session_db.add(session)
+        await session_db.flush()  # assigns session.id
+
+        for row in _read_jsonl(archive, "documents.jsonl"):
+            if not row.get("blob"):
+                logger.warning("snapshot document without file skipped", extra={"upload": row.get("filename")})
+                continue
+            file_path = await asyncio.to_thread(_restore_blob, archive, row["blob"])
+            session_db.add(Document(
+                session_id=session.id,
+                filename=row["filename"],
+                file_path=str(file_path),
+                upload_timestamp=_parse_time(row.get("upload_timestamp")) or datetime.utcnow(),
+            ))
+
+        for row in _read_jsonl(archive, "messages.jsonl"):
+            session_db.add(ChatMessage(
+                session_id=session.id,
+                role=row["role"],
+                content=row["content"],
+                timestamp=_parse_time(row.get("timestamp")) or datetime.utcnow(),
+            ))
+
+        store = store_for(session)
+        try:
+            if count:
+                await store.upsert(session, _iter_embeddings(archive, count, dim), session_db)
+            await session_db.commit()
+        except Exception:
+            if not store.transactional:
+                # Remove partly written vectors while the session id is still known
+                try:
+                    await store.delete(session, session_db)
+                except Exception:
+                    logger.exception("snapshot import cleanup failed", extra={"session_id": session.id})
+            await session_db.rollback()
+            raise
+
+    await session_db.refresh(session)
+    logger.info("session imported", extra={"session_id": session.id, "chunks": count})
+    return session
+
+
+async def _main(argv: Optional[List[str]] = None) -> None:
+    import argparse
+    from database import async_session, init_db, close_db
+    from vectorstores import close_vector_stores
+
+    parser = argparse.ArgumentParser(description="Export or import a session snapshot")
+    sub = parser.add_subparsers(dest="command", required=True)
+    export_parser = sub.add_parser("export")
+    export_parser.add_argument("session_id", type=int)
+    export_parser.add_argument("archive", type=Path)
+    import_parser = sub.add_parser("import")
+    import_parser.add_argument("archive", type=Path)
+    import_parser.add_argument("--name")
+    args = parser.parse_args(argv)
+
+    await init_db()
+    async with async_session() as db:
+        if args.command == "export":
+            with open(args.archive, "wb") as target:
+                manifest = await export_session(args.session_id, target, db)
+            print(json.dumps(manifest, indent=2))
+        else:
+            with open(args.archive, "rb") as source:
+                session = await import_session(source, db, name=args.name)
+            print(f"[OK] Imported as session {session.id} ({session.name})")
+    await close_vector_stores()
+    await close_db()
+
+
+if __name__ == "__main__":
+    asyncio.run(_main())
@@ -0,0 +1,370 @@
+"""
+On-disk storage for uploaded PDFs and session indexes.
+
+Uploads are stored content-addressed under `storage/blobs/<aa>/<sha256>.pdf`,
+so identical PDFs are kept once however many sessions use them. Cold blobs
+can be gzip-compressed in place (`<sha256>.pdf.gz`); readers resolve either
+form.
+
+`scan_storage` reconciles the database with the files in one pass over
+each directory and reports orphaned indexes, blobs and files, documents
+whose file is gone, and per-session usage. `collect_garbage` acts on that
+report.
+
+Usage:
+    python storage.py report               # JSON report, changes nothing
+    python storage.py gc [--apply]         # dry run unless --apply
+    python storage.py compress --days 30   # gzip blobs older than 30 days
+"""
+
+import asyncio
+import gzip
+import hashlib
+import os
+import shutil
+import tempfile
+import time
+from dataclasses import dataclass, field, asdict
+from pathlib import Path
+from typing import BinaryIO, Dict, Iterator, List, Optional, Set, Tuple
+
+from sqlalchemy import delete
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlmodel import select
+
+from config import SESSION_QUOTA_BYTES, STORAGE_GC_GRACE_HOURS
+from models import Session, Document
+from observability import get_logger
+
+
+logger = get_logger("storage")
+
+# Use absolute paths based on this file's location to avoid working directory issues
+BASE_DIR = Path(__file__).parent
+# Overridable so throwaway instances (e.g. load tests) keep their files out of the tree
+STORAGE_DIR = Path(os.getenv("STORAGE_DIR", BASE_DIR / "storage"))
+BLOB_DIR = STORAGE_DIR / "blobs"
+OCR_CACHE_DIR = STORAGE_DIR / "ocr"  # OCR text by page-image hash, not tied to any row
+FAISS_INDEX_DIR = Path(os.getenv("FAISS_INDEX_DIR", BASE_DIR / "faiss_indexes"))
+
+COMPRESSED_SUFFIX = ".gz"
+_COPY_CHUNK = 1024 * 1024
+
+
+def ensure_dirs() -> None:
+    for directory in (STORAGE_DIR, BLOB_DIR, OCR_CACHE_DIR, FAISS_INDEX_DIR):
+        directory.mkdir(parents=True, exist_ok=True)
+
+
+ensure_dirs()
+
+
+# Blobs
+
+def blob_path(digest: str) -> Path:
+    """Location of the (uncompressed) blob for a SHA-256 hex digest."""
+    return BLOB_DIR / digest[:2] / f"{digest}.pdf"
+
+
+def resolve_blob(file_path: str) -> Optional[Path]:
+    """Return the existing file for a stored path, compressed or not."""
+    path = Path(file_path)
+    if not path.is_absolute():
+        # Older rows stored paths relative to whatever the working directory was
+        candidates = [Path.cwd() / path, BASE_DIR / path, BASE_DIR.parent / path]
+    else:
+        candidates = [path]
+    for candidate in candidates:
+        for variant in (candidate, candidate.with_name(candidate.name + COMPRESSED_SUFFIX)):
+            if variant.exists():
+                return variant
+    return None
+
+
+def store_blob(source: BinaryIO) -> Path:
+    """
+    Stream `source` into the blob store and return the blob path.
+
+    Blobs are shared by every upload of the same PDF, so they are never
+    deleted in the request path: a blob no document references (e.g. after
+    a failed upload) is left to `collect_garbage` once it is older than the
+    grace period. Reusing a blob refreshes its mtime, so an upload still in
+    progress is always inside that window.
+    """
+    BLOB_DIR.mkdir(parents=True, exist_ok=True)
+    hasher = hashlib.sha256()
+    fd, tmp_name = tempfile.mkstemp(dir=BLOB_DIR, prefix=".upload-")
+    try:
+        with os.fdopen(fd, "wb") as tmp:
+            while True:
+                chunk = source.read(_COPY_CHUNK)
+                if not chunk:
+                    break
+                hasher.update(chunk)
+                tmp.write(chunk)
+        path = blob_path(hasher.hexdigest())
+        existing = resolve_blob(str(path))
+        if existing is not None:
+            try:
+                os.utime(existing)
+            except FileNotFoundError:
+                pass  # collected just now; store this copy instead
+            else:
+                os.unlink(tmp_name)
+                return path
+        path.parent.mkdir(parents=True, exist_ok=True)
+        os.replace(tmp_name, path)
+        return path
+    except BaseException:
+        if os.path.exists(tmp_name):
+            os.unlink(tmp_name)
+        raise
+
+
+def compress_cold_blobs(older_than_days: float, min_saving: float = 0.1) -> Dict[str, int]:
+    """
+    Gzip blobs not modified for `older_than_days`.
+
+    PDFs are often already deflated; a blob is only replaced when
+    compression saves at least `min_saving` of its size.
+    """
+    cutoff = time.time() - older_than_days * 86400
+    stats = {"compressed": 0, "skipped": 0, "bytes_saved": 0}
+    for entry in _walk_files(BLOB_DIR):
+        if not entry.name.endswith(".pdf") or entry.stat().st_mtime > cutoff:
+            continue
+        size = entry.stat().st_size
+        target = Path(entry.path + COMPRESSED_SUFFIX)
+        tmp = target.with_name(f".{target.name}.tmp")
+        with open(entry.path, "rb") as src, gzip.open(tmp, "wb", compresslevel=6) as dst:
+            shutil.copyfileobj(src, dst, _COPY_CHUNK)
+        new_size = tmp.stat().st_size
+        if new_size > size * (1 - min_saving):
+            tmp.unlink()
+            # Touch so the blob is not retried on every run
+            os.utime(entry.path)
+            stats["skipped"] += 1
+            continue
+        os.replace(tmp, target)
+        os.unlink(entry.path)
+        stats["compressed"] += 1
+        stats["bytes_saved"] += size - new_size
+    logger.info("cold blob compression finished", extra=stats)
+    return stats
+
+
+# Reconciliation
+
+@dataclass
+class SessionUsage:
+    documents: int = 0
+    document_bytes: int = 0
+    index_bytes: int = 0
+
+    @property
+    def total_bytes(self) -> int:
+        return self.document_bytes + self.index_bytes
+
+
+@dataclass
+class StorageReport:
+    files_scanned: int = 0
+    orphan_indexes: List[str] = field(default_factory=list)  # index dirs/locks of deleted sessions
+    orphan_files: List[str] = field(default_factory=list)  # blobs/uploads no document references
+    stale_temp_files: List[str] = field(default_factory=list)  # leftovers of interrupted writes
+    missing_file_documents: List[int] = field(default_factory=list)  # Document ids whose file is gone
+    reclaimable_bytes: int = 0
+    sessions: Dict[int, SessionUsage] = field(default_factory=dict)
+
+    def to_dict(self) -> dict:
+        data = asdict(self)
+        data["sessions"] = {
+            session_id: {**asdict(usage), "total_bytes": usage.total_bytes,
+                         "over_quota": bool(SESSION_QUOTA_BYTES) and usage.total_bytes > SESSION_QUOTA_BYTES}
+            for session_id, usage in self.sessions.items()
+        }
+        return data
+
+
+def _walk_files(root: Path) -> Iterator[os.DirEntry]:
+    """Yield every file under `root` using scandir (one stat-free pass)."""
+    stack = [str(root)]
+    while stack:
+        try:
+            with os.scandir(stack.pop()) as entries:
+                for entry in entries:
+                    if entry.is_dir(follow_symlinks=False):
+                        stack.append(entry.path)
+                    elif entry.is_file(follow_symlinks=False):
+                        yield entry
+        except FileNotFoundError:
+            continue
+
+
+def _session_id_from_index_name(name: str) -> Optional[int]:
+    # session_12, session_12.lock, .session_12.tmp-345
+    stem = name.lstrip(".").split(".", 1)[0]
+    if not stem.startswith("session_"):
+        return None
+    try:
+        return int(stem[len("session_"):])
+    except ValueError:
+        return None
+
+
+async def scan_storage(session_db: AsyncSession, grace_hours: float = STORAGE_GC_GRACE_HOURS) -> StorageReport:
+    """
+    Reconcile database rows with storage and index directories. Nothing
+    younger than `grace_hours` is reported as orphaned, so uploads and
+    sessions created while the scan runs are left alone.
+    """
+    report = StorageReport()
+    cutoff = time.time() - grace_hours * 3600
+
+    # One pass over the storage tree: absolute path -> (size, mtime)
+    files: Dict[str, Tuple[int, float]] = {}
+    ocr_prefix = os.path.abspath(OCR_CACHE_DIR) + os.sep
+    for entry in _walk_files(STORAGE_DIR):
+        path = os.path.abspath(entry.path)
+        if path.startswith(ocr_prefix):
+            continue  # cache entries are keyed by content, not by any row
+        st = entry.stat(follow_symlinks=False)
+        files[path] = (st.st_size, st.st_mtime)
+    report.files_scanned = len(files)
+
+    # Read rows after the walk, which can take minutes on large trees, so they cover every file seen
+    session_ids: Set[int] = set((await session_db.execute(select(Session.id))).scalars().all())
+    rows = (await session_db.execute(select(Document.id, Document.session_id, Document.file_path))).all()
+    report.sessions = {session_id: SessionUsage() for session_id in session_ids}
+
+    referenced: Set[str] = set()
+    for doc_id, session_id, file_path in rows:
+        found = None
+        if os.path.isabs(file_path):
+            absolute = os.path.abspath(file_path)
+            found = next((v for v in (absolute, absolute + COMPRESSED_SUFFIX) if v in files), None)
+        if found is None:
+            # Relative or out-of-tree paths: fall back to a stat
+            resolved = resolve_blob(file_path)
+            found = os.path.abspath(resolved) if resolved else None
+        if found is None:
+            report.missing_file_documents.append(doc_id)
+            continue
+        referenced.add(found)
+        usage = report.sessions.setdefault(session_id, SessionUsage())
+        usage.documents += 1
+        usage.document_bytes += files[found][0] if found in files else os.path.getsize(found)
+
+    for path, (size, mtime) in files.items():
+        if path in referenced or mtime > cutoff:
+            continue
+        name = os.path.basename(path)
+        if name.startswith(".upload-") or name.endswith(".tmp"):
+            report.stale_temp_files.append(path)
+        else:
+            report.orphan_files.append(path)
+        report.reclaimable_bytes += size
+
+    # Index directory: session_<id>/, session_<id>.lock, .session_<id>.tmp-<pid>/
+    try:
+        index_entries = list(os.scandir(FAISS_INDEX_DIR))
+    except FileNotFoundError:
+        index_entries = []
+    for entry in index_entries:
+        session_id = _session_id_from_index_name(entry.name)
+        if session_id is None:
+            continue
+        size, mtime = entry.stat().st_size, entry.stat().st_mtime
+        if entry.is_dir():
+            stats = [child.stat() for child in _walk_files(Path(entry.path))]
+            size = sum(st.st_size for st in stats)
+            mtime = max([mtime] + [st.st_mtime for st in stats])
+        if entry.name.startswith(".") or session_id not in session_ids:
+            # Index writes and locks of sessions created during the scan are young; leave them be
+            if mtime > cutoff:
+                continue
+            if entry.name.startswith("."):
+                report.stale_temp_files.append(entry.path)
+            else:
+                report.orphan_indexes.append(entry.path)
+            report.reclaimable_bytes += size
+        else:
+            report.sessions[session_id].index_bytes += size
+
+    return report
+
+
+async def collect_garbage(session_db: AsyncSession, report: StorageReport) -> Dict[str, int]:
+    """Delete everything `report` flagged; documents with missing files are removed too."""
+    removed = {"indexes": 0, "files": 0, "temp": 0, "documents": 0}
+    for path in report.orphan_indexes:
+        if os.path.isdir(path):
+            shutil.rmtree(path, ignore_errors=True)
+        else:
+            Path(path).unlink(missing_ok=True)
+        removed["indexes"] += 1
+    for path in report.orphan_files:
+        Path(path).unlink(missing_ok=True)
+        removed["files"] += 1
+    for path in report.stale_temp_files:
+        if os.path.isdir(path):
+            shutil.rmtree(path, ignore_errors=True)
+        else:
+            Path(path).unlink(missing_ok=True)
+        removed["temp"] += 1
+    if report.missing_file_documents:
+        await session_db.execute(delete(Document).where(Document.id.in_(report.missing_file_documents)))
+        await session_db.commit()
+        removed["documents"] = len(report.missing_file_documents)
+    logger.info("storage garbage collected", extra=removed)
+    return removed
+
+
+async def session_usage(session_id: int, session_db: AsyncSession) -> SessionUsage:
+    """Storage used by one session, without scanning the whole tree."""
+    usage = SessionUsage()
+    result = await session_db.execute(select(Document.file_path).where(Document.session_id == session_id))
+    for file_path in result.scalars().all():
+        resolved = resolve_blob(file_path)
+        if resolved is not None:
+            usage.documents += 1
+            usage.document_bytes += resolved.stat().st_size
+    index_dir = FAISS_INDEX_DIR / f"session_{session_id}"
+    if index_dir.is_dir():
+        usage.index_bytes = sum(entry.stat().st_size for entry in _walk_files(index_dir))
+    return usage
+
+
+async def _main(argv: Optional[List[str]] = None) -> None:
+    import argparse
+    import json
+    from database import async_session, init_db, close_db
+
+    parser = argparse.ArgumentParser(description="Storage reconciliation and garbage collection")
+    sub = parser.add_subparsers(dest="command", required=True)
+    sub.add_parser("report", help="print a JSON reconciliation report")
+    gc_parser = sub.add_parser("gc", help="remove orphaned indexes, files and rows")
+    gc_parser.add_argument("--apply", action="store_true", help="actually delete (default: dry run)")
+    for command in (sub.choices["report"], gc_parser):
+        command.add_argument("--grace-hours", type=float, default=STORAGE_GC_GRACE_HOURS,
+                             help="ignore files younger than this (uploads in flight)")
+    compress_parser = sub.add_parser("compress", help="gzip cold PDF blobs")
+    compress_parser.add_argument("--days", type=float, default=30)
+    args = parser.parse_args(argv)
+
+    if args.command == "compress":
+        print(json.dumps(compress_cold_blobs(args.days), indent=2))
+        return
+
+    await init_db()
+    async with async_session() as db:
+        report = await scan_storage(db, grace_hours=args.grace_hours)
+        output = {"report": report.to_dict()}
+        if args.command == "gc" and args.apply:
+            output["removed"] = await collect_garbage(db, report)
+    await close_db()
+    print(json.dumps(output, indent=2))
+
+
+if __name__ == "__main__":
+    asyncio.run(_main())
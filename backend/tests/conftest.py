@@ -0,0 +1,7 @@
+import os
+import sys
+from pathlib import Path
+
+# Backend modules are imported flat (as the app does), and config wants a key at import
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+os.environ.setdefault("GROQ_API_KEY", "test")
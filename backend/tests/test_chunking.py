@@ -0,0 +1,89 @@
+import pytest
+
+import chunking
+from chunking import HEADING_MAX_CHARS, chunk_pages, split_blocks
+
+
+PROSE = "The committee reviewed the regional figures and agreed to continue the programme."
+
+
+def test_agenda_page_is_indexed():
+    page = "Quarterly Board Meeting\nAgenda Items for Review\nBudget Approval\nHiring Plan"
+    chunks = chunk_pages([page])
+    assert [chunk.text for chunk in chunks] == [page]
+    assert chunks[0].page == 1
+
+
+def test_action_items_are_indexed():
+    page = "ACTION ITEMS\nReview Vendor Contracts\nHire Two Engineers\nLaunch Beta in March"
+    text = "\n".join(chunk.text for chunk in chunk_pages([page]))
+    for item in ("Review Vendor Contracts", "Hire Two Engineers", "Launch Beta in March"):
+        assert item in text
+
+
+def test_heading_only_pages_keep_every_line():
+    pages = ["Overview", "Summary Of Decisions\nNext Steps"]
+    chunks = chunk_pages(pages)
+    assert [(chunk.page, chunk.text) for chunk in chunks] == [(1, "Overview"), (2, "Summary Of Decisions\nNext Steps")]
+
+
+def test_heading_blocks_are_short():
+    toc = "\n".join(f"{i}. Section Number {i} Title" for i in range(1, 16))
+    for block in split_blocks(toc):
+        if block.kind == "heading":
+            assert len(block.lines) <= 2
+            assert sum(len(line) + 1 for line in block.lines) <= HEADING_MAX_CHARS + 1
+
+
+def test_table_of_contents_is_not_carried_to_later_pages():
+    toc = "\n".join(f"{i}. Section Number {i} Title" for i in range(1, 16))
+    body = "\n".join([PROSE] * 30)
+    chunks = chunk_pages([toc, body, body], chunk_size=1000, chunk_overlap=100)
+    assert "15. Section Number 15 Title" in "\n".join(chunk.text for chunk in chunks if chunk.page == 1)
+    for chunk in chunks:
+        if chunk.page > 1:
+            assert "Section Number" not in chunk.text
+
+
+def test_section_heading_repeats_on_continued_chunks():
+    page = "Budget Review\n" + "\n".join([PROSE] * 30)
+    chunks = chunk_pages([page, "\n".join([PROSE] * 10)], chunk_size=500, chunk_overlap=0)
+    assert len(chunks) > 2
+    assert all(chunk.text.startswith("Budget Review\n") for chunk in chunks)
+
+
+@pytest.mark.parametrize("chunk_size,chunk_overlap", [(200, 0), (200, 100), (200, 2000), (300, 150)])
+def test_minimum_chunk_sizes(chunk_size, chunk_overlap):
+    # A two-line heading over a line without breaks falls back to character splitting
+    page = "Intro Title\nSub Heading\n" + "word " * 400
+    table = "Region  Q1  Q2  Total\n" + "\n".join(f"Area{i}  120  95  215" for i in range(40))
+    chunks = chunk_pages([page, table], chunk_size=chunk_size, chunk_overlap=chunk_overlap)
+    assert chunks
+    assert all(len(chunk.text) <= chunk_size for chunk in chunks)
+    assert sum(chunk.text.count("word") for chunk in chunks) >= 400
+
+
+def test_table_header_repeats_when_split():
+    table = "Region Q1 Q2 Total\n" + "\n".join(f"Area{i}  120  95  215" for i in range(40))
+    chunks = chunk_pages([table], chunk_size=200, chunk_overlap=0)
+    assert len(chunks) > 1
+    assert all(chunk.text.splitlines()[0] == "Region Q1 Q2 Total" for chunk in chunks)
+
+
+def test_blank_document_has_no_chunks():
+    assert chunk_pages(["", "   \n"]) == []
+
+
+
+def _overlap(first: str, second: str) -> int:
+    return max((n for n in range(1, min(len(first), len(second)) + 1) if first.endswith(second[:n])), default=0)
+
+
+def test_default_overlap_depends_on_the_chunker(monkeypatch):
+    monkeypatch.setattr(chunking, "CHUNK_OVERLAP", 200)
+    monkeypatch.setattr(chunking, "PROSE_OVERLAP", 100)
+    page = "\n".join(f"{i:02d} {PROSE}" for i in range(20))
+    for strategy, limit in (("recursive", 200), ("structure", 100)):
+        chunks = chunk_pages([page], chunk_size=1000, strategy=strategy)
+        overlap = _overlap(chunks[0].text, chunks[1].text)
+        assert limit // 2 < overlap <= limit
@@ -0,0 +1,145 @@
+import asyncio
+
+import pytest
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+from sqlalchemy.orm import sessionmaker
+from sqlmodel import SQLModel
+
+import memory
+from memory import ConversationMemory, get_memory, save_summary
+from models import ChatMessage, Session
+from service import needs_rewrite
+
+
+@pytest.fixture
+def history():
+    history = ConversationMemory()
+    history.add("user", "What was decided about the Q3 budget?")
+    history.add("assistant", "The Q3 budget was approved with a 5% cut to travel.")
+    return history
+
+
+@pytest.mark.parametrize("query", [
+    "and the second one?",
+    "What about marketing?",
+    "Why?",
+    "Who proposed it?",
+    "Did they sign off on those numbers?",
+    "Can you explain that?",
+    "Tell me more",
+])
+def test_follow_ups_are_rewritten(history, query):
+    assert needs_rewrite(query, history)
+
+
+@pytest.mark.parametrize("query", [
+    "Summarize section 3",
+    "List all action items",
+    "Who owns the hiring plan?",
+    "What is the deadline for this quarter's report?",
+    "Which risks did the board flag?",
+])
+def test_standalone_questions_are_not_rewritten(history, query):
+    assert not needs_rewrite(query, history)
+
+
+def test_nothing_to_rewrite_against():
+    assert not needs_rewrite("and the second one?", ConversationMemory())
+
+
+def test_summary_survives_cache_eviction(tmp_path):
+    async def scenario():
+        engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path / 'memory.db'}")
+        async with engine.begin() as conn:
+            await conn.run_sync(SQLModel.metadata.create_all)
+        factory = sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
+        async with factory() as db:
+            db.add(Session(id=1, name="s"))
+            for i in range(1, 13):
+                db.add(ChatMessage(id=i, session_id=1, role="user" if i % 2 else "assistant", content=f"message {i}"))
+            await db.commit()
+
+            cached = ConversationMemory()
+            cached.summary, cached.summary_through = "messages 1-4", 4
+            await save_summary(1, cached, db)
+            # An older summary from another worker does not overwrite a newer one
+            stale = ConversationMemory()
+            stale.summary, stale.summary_through = "messages 1-2", 2
+            await save_summary(1, stale, db)
+
+            memory._memories.clear()
+            rebuilt = await get_memory(1, db)
+        await engine.dispose()
+        return rebuilt
+
+    rebuilt = asyncio.run(scenario())
+    assert rebuilt.summary == "messages 1-4"
+    assert [m.message_id for m in rebuilt.overflow + list(rebuilt.recent)] == list(range(5, 13))
+    assert rebuilt.last_message_id == 12
+
+
+def test_messages_are_added_once():
+    cached = ConversationMemory(window_turns=1)
+    for message_id in (1, 2, 2, 3, 1, 4):
+        cached.add("user", f"message {message_id}", message_id=message_id)
+    assert [m.message_id for m in cached.overflow + list(cached.recent)] == [1, 2, 3, 4]
+    assert cached.window_start() == 3
+
+
+def test_refresh_picks_up_late_turns_without_duplicates(tmp_path, monkeypatch):
+    monkeypatch.setattr(memory, "CACHE_COHERENCE", True)
+
+    async def scenario():
+        engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path / 'memory.db'}")
+        async with engine.begin() as conn:
+            await conn.run_sync(SQLModel.metadata.create_all)
+        factory = sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
+        async with factory() as db:
+            db.add(Session(id=1, name="s"))
+            db.add_all([ChatMessage(id=i, session_id=1, role="user", content=f"message {i}") for i in (1, 2, 5, 6)])
+            await db.commit()
+            memory._memories.clear()
+            cached = await get_memory(1, db)
+            # Another worker commits turn 3-4 after this worker's 5-6
+            db.add_all([ChatMessage(id=i, session_id=1, role="user", content=f"message {i}") for i in (3, 4)])
+            await db.commit()
+            refreshed = await get_memory(1, db)
+        await engine.dispose()
+        return cached, refreshed
+
+    cached, refreshed = asyncio.run(scenario())
+    assert refreshed is cached
+    assert sorted(m.message_id for m in refreshed.overflow + list(refreshed.recent)) == [1, 2, 3, 4, 5, 6]
+
+
+def test_refresh_reads_only_new_turns(tmp_path, monkeypatch):
+    monkeypatch.setattr(memory, "CACHE_COHERENCE", True)
+    monkeypatch.setattr(memory, "CACHE_COHERENCE_LOOKBACK", 2)
+
+    async def scenario():
+        engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path / 'memory.db'}")
+        async with engine.begin() as conn:
+            await conn.run_sync(SQLModel.metadata.create_all)
+        factory = sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
+        async with factory() as db:
+            db.add(Session(id=1, name="s"))
+            db.add_all([ChatMessage(id=i, session_id=1, role="user", content=f"message {i}") for i in range(1, 11)])
+            await db.commit()
+            memory._memories.clear()
+            cached = await get_memory(1, db)
+            db.add(ChatMessage(id=11, session_id=1, role="user", content="message 11"))
+            await db.commit()
+            statements = []
+            record = lambda conn, cursor, statement, params, context, many: statements.append((statement, params))
+            event.listen(engine.sync_engine, "before_cursor_execute", record)
+            refreshed = await get_memory(1, db)
+            event.remove(engine.sync_engine, "before_cursor_execute", record)
+        await engine.dispose()
+        return refreshed, statements
+
+    refreshed, statements = asyncio.run(scenario())
+    assert refreshed.recent[-1].message_id == 11
+    # The window starts at message 3, but only ids after 10 - 2 are read again
+    [(statement, params)] = [(st, p) for st, p in statements if "chatmessage" in st]
+    assert params == (1, 8)
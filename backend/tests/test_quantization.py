@@ -0,0 +1,35 @@
+import numpy as np
+import pytest
+
+from benchmarks.fakes import LexicalEmbeddings
+from quantization import add_to_index, read_vectors, remove_from_index, search, vectors_path
+
+
+def _batch(start, count, dim=384):
+    rng = np.random.default_rng(start)
+    texts = [f"chunk {i}" for i in range(start, start + count)]
+    ids = [f"id-{i}" for i in range(start, start + count)]
+    return texts, rng.standard_normal((count, dim)).astype("float32"), [{"row": i} for i in range(start, start + count)], ids
+
+
+@pytest.mark.parametrize("kind", ["none", "fp16", "int8"])
+def test_discarded_chunks_leave_index_and_vectors(tmp_path, kind):
+    first, second = _batch(0, 20), _batch(20, 10)
+    store = add_to_index(None, tmp_path, kind, [first], LexicalEmbeddings())
+    store = add_to_index(store, tmp_path, kind, [second], LexicalEmbeddings())
+
+    assert remove_from_index(store, tmp_path, second[3] + ["id-unknown"]) == 10
+    assert store.index.ntotal == 20
+    assert sorted(store.index_to_docstore_id.values()) == sorted(first[3])
+    if kind == "int8":
+        assert vectors_path(tmp_path).stat().st_size == first[1].nbytes
+        np.testing.assert_array_equal(read_vectors(tmp_path, store), first[1])
+    # The nearest chunk to a kept vector is still that chunk
+    docs = search(store, tmp_path, first[1][7].tolist(), k=1)
+    assert docs[0].metadata["row"] == 7
+
+
+def test_discard_of_unknown_ids_is_a_no_op(tmp_path):
+    store = add_to_index(None, tmp_path, "none", [_batch(0, 5)], LexicalEmbeddings())
+    assert remove_from_index(store, tmp_path, ["id-99"]) == 0
+    assert store.index.ntotal == 5
@@ -0,0 +1,58 @@
+import asyncio
+import io
+import json
+import zipfile
+
+import pytest
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+from sqlalchemy.orm import sessionmaker
+from sqlmodel import SQLModel
+
+from config import EMBEDDINGS_MODEL
+from snapshot import FORMAT_VERSION, SnapshotError, import_session
+
+
+def _archive(members, chunks=0, dim=0):
+    manifest = {
+        "format": "briefly-session",
+        "version": FORMAT_VERSION,
+        "chunks": chunks,
+        "dim": dim,
+        "embeddings_model": EMBEDDINGS_MODEL,
+        "session": {"name": "s"},
+    }
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, "w") as archive:
+        archive.writestr("manifest.json", json.dumps(manifest))
+        for name, data in members.items():
+            archive.writestr(name, data)
+    buffer.seek(0)
+    return buffer
+
+
+def _import(tmp_path, source):
+    async def scenario():
+        engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path / 'snapshot.db'}")
+        async with engine.begin() as conn:
+            await conn.run_sync(SQLModel.metadata.create_all)
+        factory = sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
+        try:
+            async with factory() as db:
+                await import_session(source, db)
+        finally:
+            await engine.dispose()
+
+    asyncio.run(scenario())
+
+
+@pytest.mark.parametrize("members, chunks, dim", [
+    # A document pointing at a blob that is not in the archive
+    ({"documents.jsonl": json.dumps({"filename": "a.pdf", "blob": "blobs/a.pdf"}) + "\n", "messages.jsonl": ""}, 0, 0),
+    # Chunks announced by the manifest without their vectors
+    ({"documents.jsonl": "", "messages.jsonl": "", "chunks.jsonl": "{}\n"}, 1, 4),
+    # Fewer vector bytes than the manifest announces
+    ({"documents.jsonl": "", "messages.jsonl": "", "chunks.jsonl": "{}\n", "vectors.f32": b"\0" * 8}, 1, 4),
+])
+def test_incomplete_archives_are_rejected(tmp_path, members, chunks, dim):
+    with pytest.raises(SnapshotError):
+        _import(tmp_path, _archive(members, chunks, dim))
@@ -0,0 +1,98 @@
+import asyncio
+import io
+import os
+import time
+
+import pytest
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+from sqlalchemy.orm import sessionmaker
+from sqlmodel import SQLModel
+
+import storage
+from models import Document, Session
+
+
+OLD = time.time() - 48 * 3600  # well outside the default grace period
+
+
+@pytest.fixture
+def tree(tmp_path, monkeypatch):
+    monkeypatch.setattr(storage, "STORAGE_DIR", tmp_path / "storage")
+    monkeypatch.setattr(storage, "BLOB_DIR", tmp_path / "storage" / "blobs")
+    monkeypatch.setattr(storage, "OCR_CACHE_DIR", tmp_path / "storage" / "ocr")
+    monkeypatch.setattr(storage, "FAISS_INDEX_DIR", tmp_path / "faiss_indexes")
+    storage.ensure_dirs()
+    return tmp_path
+
+
+def _age(path, mtime=OLD):
+    for root, _, names in os.walk(path):
+        for name in names:
+            os.utime(os.path.join(root, name), (mtime, mtime))
+    os.utime(path, (mtime, mtime))
+
+
+def _index(name):
+    index_dir = storage.FAISS_INDEX_DIR / name
+    index_dir.mkdir()
+    (index_dir / "index.faiss").write_bytes(b"x" * 10)
+    (index_dir / "index.pkl").write_bytes(b"y" * 5)
+    return index_dir
+
+
+def _run(tree, check):
+    async def scenario():
+        engine = create_async_engine(f"sqlite+aiosqlite:///{tree / 'storage.db'}")
+        async with engine.begin() as conn:
+            await conn.run_sync(SQLModel.metadata.create_all)
+        factory = sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
+        try:
+            async with factory() as db:
+                await check(db)
+        finally:
+            await engine.dispose()
+
+    asyncio.run(scenario())
+
+
+def test_gc_removes_only_old_orphans(tree):
+    referenced = storage.store_blob(io.BytesIO(b"%PDF referenced"))
+    old_orphan = storage.store_blob(io.BytesIO(b"%PDF old orphan"))
+    young_orphan = storage.store_blob(io.BytesIO(b"%PDF young orphan"))
+    _age(referenced)
+    _age(old_orphan)
+    live_index = _index("session_1")
+    old_orphan_index = _index("session_98")
+    young_orphan_index = _index("session_99")  # e.g. a session created while the scan ran
+    _age(live_index)
+    _age(old_orphan_index)
+
+    async def check(db):
+        db.add(Session(id=1, name="s"))
+        db.add(Document(session_id=1, filename="a.pdf", file_path=str(referenced)))
+        await db.commit()
+
+        report = await storage.scan_storage(db)
+        assert report.orphan_files == [str(old_orphan)]
+        assert report.orphan_indexes == [str(old_orphan_index)]
+        assert report.missing_file_documents == []
+        assert report.sessions[1].documents == 1
+        assert report.sessions[1].index_bytes == 15
+
+        await storage.collect_garbage(db, report)
+        assert referenced.exists() and young_orphan.exists() and not old_orphan.exists()
+        assert live_index.exists() and young_orphan_index.exists() and not old_orphan_index.exists()
+
+    _run(tree, check)
+
+
+def test_without_grace_period_young_orphans_are_reported(tree):
+    orphan = storage.store_blob(io.BytesIO(b"%PDF orphan"))
+    orphan_index = _index("session_7")
+
+    async def check(db):
+        report = await storage.scan_storage(db, grace_hours=-1)
+        assert report.orphan_files == [str(orphan)]
+        assert report.orphan_indexes == [str(orphan_index)]
+
+    _run(tree, check)
@@ -0,0 +1,724 @@
+"""
+Pluggable storage for session chunk vectors.
+
+Ingestion, chat, snapshots and index rebuilds go through `VectorStore`,
+so a session's vectors can live on local disk or in a vector database
+without those code paths changing:
+
+- `faiss` keeps each session in its own index files under FAISS_INDEX_DIR
+  (locking and caching in indexes.py, quantization in quantization.py).
+- `qdrant` keeps every session in one collection of a Qdrant server,
+  reached over its REST API through a pooled HTTP client. Points carry
+  the session id, the chunk text and its metadata, and every query is
+  filtered by session.
+- `pgvector` keeps chunks in a `documentchunk` table of the application
+  database, next to the Document rows they came from. Chunks are written
+  with COPY in the same transaction as those rows, and a search returns
+  chunks joined to their documents in one query.
+
+Each session records its backend when it is created (`vector_backend`),
+so VECTOR_BACKEND only decides where new sessions go. A session is moved
+to another backend with:
+
+    python vectorstores.py move <session_id> <faiss|qdrant|pgvector>
+
+Moving copies the vectors (no re-embedding), switches the session over,
+then deletes the old copy. Run it while the session is idle.
+"""
+
+import asyncio
+import csv
+import io
+import json
+import shutil
+import uuid
+from abc import ABC, abstractmethod
+from contextlib import asynccontextmanager
+from pathlib import Path
+from typing import Any, AsyncIterator, Dict, Iterable, List, NamedTuple, Optional, Sequence
+
+import httpx
+import numpy as np
+from langchain_community.vectorstores import FAISS
+from langchain_core.documents import Document
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlmodel import select
+
+from config import (
+    EMBEDDINGS_DIM,
+    VECTOR_BACKEND,
+    QDRANT_URL,
+    QDRANT_API_KEY,
+    QDRANT_COLLECTION,
+    QDRANT_POOL_SIZE,
+    QDRANT_BATCH_SIZE,
+    QDRANT_TIMEOUT,
+    PGVECTOR_HNSW_M,
+    PGVECTOR_HNSW_EF_CONSTRUCTION,
+)
+from database import async_session, engine
+from indexes import INDEX_FILES, drop_index, index_lock, load_index, update_index
+from models import Session, Document as DBDocument
+from observability import get_logger, stage_timer
+from quantization import (
+    add_to_index, apply_quantization, drop_vectors, keeps_exact_vectors, read_vectors, remove_from_index,
+    resolve_quantization, search,
+)
+from storage import FAISS_INDEX_DIR
+
+
+logger = get_logger("vectorstores")
+
+VECTOR_BACKENDS = ("faiss", "qdrant", "pgvector")
+ITER_BATCH_SIZE = 2048  # chunks per batch when reading a session back
+
+
+class VectorStoreError(RuntimeError):
+    """Raised when a vector backend rejects a request."""
+
+
+class ChunkBatch(NamedTuple):
+    """Embedded chunks, row-aligned."""
+    texts: List[str]
+    vectors: Sequence  # one vector per text: a list of lists or a 2-D array
+    metadatas: List[dict]
+    ids: Optional[List[str]] = None  # unique chunk ids (UUIDs), so a failed write can be discarded
+
+
+def _embeddings():
+    # service imports this module; resolve the shared model at call time
+    from service import get_embeddings
+    return get_embeddings()
+
+
+class VectorStore(ABC):
+    """
+    Chunk vectors of many sessions.
+
+    Backends that keep vectors in the application database read and write
+    through `session_db`, so chunks commit or roll back together with the
+    rows added in that session; the caller commits. Other backends ignore it.
+    """
+
+    name: str
+    transactional = False  # True when writes go through `session_db` and roll back with it
+
+    @abstractmethod
+    async def upsert(
+        self, session: Session, batches: Iterable[ChunkBatch], session_db: Optional[AsyncSession] = None,
+    ) -> None:
+        """
+        Add chunks to a session. All batches are written in one step, so
+        pass many batches in one call rather than calling once per batch.
+        May update `session` fields; the caller commits them.
+        """
+
+    @abstractmethod
+    async def search(
+        self,
+        session: Session,
+        query_vector: List[float],
+        k: int,
+        filter: Optional[Dict[str, Any]] = None,
+        session_db: Optional[AsyncSession] = None,
+    ) -> List[Document]:
+        """
+        The k chunks nearest to `query_vector`. `filter` maps metadata keys
+        to a value, or to a list of accepted values (e.g. {"source": [...]}).
+        """
+
+    @abstractmethod
+    async def count(self, session: Session, session_db: Optional[AsyncSession] = None) -> int:
+        """Number of chunks stored for a session."""
+
+    async def has_vectors(self, session: Session, session_db: Optional[AsyncSession] = None) -> bool:
+        return await self.count(session, session_db) > 0
+
+    @abstractmethod
+    def iter_chunks(
+        self, session: Session, batch_size: int = ITER_BATCH_SIZE, session_db: Optional[AsyncSession] = None,
+    ) -> AsyncIterator[ChunkBatch]:
+        """Every chunk of a session with its exact vector, in batches."""
+
+    @abstractmethod
+    async def delete(self, session: Session, session_db: Optional[AsyncSession] = None) -> None:
+        """Remove every chunk of a session."""
+
+    async def discard(self, session: Session, ids: List[str], session_db: Optional[AsyncSession] = None) -> None:
+        """
+        Remove the chunks with these `ChunkBatch.ids` after an upsert whose
+        transaction failed. A no-op where chunks have no ids; transactional
+        backends roll back with `session_db` instead.
+        """
+
+    async def requantize(self, session: Session) -> None:
+        """Re-encode a session after its `index_quantization` changed; a no-op where not supported."""
+
+    async def close(self) -> None:
+        """Release connections."""
+
+
+class FaissVectorStore(VectorStore):
+    """One FAISS index directory per session on local (or shared) disk."""
+
+    name = "faiss"
+
+    def __init__(self, root: Path = FAISS_INDEX_DIR):
+        self.root = Path(root)
+
+    def index_dir(self, session: Session) -> Path:
+        if session.faiss_index_path:
+            return Path(session.faiss_index_path)
+        return self.root / f"session_{session.id}"
+
+    async def upsert(
+        self, session: Session, batches: Iterable[ChunkBatch], session_db: Optional[AsyncSession] = None,
+    ) -> None:
+        index_dir = self.index_dir(session)
+        quantization = resolve_quantization(session.index_quantization)
+        embeddings = _embeddings()
+
+        def add_chunks(store: Optional[FAISS]) -> FAISS:
+            # Create the index with the first batch of chunks, or append to it
+            rows = ((batch.texts, batch.vectors, batch.metadatas, batch.ids) for batch in batches)
+            return add_to_index(store, index_dir, quantization, rows, embeddings)
+
+        # Load, extend and save the index under a cross-worker lock
+        await update_index(index_dir, embeddings, add_chunks, load_existing=bool(session.faiss_index_path))
+        if not keeps_exact_vectors(quantization):
+            drop_vectors(index_dir)
+        session.faiss_index_path = str(index_dir)
+
+    async def has_vectors(self, session: Session, session_db: Optional[AsyncSession] = None) -> bool:
+        if not session.faiss_index_path:
+            return False
+        if not Path(session.faiss_index_path).exists():
+            logger.warning("index path missing", extra={"session_id": session.id, "path": session.faiss_index_path})
+            return False
+        return True
+
+    async def search(
+        self,
+        session: Session,
+        query_vector: List[float],
+        k: int,
+        filter: Optional[Dict[str, Any]] = None,
+        session_db: Optional[AsyncSession] = None,
+    ) -> List[Document]:
+        index_dir = self.index_dir(session)
+        store = await load_index(index_dir, _embeddings())
+        return search(store, index_dir, query_vector, k, filter=filter)
+
+    async def count(self, session: Session, session_db: Optional[AsyncSession] = None) -> int:
+        if not await self.has_vectors(session):
+            return 0
+        return (await load_index(self.index_dir(session), _embeddings())).index.ntotal
+
+    async def iter_chunks(
+        self, session: Session, batch_size: int = ITER_BATCH_SIZE, session_db: Optional[AsyncSession] = None,
+    ) -> AsyncIterator[ChunkBatch]:
+        if not await self.has_vectors(session):
+            return
+        index_dir = self.index_dir(session)
+        store = await load_index(index_dir, _embeddings())
+        total = store.index.ntotal
+        for start in range(0, total, batch_size):
+            count = min(batch_size, total - start)
+            chunks = [store.docstore.search(store.index_to_docstore_id[i]) for i in range(start, start + count)]
+            # Exact vectors, also for quantized indexes
+            vectors = await asyncio.to_thread(read_vectors, index_dir, store, start, count)
+            yield ChunkBatch([chunk.page_content for chunk in chunks], vectors, [chunk.metadata for chunk in chunks])
+
+    async def delete(self, session: Session, session_db: Optional[AsyncSession] = None) -> None:
+        index_dir = self.index_dir(session)
+
+        def remove() -> None:
+            with index_lock(index_dir, exclusive=True):
+                shutil.rmtree(index_dir, ignore_errors=True)
+
+        await asyncio.to_thread(remove)
+        drop_index(index_dir)
+        session.faiss_index_path = None
+
+    async def discard(self, session: Session, ids: List[str], session_db: Optional[AsyncSession] = None) -> None:
+        index_dir = self.index_dir(session)
+        if not all((index_dir / name).exists() for name in INDEX_FILES):
+            return  # the failed upsert never saved an index
+
+        def remove(store: Optional[FAISS]) -> FAISS:
+            if store is None:
+                raise VectorStoreError(f"No index to discard chunks from at {index_dir}")
+            removed = remove_from_index(store, index_dir, ids)
+            logger.info("chunks discarded", extra={"session_id": session.id, "chunks": removed})
+            return store
+
+        await update_index(index_dir, _embeddings(), remove)
+
+    async def requantize(self, session: Session) -> None:
+        if not session.faiss_index_path:
+            return
+        index_dir = Path(session.faiss_index_path)
+        quantization = resolve_quantization(session.index_quantization)
+
+        def rebuild(store: Optional[FAISS]) -> FAISS:
+            return apply_quantization(store, index_dir, quantization, read_vectors(index_dir, store))
+
+        with stage_timer("requantize"):
+            await update_index(index_dir, _embeddings(), rebuild)
+        if not keeps_exact_vectors(quantization):
+            drop_vectors(index_dir)
+
+
+class QdrantVectorStore(VectorStore):
+    """
+    All sessions in one Qdrant collection (Euclidean distance, so scores
+    match the FAISS indexes), with a payload index on `session_id`.
+    """
+
+    name = "qdrant"
+
+    def __init__(
+        self,
+        url: str = QDRANT_URL,
+        collection: str = QDRANT_COLLECTION,
+        api_key: Optional[str] = QDRANT_API_KEY,
+        pool_size: int = QDRANT_POOL_SIZE,
+        batch_size: int = QDRANT_BATCH_SIZE,
+        timeout: float = QDRANT_TIMEOUT,
+        transport: Optional[httpx.AsyncBaseTransport] = None,
+    ):
+        self.url = url.rstrip("/")
+        self.collection = collection
+        self.api_key = api_key
+        self.pool_size = max(1, pool_size)
+        self.batch_size = max(1, batch_size)
+        self.timeout = timeout
+        self.transport = transport
+        self._client: Optional[httpx.AsyncClient] = None
+        self._collection_ready = False
+
+    @property
+    def client(self) -> httpx.AsyncClient:
+        """Shared HTTP client; its connection pool is reused by every request of this worker."""
+        if self._client is None:
+            self._client = httpx.AsyncClient(
+                base_url=self.url,
+                headers={"api-key": self.api_key} if self.api_key else None,
+                timeout=self.timeout,
+                limits=httpx.Limits(max_connections=self.pool_size, max_keepalive_connections=self.pool_size),
+                transport=self.transport,
+            )
+        return self._client
+
+    async def _request(self, method: str, path: str, body: Optional[dict] = None, missing_ok: bool = False) -> Any:
+        """Send a request and return its `result`; None for a missing collection when `missing_ok`."""
+        try:
+            response = await self.client.request(method, f"/collections/{self.collection}{path}", json=body)
+        except httpx.HTTPError as e:
+            raise VectorStoreError(f"Qdrant request failed: {e}") from e
+        if response.status_code == 404 and missing_ok:
+            return None
+        if response.is_error:
+            raise VectorStoreError(f"Qdrant {method} {path or '/'} failed ({response.status_code}): {response.text[:200]}")
+        return response.json().get("result")
+
+    async def _ensure_collection(self, dim: int) -> None:
+        if self._collection_ready:
+            return
+        if await self._request("GET", "", missing_ok=True) is None:
+            try:
+                await self._request("PUT", "", {"vectors": {"size": dim, "distance": "Euclid"}})
+            except VectorStoreError:
+                # Another worker may have created it first
+                if await self._request("GET", "", missing_ok=True) is None:
+                    raise
+            await self._request("PUT", "/index?wait=true", {"field_name": "session_id", "field_schema": "integer"})
+            logger.info("qdrant collection created", extra={"collection": self.collection, "dim": dim})
+        self._collection_ready = True
+
+    @staticmethod
+    def _filter(session: Session, filter: Optional[Dict[str, Any]] = None) -> dict:
+        conditions = [{"key": "session_id", "match": {"value": session.id}}]
+        for key, value in (filter or {}).items():
+            match = {"any": list(value)} if isinstance(value, (list, tuple, set)) else {"value": value}
+            conditions.append({"key": f"metadata.{key}", "match": match})
+        return {"must": conditions}
+
+    async def _upsert_points(self, session: Session, batch: ChunkBatch) -> None:
+        vectors = np.asarray(batch.vectors, dtype="float32")
+        await self._ensure_collection(vectors.shape[1])
+        ids = batch.ids or [str(uuid.uuid4()) for _ in batch.texts]
+        requests = []
+        for start in range(0, len(batch.texts), self.batch_size):
+            end = start + self.batch_size
+            points = [
+                {
+                    "id": point_id,
+                    "vector": vector,
+                    "payload": {"session_id": session.id, "text": text, "metadata": metadata},
+                }
+                for point_id, text, vector, metadata in zip(
+                    ids[start:end], batch.texts[start:end], vectors[start:end].tolist(), batch.metadatas[start:end],
+                )
+            ]
+            requests.append(self._request("PUT", "/points?wait=true", {"points": points}))
+        # Requests beyond the pool size wait for a free connection
+        await asyncio.gather(*requests)
+
+    async def upsert(
+        self, session: Session, batches: Iterable[ChunkBatch], session_db: Optional[AsyncSession] = None,
+    ) -> None:
+        batches = iter(batches)
+        with stage_timer("vector_upsert"):
+            while True:
+                # Batches may be read from disk (snapshot import); keep that off the event loop
+                batch = await asyncio.to_thread(next, batches, None)
+                if batch is None:
+                    break
+                await self._upsert_points(session, batch)
+
+    async def search(
+        self,
+        session: Session,
+        query_vector: List[float],
+        k: int,
+        filter: Optional[Dict[str, Any]] = None,
+        session_db: Optional[AsyncSession] = None,
+    ) -> List[Document]:
+        body = {
+            "vector": [float(x) for x in query_vector],
+            "limit": k,
+            "filter": self._filter(session, filter),
+            "with_payload": True,
+        }
+        hits = await self._request("POST", "/points/search", body, missing_ok=True) or []
+        return [Document(page_content=hit["payload"]["text"], metadata=hit["payload"].get("metadata") or {}) for hit in hits]
+
+    async def count(self, session: Session, session_db: Optional[AsyncSession] = None) -> int:
+        result = await self._request("POST", "/points/count", {"filter": self._filter(session), "exact": True}, missing_ok=True)
+        return result["count"] if result else 0
+
+    async def has_vectors(self, session: Session, session_db: Optional[AsyncSession] = None) -> bool:
+        # Runs on every chat; fetching one point is cheaper than an exact count
+        body = {"filter": self._filter(session), "limit": 1, "with_payload": False, "with_vector": False}
+        result = await self._request("POST", "/points/scroll", body, missing_ok=True)
+        return bool(result and result["points"])
+
+    async def iter_chunks(
+        self, session: Session, batch_size: int = ITER_BATCH_SIZE, session_db: Optional[AsyncSession] = None,
+    ) -> AsyncIterator[ChunkBatch]:
+        offset = None
+        while True:
+            body = {"filter": self._filter(session), "limit": batch_size, "with_payload": True, "with_vector": True}
+            if offset is not None:
+                body["offset"] = offset
+            result = await self._request("POST", "/points/scroll", body, missing_ok=True)
+            if not result or not result["points"]:
+                return
+            points = result["points"]
+            yield ChunkBatch(
+                [point["payload"]["text"] for point in points],
+                np.asarray([point["vector"] for point in points], dtype="float32"),
+                [point["payload"].get("metadata") or {} for point in points],
+            )
+            offset = result.get("next_page_offset")
+            if offset is None:
+                return
+
+    async def delete(self, session: Session, session_db: Optional[AsyncSession] = None) -> None:
+        await self._request("POST", "/points/delete?wait=true", {"filter": self._filter(session)}, missing_ok=True)
+
+    async def discard(self, session: Session, ids: List[str], session_db: Optional[AsyncSession] = None) -> None:
+        for start in range(0, len(ids), self.batch_size):
+            body = {"points": ids[start:start + self.batch_size]}
+            await self._request("POST", "/points/delete?wait=true", body, missing_ok=True)
+
+    async def close(self) -> None:
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+
+_PGVECTOR_SCHEMA = (
+    "CREATE EXTENSION IF NOT EXISTS vector",
+    f"""
+    CREATE TABLE IF NOT EXISTS documentchunk (
+        id BIGSERIAL PRIMARY KEY,
+        session_id INTEGER NOT NULL REFERENCES session (id) ON DELETE CASCADE,
+        document_id INTEGER REFERENCES document (id) ON DELETE SET NULL,
+        content TEXT NOT NULL,
+        metadata JSONB NOT NULL DEFAULT '{{}}',
+        embedding vector({EMBEDDINGS_DIM}) NOT NULL
+    )
+    """,
+    # Tables created before chunks outlived their Document row (e.g. a row removed by storage GC
+    # because its PDF is missing; search never needs the PDF) still cascade
+    """
+    DO $$
+    BEGIN
+        IF EXISTS (
+            SELECT 1 FROM pg_constraint
+            WHERE conname = 'documentchunk_document_id_fkey' AND confdeltype = 'c'
+        ) THEN
+            ALTER TABLE documentchunk DROP CONSTRAINT documentchunk_document_id_fkey;
+            ALTER TABLE documentchunk ADD CONSTRAINT documentchunk_document_id_fkey
+                FOREIGN KEY (document_id) REFERENCES document (id) ON DELETE SET NULL;
+        END IF;
+    END $$
+    """,
+    "CREATE INDEX IF NOT EXISTS ix_documentchunk_session_id ON documentchunk (session_id, id)",
+    "CREATE INDEX IF NOT EXISTS ix_documentchunk_document_id ON documentchunk (document_id)",
+    f"""
+    CREATE INDEX IF NOT EXISTS ix_documentchunk_embedding ON documentchunk
+    USING hnsw (embedding vector_l2_ops) WITH (m = {PGVECTOR_HNSW_M}, ef_construction = {PGVECTOR_HNSW_EF_CONSTRUCTION})
+    """,
+)
+_COPY_COLUMNS = ("session_id", "document_id", "content", "metadata", "embedding")
+
+
+def _vector_literal(vector: Sequence[float]) -> str:
+    # pgvector's text form; 9 significant digits round-trip float32 exactly
+    return "[" + ",".join("%.9g" % value for value in vector) + "]"
+
+
+def _json(value: Any) -> dict:
+    return json.loads(value) if isinstance(value, (str, bytes)) else (value or {})
+
+
+class PgVectorStore(VectorStore):
+    """
+    Chunks in the `documentchunk` table of the application database, with
+    an HNSW index (L2 distance, like the FAISS indexes) over the embeddings.
+
+    The table is created on first use and needs the `vector` extension
+    (pgvector), e.g. the pgvector/pgvector:pg15 image. HNSW search settings
+    are applied per connection in database.py.
+    """
+
+    name = "pgvector"
+    transactional = True
+
+    def __init__(self):
+        self._schema_ready = False
+
+    async def _ensure_schema(self) -> None:
+        if self._schema_ready:
+            return
+        if engine.dialect.name != "postgresql":
+            raise VectorStoreError("The pgvector backend needs a PostgreSQL DATABASE_URL")
+        async with engine.begin() as conn:
+            # Workers may start at the same time; run the DDL one at a time
+            await conn.execute(text("SELECT pg_advisory_xact_lock(hashtext('briefly.documentchunk'))"))
+            for statement in _PGVECTOR_SCHEMA:
+                await conn.execute(text(statement))
+        self._schema_ready = True
+
+    @asynccontextmanager
+    async def _db(self, session_db: Optional[AsyncSession]) -> AsyncIterator[AsyncSession]:
+        """The caller's session, or a session of our own that commits on success."""
+        await self._ensure_schema()
+        if session_db is not None:
+            yield session_db
+            return
+        async with async_session() as db:
+            yield db
+            await db.commit()
+
+    @staticmethod
+    def _copy_rows(session_id: int, batch: ChunkBatch, document_ids: Dict[str, int]) -> bytes:
+        buffer = io.StringIO()
+        # Quoted CSV; document_id is turned back into NULL with FORCE_NULL
+        writer = csv.writer(buffer, quoting=csv.QUOTE_NONNUMERIC, lineterminator="\n")
+        for content, vector, metadata in zip(batch.texts, np.asarray(batch.vectors, dtype="float32").tolist(), batch.metadatas):
+            writer.writerow([
+                session_id,
+                document_ids.get(metadata.get("source")),
+                content.replace("\x00", ""),  # PostgreSQL text cannot hold NUL
+                json.dumps(metadata),
+                _vector_literal(vector),
+            ])
+        return buffer.getvalue().encode()
+
+    async def upsert(
+        self, session: Session, batches: Iterable[ChunkBatch], session_db: Optional[AsyncSession] = None,
+    ) -> None:
+        async with self._db(session_db) as db:
+            # Pending Document rows of this upload need ids before chunks can point at them
+            await db.flush()
+            result = await db.execute(
+                select(DBDocument.id, DBDocument.filename).where(DBDocument.session_id == session.id).order_by(DBDocument.id)
+            )
+            document_ids = {filename: document_id for document_id, filename in result.all()}  # latest upload wins
+            # COPY on the session's own connection, inside its transaction
+            connection = await (await db.connection()).get_raw_connection()
+            driver = connection.driver_connection
+            batches = iter(batches)
+            with stage_timer("vector_upsert"):
+                while True:
+                    batch = await asyncio.to_thread(next, batches, None)
+                    if batch is None:
+                        break
+                    rows = await asyncio.to_thread(self._copy_rows, session.id, batch, document_ids)
+                    await driver.copy_to_table(
+                        "documentchunk",
+                        source=io.BytesIO(rows),
+                        columns=_COPY_COLUMNS,
+                        format="csv",
+                        force_null=["document_id"],
+                    )
+
+    @staticmethod
+    def _where(session: Session, filter: Optional[Dict[str, Any]]) -> tuple:
+        clauses, params = ["c.session_id = :session_id"], {"session_id": session.id}
+        for i, (key, value) in enumerate((filter or {}).items()):
+            values = value if isinstance(value, (list, tuple, set)) else [value]
+            clauses.append(f"c.metadata ->> :key_{i} = ANY(:values_{i})")
+            params[f"key_{i}"], params[f"values_{i}"] = key, [str(item) for item in values]
+        return " AND ".join(clauses), params
+
+    async def search(
+        self,
+        session: Session,
+        query_vector: List[float],
+        k: int,
+        filter: Optional[Dict[str, Any]] = None,
+        session_db: Optional[AsyncSession] = None,
+    ) -> List[Document]:
+        where, params = self._where(session, filter)
+        query = text(f"""
+            SELECT c.content, c.metadata, c.document_id, d.filename, d.upload_timestamp
+            FROM documentchunk c LEFT JOIN document d ON d.id = c.document_id
+            WHERE {where}
+            ORDER BY c.embedding <-> CAST(CAST(:query AS text) AS vector)
+            LIMIT :k
+        """)
+        async with self._db(session_db) as db:
+            rows = (await db.execute(query, {**params, "query": _vector_literal(query_vector), "k": k})).all()
+        return [
+            Document(
+                page_content=row.content,
+                metadata={
+                    **_json(row.metadata),
+                    "document_id": row.document_id,
+                    "uploaded_at": row.upload_timestamp.isoformat() if row.upload_timestamp else None,
+                },
+            )
+            for row in rows
+        ]
+
+    async def has_vectors(self, session: Session, session_db: Optional[AsyncSession] = None) -> bool:
+        query = text("SELECT EXISTS (SELECT 1 FROM documentchunk WHERE session_id = :session_id)")
+        async with self._db(session_db) as db:
+            return bool((await db.execute(query, {"session_id": session.id})).scalar())
+
+    async def count(self, session: Session, session_db: Optional[AsyncSession] = None) -> int:
+        query = text("SELECT count(*) FROM documentchunk WHERE session_id = :session_id")
+        async with self._db(session_db) as db:
+            return int((await db.execute(query, {"session_id": session.id})).scalar())
+
+    async def iter_chunks(
+        self, session: Session, batch_size: int = ITER_BATCH_SIZE, session_db: Optional[AsyncSession] = None,
+    ) -> AsyncIterator[ChunkBatch]:
+        query = text("""
+            SELECT id, content, metadata, CAST(embedding AS real[]) AS embedding
+            FROM documentchunk
+            WHERE session_id = :session_id AND id > :after
+            ORDER BY id
+            LIMIT :limit
+        """)
+        after = 0
+        async with self._db(session_db) as db:
+            while True:
+                rows = (await db.execute(query, {"session_id": session.id, "after": after, "limit": batch_size})).all()
+                if not rows:
+                    return
+                yield ChunkBatch(
+                    [row.content for row in rows],
+                    np.asarray([row.embedding for row in rows], dtype="float32"),
+                    [_json(row.metadata) for row in rows],
+                )
+                after = rows[-1].id
+
+    async def delete(self, session: Session, session_db: Optional[AsyncSession] = None) -> None:
+        async with self._db(session_db) as db:
+            await db.execute(text("DELETE FROM documentchunk WHERE session_id = :session_id"), {"session_id": session.id})
+
+
+_BACKEND_CLASSES = {"faiss": FaissVectorStore, "qdrant": QdrantVectorStore, "pgvector": PgVectorStore}
+_stores: Dict[str, VectorStore] = {}
+
+
+def resolve_backend(name: Optional[str]) -> str:
+    """A backend name, falling back to VECTOR_BACKEND."""
+    name = (name or VECTOR_BACKEND).lower()
+    if name not in VECTOR_BACKENDS:
+        raise ValueError(f"Unknown vector backend {name!r}; expected one of {', '.join(VECTOR_BACKENDS)}")
+    return name
+
+
+def get_vector_store(backend: Optional[str] = None) -> VectorStore:
+    """The shared store of a backend (VECTOR_BACKEND by default), created on first use."""
+    name = resolve_backend(backend)
+    if name not in _stores:
+        _stores[name] = _BACKEND_CLASSES[name]()
+    return _stores[name]
+
+
+def store_for(session: Session) -> VectorStore:
+    """The store holding a session's vectors."""
+    return get_vector_store(session.vector_backend or "faiss")
+
+
+async def close_vector_stores() -> None:
+    for store in _stores.values():
+        await store.close()
+    _stores.clear()
+
+
+async def move_session(session: Session, backend: str, session_db: AsyncSession) -> int:
+    """Copy a session's vectors to `backend`, switch it over and delete the old copy."""
+    source, target = store_for(session), get_vector_store(backend)
+    if source is target:
+        return 0
+    batches = [batch async for batch in source.iter_chunks(session, session_db=session_db)]
+    count = sum(len(batch.texts) for batch in batches)
+    # Clear whatever an interrupted move left behind before copying
+    await target.delete(session, session_db)
+    if count:
+        await target.upsert(session, batches, session_db)
+    session.vector_backend = target.name
+    session_db.add(session)
+    await session_db.commit()
+
+    await source.delete(session, session_db)
+    session_db.add(session)
+    await session_db.commit()
+    logger.info("session moved", extra={"session_id": session.id, "from": source.name, "to": target.name, "chunks": count})
+    return count
+
+
+async def _main(argv: Optional[List[str]] = None) -> None:
+    import argparse
+    from database import init_db, close_db
+
+    parser = argparse.ArgumentParser(description="Manage where sessions keep their vectors")
+    sub = parser.add_subparsers(dest="command", required=True)
+    move_parser = sub.add_parser("move", help="move a session's vectors to another backend")
+    move_parser.add_argument("session_id", type=int)
+    move_parser.add_argument("backend", choices=VECTOR_BACKENDS)
+    args = parser.parse_args(argv)
+
+    await init_db()
+    async with async_session() as db:
+        session = (await db.execute(select(Session).where(Session.id == args.session_id))).scalar_one_or_none()
+        if session is None:
+            raise SystemExit(f"Session {args.session_id} not found")
+        count = await move_session(session, args.backend, db)
+        print(f"[OK] Session {session.id} uses {args.backend} ({count} chunks moved)")
+    await close_vector_stores()
+    await close_db()
+
+
+if __name__ == "__main__":
+    asyncio.run(_main())